@@ -0,0 +1,90 @@
+"""
+Сравнение разбора ответов Mint API (CPU на один ответ):
+- before: как раньше в HTTPClient.request — response.text, затем response.json() (тело декодируется дважды),
+    проверка code и модели из словарей (User(**data), [Task(**task) for task in data], ...).
+- after: один проход по байтам ответа заранее созданным валидатором (USER_RESPONSE, ...).
+
+    python -m benchmarks.decode --number 2000
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Callable
+
+from pydantic import TypeAdapter
+
+from mint.api.http import ENERGY_LIST_RESPONSE, SUCCESS_CODE, TASK_LIST_RESPONSE, USER_RESPONSE
+from mint.api.models import Energy, Task, User
+
+
+USER = {
+    "id": 123456, "treeId": 654321, "address": "0x" + "a" * 40, "ens": None,
+    "energy": 1234, "tree": 56789, "inviteId": 111, "code": "ABCDEF", "invitePercent": 10,
+    "type": "normal", "nft_id": 0, "nft_pass": 0, "stake_id": 0, "signin": 1,
+    "twitter": "1234567890", "discord": None, "status": "verified",
+    "createdAt": "2024-05-01T12:00:00.000Z", "signs": [{"amount": 100, "type": "daily"}] * 7,
+}
+TASK = {"id": 1, "name": "Follow Mint on Twitter", "amount": 1000, "isFreeze": False, "spec": "twitter-follow", "claimed": True}
+ENERGY = {"uid": ["abc-def"], "amount": 2500, "includes": [1, 2, 3], "type": "daily", "freeze": False}
+
+PAYLOADS: dict[str, tuple[Any, TypeAdapter, Callable[[Any], Any]]] = {
+    # name: (result, валидатор ответа, старое построение моделей)
+    "user-info": (USER, USER_RESPONSE, lambda data: User(**data)),
+    "task-list": ([dict(TASK, id=task_id) for task_id in range(30)], TASK_LIST_RESPONSE,
+                  lambda data: [Task(**task_data) for task_data in data]),
+    "energy-list": ([ENERGY] * 10, ENERGY_LIST_RESPONSE, lambda data: [Energy(**energy_data) for energy_data in data]),
+}
+
+
+def decode_before(content: bytes, build: Callable[[Any], Any]) -> Any:
+    content.decode("utf-8")  # response.text
+    data = json.loads(content)  # response.json()
+    if isinstance(data, dict):
+        if data["code"] != SUCCESS_CODE:
+            raise ValueError(data)
+        data = data["result"]
+    return build(data)
+
+
+def decode_after(content: bytes, adapter: TypeAdapter) -> Any:
+    envelope = adapter.validate_json(content)
+    if envelope.get("code") != SUCCESS_CODE:
+        raise ValueError(envelope)
+    return envelope.get("result")
+
+
+def measure(fn: Callable[[], Any], number: int, rounds: int) -> float:
+    """
+    :return: мкс CPU на вызов (лучший из rounds)
+    """
+    best = float("inf")
+    for _ in range(rounds):
+        started_at = time.process_time()
+        for _ in range(number):
+            fn()
+        best = min(best, time.process_time() - started_at)
+    return best / number * 1_000_000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare Mint API response decoding before and after")
+    parser.add_argument("--number", type=int, default=2000, help="Responses per round")
+    parser.add_argument("--rounds", type=int, default=5, help="Rounds, the best one is reported")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    for name, (result, adapter, build) in PAYLOADS.items():
+        content = json.dumps({"code": SUCCESS_CODE, "msg": "", "result": result}).encode()
+        assert decode_before(content, build) == decode_after(content, adapter)
+
+        before = measure(lambda: decode_before(content, build), args.number, args.rounds)
+        after = measure(lambda: decode_after(content, adapter), args.number, args.rounds)
+        print(f"{name:<12} {len(content):>6} bytes  before {before:>8.1f} us  after {after:>8.1f} us"
+              f"  ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Сравнение реализаций event loop (CONCURRENCY.EVENT_LOOP) на локальной заглушке Mint API:
+- Заглушка работает в отдельном процессе (keep-alive, ответ в формате Mint API, задержка --delay).
+- Для каждого loop аккаунты обрабатываются через WorkerPool, каждый аккаунт открывает свой HTTPClient
+    и делает --requests запросов, как в обычном запуске.
+- Выводится запросов в секунду и задержка запроса (p50, p95, p99).
+
+    python -m benchmarks.loop --loops asyncio uvloop --accounts 500 --workers 50
+
+Прокси, ограничения на прокси и [LIMITS] MINT_API берутся из конфига, поэтому для чистого сравнения
+их стоит отключить (0).
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+from loguru import logger
+
+from common.loop import loop_factory, run
+from mint.api.http import HTTPClient
+from mint.api.sessions import session_pool
+from mint.governor import ProxyGovernor
+from mint.pool import WorkerPool
+
+
+RESPONSE_BODY = json.dumps({
+    "code": 10000,
+    "result": {"id": 1, "address": "0x0000000000000000000000000000000000000000", "energy": 0, "tree": 0},
+}).encode()
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: application/json\r\n"
+    b"Connection: keep-alive\r\n"
+    b"Content-Length: " + str(len(RESPONSE_BODY)).encode() + b"\r\n\r\n"
+) + RESPONSE_BODY
+
+
+@dataclass
+class LoopResult:
+    loop: str
+    requests: int
+    elapsed: float  # sec.
+    latencies: list[float]  # sec.
+
+    @property
+    def rps(self) -> float:
+        return self.requests / self.elapsed
+
+    def percentile(self, percent: int) -> float:
+        """
+        :return: ms
+        """
+        return statistics.quantiles(self.latencies, n=100)[percent - 1] * 1000
+
+    def __str__(self):
+        return (f"{self.loop:<8} {self.rps:>9.0f} req/s"
+                f"  p50 {self.percentile(50):>7.2f} ms  p95 {self.percentile(95):>7.2f} ms"
+                f"  p99 {self.percentile(99):>7.2f} ms  ({self.requests} requests in {self.elapsed:.2f} sec.)")
+
+
+async def _serve_async(port: int, delay: float, ready: multiprocessing.Event):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    name, _, value = line.partition(b":")
+                    if name.strip().lower() == b"content-length":
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(RESPONSE)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", port, backlog=1024)
+    ready.set()
+    async with server:
+        await server.serve_forever()
+
+
+def _serve(port: int, delay: float, ready: multiprocessing.Event):
+    # Заглушка не должна быть узким местом, поэтому сама использует самый быстрый доступный loop
+    run(_serve_async(port, delay, ready), "auto")
+
+
+async def _bench_async(loop: str, url: str, accounts: int, requests: int, workers: int) -> LoopResult:
+    latencies = []
+
+    async def process(account: SimpleNamespace, state=None):
+        async with HTTPClient() as client:
+            for _ in range(requests):
+                started_at = time.perf_counter()
+                await client.request("GET", url, auth=False)
+                latencies.append(time.perf_counter() - started_at)
+
+    async def iter_fake_accounts():
+        for database_id in range(1, accounts + 1):
+            yield SimpleNamespace(database_id=database_id, proxy_database_id=database_id)
+
+    pool = WorkerPool(process, workers, governor=ProxyGovernor(), on_progress=lambda count: None)
+    started_at = time.perf_counter()
+    await pool.run(iter_fake_accounts())
+    await session_pool.close()
+    return LoopResult(loop, len(latencies), time.perf_counter() - started_at, latencies)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare event loop implementations against a local Mint API stub")
+    parser.add_argument("--loops", nargs="+", default=["asyncio", "uvloop"], choices=["asyncio", "uvloop"])
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=10, help="Requests per account")
+    parser.add_argument("--workers", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0, help="Stub response delay, sec.")
+    parser.add_argument("--rounds", type=int, default=3, help="Rounds per loop, the best one is reported")
+    parser.add_argument("--port", type=int, default=18080)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    server = context.Process(target=_serve, args=(args.port, args.delay, ready), daemon=True)
+    server.start()
+    try:
+        if not ready.wait(30):
+            raise RuntimeError("Stub server did not start")
+
+        url = f"http://127.0.0.1:{args.port}/api/tree/user-info"
+        for loop in args.loops:
+            if loop != "asyncio" and loop_factory(loop) is None:
+                continue
+
+            rounds = [
+                run(_bench_async(loop, url, args.accounts, args.requests, args.workers), loop)
+                for _ in range(args.rounds)
+            ]
+            print(max(rounds, key=lambda result: result.rps))
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == "__main__":
+    main()
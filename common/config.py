@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 
 from .logger import LoggingLevel
+from .loop import EventLoopName
 
 
 class LoggingConfig(BaseModel):
@@ -8,11 +9,13 @@ class LoggingConfig(BaseModel):
 
 
 class ConcurrencyConfig(BaseModel):
+    PROCESSES: int = 1
     MAX_TASKS: int = 1
     MAX_RETRIES: int = 3
     DELAY_BETWEEN_RETRIES: int = 5
     DELAY_BETWEEN_ACTIONS: tuple[int, int] = (0, 0)
     DELAY_BETWEEN_ACCOUNTS: tuple[int, int] = (0, 0)
+    EVENT_LOOP: EventLoopName = "asyncio"
 
 
 class RequestsConfig(BaseModel):
@@ -0,0 +1,46 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Generic, TypeVar
+
+
+T = TypeVar("T")
+
+
+class DelayQueue(Generic[T]):
+    """
+    Очередь отложенных элементов на куче (по времени готовности):
+    get() отдает элемент, как только наступает его время. Ожидание одно на всю очередь, а не по задаче на элемент.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, T]] = []
+        self._counter = itertools.count()  # Элементы с одинаковым временем отдаются в порядке добавления
+        self._changed = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def put(self, item: T, delay: float):
+        """
+        :param delay: Через сколько секунд элемент будет готов.
+        """
+        ready_at = time.monotonic() + max(delay, 0)
+        heapq.heappush(self._heap, (ready_at, next(self._counter), item))
+        self._changed.set()
+
+    async def get(self) -> T:
+        while True:
+            self._changed.clear()
+            timeout = None
+            if self._heap:
+                timeout = self._heap[0][0] - time.monotonic()
+                if timeout <= 0:
+                    return heapq.heappop(self._heap)[2]
+
+            # Просыпаемся по времени ближайшего элемента или когда добавлен новый (возможно, более ранний)
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
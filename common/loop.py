@@ -0,0 +1,65 @@
+"""
+Выбор реализации event loop (CONCURRENCY.EVENT_LOOP):
+- asyncio: стандартный
+- uvloop: uvloop (не работает на Windows). Если он не установлен, используется стандартный
+- auto: uvloop, если установлен, иначе стандартный
+
+Сравнить на своей машине: python -m benchmarks.loop
+"""
+
+import asyncio
+from functools import cache
+from typing import Any, Callable, Coroutine, Literal, TypeVar
+
+from loguru import logger
+
+
+T = TypeVar("T")
+
+EventLoopName = Literal["asyncio", "uvloop", "auto"]
+
+
+@cache
+def loop_factory(name: EventLoopName) -> Callable[[], asyncio.AbstractEventLoop] | None:
+    """
+    :return: Фабрика event loop или None для стандартного
+    """
+    if name == "asyncio":
+        return None
+
+    try:
+        import uvloop
+    except ImportError:
+        if name == "uvloop":
+            logger.warning("uvloop is not installed (pip install uvloop), using the default asyncio event loop")
+        return None
+
+    return uvloop.new_event_loop
+
+
+def run(main: Coroutine[Any, Any, T], loop: EventLoopName = "asyncio") -> T:
+    """
+    asyncio.run с выбранной реализацией event loop.
+    """
+    with asyncio.Runner(loop_factory=loop_factory(loop)) as runner:
+        return runner.run(main)
+
+
+class LoopBound:
+    """
+    Основа объектов процесса, состояние которых (примитивы asyncio, задачи, сессии) привязано к event loop:
+    при первом обращении из нового event loop (следующий запуск, рабочий процесс) состояние сбрасывается.
+    """
+
+    _loop: asyncio.AbstractEventLoop | None = None
+
+    def _check_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._reset_loop_state()
+
+    def _reset_loop_state(self):
+        """
+        Сбрасывает состояние прошлого event loop
+        """
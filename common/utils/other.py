@@ -1,4 +1,14 @@
+from datetime import datetime, timezone
+
+
 def hidden_value(value: str) -> str:
     start = value[:3]
     end = value[-3:]
     return f"{start}**{end}"
+
+
+def utcnow() -> datetime:
+    """
+    Текущее время в UTC без tzinfo (так время хранится в БД)
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
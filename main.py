@@ -10,35 +10,33 @@
 - Ошибка запроса, связанные с сервером
 """
 
-import asyncio
+import argparse
 from typing import Callable
-from random import randint
 
 from eth_account import Account
 from eth_account.account import LocalAccount
 from better_proxy import Proxy as BetterProxy
-from twitter.errors import HTTPException as TwitterHTTPException, BadAccount as TwitterBadAccountError
-from tqdm.asyncio import tqdm
 
 import questionary
 from loguru import logger
-from curl_cffi import requests
 
 from common.project import print_project_info
 from common.author import print_author_info
 from common.logger import setup_logger
 from common.excell import get_xlsx_filepaths, get_worksheets
+from common.loop import run
 
-import mint.discord
 from mint.paths import INPUT_DIR, DATABASE_FILEPATH, LOG_DIR
 from mint.config import CONFIG
 from mint.excell import excell
-from mint.client import Client as MintClient
-from mint.api.errors import HTTPException as MintHTTPException
-from mint.errors import DiscordScriptError, TwitterScriptError
+from mint.process import process_groups
+from mint.pool import count_accounts
+from mint.multiprocess import run_in_processes
+from mint.sharding import Shard
+from mint.journal import start_run
 from mint.database.crud import (
-    get_accounts_by_groups,
     get_groups,
+    get_last_run,
     get_or_create,
     update_or_create,
 )
@@ -58,6 +56,10 @@ logger.enable("twitter")
 DATABASE_URL = f"sqlite:///{DATABASE_FILEPATH}"
 
 
+def run_async(main):
+    return run(main, CONFIG.CONCURRENCY.EVENT_LOOP)
+
+
 async def select_and_import_table_async():
     table_filepaths = get_xlsx_filepaths(INPUT_DIR)
 
@@ -161,144 +163,112 @@ async def select_and_import_table_async():
             await session.commit()
 
 
-async def process_account(mint_account: MintAccount, mint_green_id: bool, bind_discord: bool):
-    if mint_account.wallet.verification_failed:
-        logger.warning(f"{mint_account} {mint_account.wallet.address} Wallet failed verification before")
+async def select_group_and_options_async() -> tuple[list[str], dict] | None:
+    """
+    :return: Выбранные группы и параметры для process_groups
+    """
+    async with AsyncSessionmaker() as session:
+        # Запроса групп из бд
+        groups = await get_groups(session)
+
+    if not groups:
+        print(f"No accounts in database!")
         return
 
-    interacted = False
-
-    retries = CONFIG.CONCURRENCY.MAX_RETRIES
-    while retries > 0:
-        try:
-            # Функции будет вызываться повторно, если не произведен выход из цикла (break)
-
-            mint_client = MintClient(mint_account)
-            interacted |= await mint_client.login()
-            interacted |= await mint_client.try_to_verify_wallet()
-            interacted |= await mint_client.try_to_bind_twitter()
-            interacted |= await mint_client.try_to_accept_invite()
-            if not mint.discord.invites_paused and bind_discord:
-                interacted |= await mint_client.try_to_bind_discord()
-            interacted |= await mint_client.complete_tasks()
-            interacted |= await mint_client.claim_energy()
-            interacted |= await mint_client.inject_all()
-            if mint_green_id:
-                await mint_client.mint_green_id()
-            break
+    # Пользователь выбирает группы (хотя бы одну)
+    while True:
+        selected_groups = await questionary.checkbox("Select groups:", choices=groups).ask_async()
 
-        except (TwitterScriptError, DiscordScriptError) as exc:
-            logger.warning(f"{mint_account} {exc}")
+        if not selected_groups:
+            print(f"Select at least one group!")
+        else:
             break
 
-        except (MintHTTPException, TwitterHTTPException, TwitterBadAccountError) as exc:
-            # Повторные попытки на HTTP 5XX (ошибки на стороне сервера)
-            if isinstance(exc, TwitterHTTPException):
-                if exc.response.status_code >= 500:
-                    logger.warning(f"{mint_account} {exc}")
-                else:
-                    logger.error(f"{mint_account} {exc}")
-                    break
-
-            if isinstance(exc, MintHTTPException):
-                if exc.response.status_code >= 500:
-                    logger.warning(f"{mint_account} {exc}")
-                if exc.message == "System Maintenance":
-                    raise
-                else:
-                    logger.error(f"{mint_account} {exc}")
-                    break
+    run_forever = await questionary.confirm("Run forever?", default=False).ask_async()
 
-            logger.error(f"{mint_account} {exc}")
-            break
+    if run_forever:
+        print(f"Аккаунты равномерно распределены по суткам. Не выключайте скрипт.")
 
-        except requests.errors.RequestsError as exc:
-            if exc.code in (23, 28, 35, 56, 7):
-                logger.warning(f"{mint_account} (May be bad or slow proxy) {exc}")
-            else:
-                logger.error(f"{mint_account} {exc}")
-                break
-
-        finally:
-            sleep_time = randint(*CONFIG.CONCURRENCY.DELAY_BETWEEN_ACCOUNTS)
-            if interacted and sleep_time > 0:
-                logger.info(f"{mint_account} Sleep {sleep_time} sec.")
-                await asyncio.sleep(sleep_time)
-
-        retries -= 1
-        if retries > 0:
-            # Пауза перед следующей попыткой
-            sleep_time = CONFIG.CONCURRENCY.DELAY_BETWEEN_RETRIES
-            logger.warning(f"{mint_account}"
-                           f" Не удалось завершить выполнение."
-                           f" Повторная попытка через {sleep_time}s."
-                           f" Осталось попыток: {retries}.")
-            await asyncio.sleep(sleep_time)
-
-
-async def select_and_process_group_async():
-    async with AsyncSessionmaker() as session:
-        # Запроса групп из бд
-        groups = await get_groups(session)
+    resume = False
+    if not run_forever:
+        async with AsyncSessionmaker() as session:
+            last_run = await get_last_run(session, selected_groups)
+        if last_run:
+            resume = await questionary.confirm(f"Resume {last_run}?", default=False).ask_async()
 
-        if not groups:
-            print(f"No accounts in database!")
-            return
-
-        # Пользователь выбирает группы (хотя бы одну)
-        while True:
-            selected_groups = await questionary.checkbox("Select groups:", choices=groups).ask_async()
+    mint_green_id = await questionary.confirm(f"Mint Green ID?", default=False).ask_async()
+    bind_discord = await questionary.confirm(f"Bind discord?", default=False).ask_async()
 
-            if not selected_groups:
-                print(f"Select at least one group!")
-            else:
-                break
+    options = {"mint_green_id": mint_green_id, "bind_discord": bind_discord, "forever": run_forever, "resume": resume}
+    return selected_groups, options
 
-        # Запрос аккаунтов выбранных групп
-        mint_accounts = await get_accounts_by_groups(session, selected_groups)
 
-    # run_forever = await questionary.confirm("Run forever?").ask_async()
+async def select_headless_groups_async(args: argparse.Namespace) -> list[str]:
+    await update_database_async()
 
-    # if run_forever:
-    #     print(f"Аккаунты равномерно распределены по суткам. Не выключайте скрипт.")
+    async with AsyncSessionmaker() as session:
+        groups = await get_groups(session)
 
-    mint_green_id = await questionary.confirm(f"Mint Green ID?", default=False).ask_async()
-    bind_discord = await questionary.confirm(f"Bind discord?", default=False).ask_async()
+    selected_groups = [group.lower() for group in args.groups]
+    for group in selected_groups:
+        if group not in groups:
+            logger.warning(f"No accounts in group '{group}'")
 
-    try:
-        if CONFIG.CONCURRENCY.MAX_TASKS > 1:
-            # Create a semaphore with the specified max tasks
-            semaphore = asyncio.Semaphore(CONFIG.CONCURRENCY.MAX_TASKS)
+    return selected_groups
 
-            async def process_account_with_semaphore(mint_account):
-                async with semaphore:
-                    await process_account(mint_account, mint_green_id, bind_discord)
 
-            # Create a list of tasks to be executed concurrently
-            tasks = [process_account_with_semaphore(mint_account) for mint_account in mint_accounts]
+def run_groups(groups: list[str], processes: int = None, *, shard: Shard = None, resume: bool = False, **options):
+    """
+    Обрабатывает группы в текущем процессе или, если processes > 1, в нескольких процессах.
 
-            # Wait for all tasks to complete
-            await tqdm.gather(*tasks)
-        else:
-            async for mint_account in tqdm(mint_accounts):
-                await process_account(mint_account, mint_green_id, bind_discord)
+    :param resume: Продолжить последний запуск этих групп, пропуская завершенные шаги (см. mint.journal).
+    """
+    # В бесконечном режиме аккаунты обрабатываются каждый день заново, поэтому журнал не ведется
+    if not options.get("forever"):
+        options["run_id"] = run_async(start_run(groups, str(shard) if shard else None, resume))
 
-    except MintHTTPException as exc:
-        if exc.message == "System Maintenance":
-            logger.warning(f"На сайте mintchain происходит обновление. Попробуйте запустить скрипт позже.")
-            return
-        else:
-            raise exc
-    finally:
-        mint.discord.invites_paused = False
+    processes = processes or CONFIG.CONCURRENCY.PROCESSES
+    if processes > 1:
+        total = None if options.get("forever") else run_async(count_accounts(groups, shard))
+        run_in_processes(groups, processes, shard=shard, total=total, **options)
+    else:
+        run_async(process_groups(groups, shard=shard, **options))
+
+
+def run_headless(args: argparse.Namespace):
+    """
+    Запуск без интерактивного меню (systemd, cron, несколько хостов через --shard)
+    """
+    groups = run_async(select_headless_groups_async(args))
+    run_groups(
+        groups,
+        args.processes,
+        mint_green_id=args.green_id,
+        bind_discord=args.discord,
+        shard=args.shard,
+        forever=args.forever,
+        resume=args.resume,
+        stages=args.stages,
+    )
 
 
 def select_and_import_table():
-    asyncio.run(select_and_import_table_async())
+    run_async(select_and_import_table_async())
 
 
 def select_and_process_group():
-    asyncio.run(select_and_process_group_async())
+    selection = run_async(select_group_and_options_async())
+    if selection:
+        groups, options = selection
+        run_groups(groups, **options)
+
+
+async def update_database_async():
+    current_revision = await alembic_utils.get_current_revision()
+    latest_revision = alembic_utils.get_latest_revision()
+    if current_revision != latest_revision:
+        logger.info(f"Upgrading database from revision {current_revision} to {latest_revision}")
+        await alembic_utils.upgrade()
 
 
 async def update_database_or_quite_async():
@@ -331,8 +301,55 @@ def select_module(modules: dict[str: Callable]) -> Callable:
     return modules[module_name]
 
 
+def _shard_arg(value: str) -> Shard:
+    try:
+        return Shard.from_str(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mint blockchain script. Without arguments starts the interactive menu.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    run_parser = subparsers.add_parser("run", help="Process groups without the interactive menu")
+    run_parser.add_argument("--groups", nargs="+", required=True, metavar="GROUP", help="Groups to process")
+    run_parser.add_argument("--green-id", action="store_true", help="Mint Green ID")
+    run_parser.add_argument("--discord", action="store_true", help="Bind Discord")
+    run_parser.add_argument(
+        "--shard", type=_shard_arg, default=None, metavar="I/N",
+        help="Process only the I-th of N disjoint parts of the groups (1 <= I <= N)",
+    )
+    run_parser.add_argument(
+        "--forever", action="store_true",
+        help="Run forever: accounts are spread evenly over SCHEDULER.PERIOD_HOURS (a day by default)",
+    )
+    run_parser.add_argument(
+        "--resume", action="store_true",
+        help="Continue the last run of the same groups (and shard), skipping steps it already completed",
+    )
+    run_parser.add_argument(
+        "--stages", action="store_true",
+        help="Stage-major mode: run each step for a whole batch of accounts before the next one"
+             " (limits per stage: PIPELINE.STAGE_MAX_TASKS)",
+    )
+    run_parser.add_argument(
+        "--processes", type=int, default=None, metavar="N",
+        help="Worker processes, each with its own event loop (default: CONCURRENCY.PROCESSES)",
+    )
+    args = parser.parse_args()
+    if args.command == "run" and args.stages and args.forever:
+        parser.error("--stages cannot be combined with --forever")
+    return args
+
+
 def main():
-    asyncio.run(update_database_or_quite_async())
+    args = parse_args()
+    if args.command == "run":
+        run_headless(args)
+        return
+
+    run_async(update_database_or_quite_async())
     while True:
         print_project_info()
         print_author_info()
@@ -0,0 +1,152 @@
+"""
+Кэш ответов Mint API, которые только читают данные (CACHE):
+- Ответ хранится CACHE.TTL[endpoint] секунд отдельно для каждого пользователя (scope - аккаунт),
+    поэтому повторные чтения в шагах аккаунта и при повторах шагов не идут в сеть.
+- Запросы, которые меняют данные (claim, inject, task-submit, open-box, привязки), сбрасывают
+    записи, которые от них зависят (см. INVALIDATES).
+- Ответ, запрошенный до сброса и полученный после, не сохраняется: у каждого пользователя свой счетчик
+    сбросов (generation), и put пропускает ответ, если счетчик изменился, пока шел запрос.
+- Каталог заданий (id, название, награда) у всех пользователей общий и запоминается один раз за запуск,
+    у пользователя хранятся только id его заданий и выполненные из них.
+"""
+
+import time
+from collections import defaultdict
+from typing import Any, Hashable
+
+from common.loop import LoopBound
+
+from ..config import CONFIG
+from .models import Task
+
+
+USER_INFO = "user-info"
+ENERGY_LIST = "energy-list"
+TASK_LIST = "task-list"
+ASSETS = "asset"
+GREEN_ID = "green-id"
+
+# Изменяющий запрос -> записи, которые он сбрасывает
+INVALIDATES: dict[str, tuple[str, ...]] = {
+    "login": (USER_INFO, ENERGY_LIST, TASK_LIST, ASSETS, GREEN_ID),
+    "claim": (ENERGY_LIST, USER_INFO),
+    "open-box": (ASSETS, USER_INFO),
+    "inject": (USER_INFO,),
+    "task-submit": (TASK_LIST, USER_INFO),
+    "discord-task": (TASK_LIST, USER_INFO),
+    "bind": (USER_INFO,),
+    "invitation": (USER_INFO,),
+    "wallet-verify": (USER_INFO,),
+    "green-id-mint": (GREEN_ID,),  # Транзакция, а не запрос к Mint API (см. Client.mint_green_id)
+}
+
+MISSING = object()
+SWEEP_SIZE = 1024
+
+
+class ResponseCache(LoopBound):
+    def __init__(self):
+        self._entries: dict[tuple[Hashable, str], tuple[float, Any]] = {}
+        self._generations: dict[Hashable, int] = defaultdict(int)  # Сколько раз сбрасывались записи пользователя
+        self._next_sweep = SWEEP_SIZE
+        self.task_catalog: dict[int, Task] = {}
+        self.hits: dict[str, int] = defaultdict(int)
+        self.misses: dict[str, int] = defaultdict(int)
+
+    def _reset_loop_state(self):
+        self._entries.clear()
+        self._generations.clear()
+        self._next_sweep = SWEEP_SIZE
+        self.task_catalog.clear()
+
+    def get(self, scope: Hashable, endpoint: str) -> Any:
+        """
+        :return: Сохраненный ответ или MISSING
+        """
+        if CONFIG.CACHE.TTL.get(endpoint, 0) <= 0:
+            # Endpoint не кэшируется: это не промах
+            return MISSING
+
+        self._check_loop()
+        entry = self._entries.get((scope, endpoint))
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits[endpoint] += 1
+            return entry[1]
+
+        self.misses[endpoint] += 1
+        return MISSING
+
+    def generation(self, scope: Hashable) -> int:
+        """
+        :return: Счетчик сбросов записей пользователя. Берется перед запросом и передается в put
+        """
+        self._check_loop()
+        return self._generations.get(scope, 0)
+
+    def put(self, scope: Hashable, endpoint: str, value: Any, generation: int = None):
+        """
+        :param generation: Счетчик сбросов до запроса (см. generation). Если с тех пор записи пользователя
+            сбрасывались, ответ мог быть получен до изменения и не сохраняется.
+        """
+        ttl = CONFIG.CACHE.TTL.get(endpoint, 0)
+        if ttl <= 0:
+            return
+
+        self._check_loop()
+        if generation is not None and generation != self._generations.get(scope, 0):
+            return
+        self._entries[(scope, endpoint)] = (time.monotonic() + ttl, value)
+        if len(self._entries) >= self._next_sweep:
+            self._sweep()
+
+    def _sweep(self):
+        now = time.monotonic()
+        for key in [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+        self._next_sweep = max(SWEEP_SIZE, len(self._entries) * 2)
+
+    def invalidate(self, scope: Hashable, mutation: str):
+        """
+        Сбрасывает записи пользователя, которые меняет запрос mutation (см. INVALIDATES).
+        """
+        self._check_loop()
+        self._generations[scope] += 1
+        for endpoint in INVALIDATES[mutation]:
+            self._entries.pop((scope, endpoint), None)
+
+    def pack_tasks(self, tasks: list[Task]) -> tuple[tuple[int, ...], frozenset[int]]:
+        """
+        Запоминает задания в общем каталоге.
+
+        :return: Запись пользователя: id заданий и id выполненных
+        """
+        for task in tasks:
+            if task.id not in self.task_catalog:
+                self.task_catalog[task.id] = task.model_copy(update={"claimed": None})
+        return tuple(task.id for task in tasks), frozenset(task.id for task in tasks if task.claimed)
+
+    def unpack_tasks(self, packed: tuple[tuple[int, ...], frozenset[int]]) -> list[Task] | None:
+        """
+        :return: Задания пользователя или None, если каталог уже сброшен
+        """
+        task_ids, claimed_ids = packed
+        if not all(task_id in self.task_catalog for task_id in task_ids):
+            return None
+        return [self.task_catalog[task_id].model_copy(update={"claimed": task_id in claimed_ids})
+                for task_id in task_ids]
+
+    def __bool__(self):
+        return bool(self.hits or self.misses)
+
+    def __str__(self):
+        return "Response cache (hits/misses):" + "".join(
+            f"\n\t{endpoint}: {self.hits[endpoint]}/{self.misses[endpoint]}"
+            for endpoint in sorted(set(self.hits) | set(self.misses))
+        )
+
+    def reset_stats(self):
+        self.hits.clear()
+        self.misses.clear()
+
+
+response_cache = ResponseCache()
@@ -22,3 +22,13 @@ class HTTPException(MintException):
             exception_message += f"\n\t(code: {self.code}) {self.message}"
 
         super().__init__(exception_message)
+
+
+class MaintenanceError(MintException):
+    """
+    Запрос к Mint API отменен или не отправлен, так как на сайте идет обновление (см. mint.breaker)
+    """
+    message = "System Maintenance"
+
+    def __init__(self):
+        super().__init__(self.message)
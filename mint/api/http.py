@@ -1,25 +1,143 @@
 import json
-from typing import Any
+import time
+from functools import wraps
+from typing import Any, Awaitable, Callable, Hashable
 
+from better_proxy import Proxy
 from loguru import logger
 from curl_cffi import requests
-from twitter.base import BaseHTTPClient
+from twitter.base import BaseAsyncSession, BaseHTTPClient
 from twitter.utils import hidden_value
+from pydantic import TypeAdapter, ValidationError
 from tenacity import retry, retry_if_exception, stop_after_attempt, wait_fixed
 
-from .models import User, Task, Energy, Asset
+from ..breaker import is_maintenance, mint_breaker
+from ..config import CONFIG
+from ..governor import proxy_governor
+from ..limits import service_limits
+from ..tracing import CURL_INFOS, request_tracer
+from .models import Envelope, LoginResult, User, Task, Energy, Asset
+from .cache import ASSETS, ENERGY_LIST, GREEN_ID, MISSING, TASK_LIST, USER_INFO, response_cache
+from .sessions import SessionPool, session_pool
 from .errors import HTTPException
 
 
+SUCCESS_CODE = 10000
+
+
+def envelope_adapter(result_type: Any) -> TypeAdapter:
+    """
+    :return: Валидатор ответа Mint API с result типа result_type
+    """
+    return TypeAdapter(Envelope[result_type])
+
+
+# Валидаторы создаются один раз при импорте
+ANY_RESPONSE = envelope_adapter(Any)
+LOGIN_RESPONSE = envelope_adapter(LoginResult)
+USER_RESPONSE = envelope_adapter(User)
+ENERGY_LIST_RESPONSE = envelope_adapter(list[Energy])
+TASK_LIST_RESPONSE = envelope_adapter(list[Task])
+ASSETS_RESPONSE = envelope_adapter(list[Asset])
+
+
+def decode_body(content: bytes) -> Any:
+    """
+    :return: JSON или текст, если ответ не JSON
+    """
+    try:
+        return json.loads(content)
+    except (json.decoder.JSONDecodeError, UnicodeDecodeError):
+        return content.decode(errors="replace")
+
+
+def cached(endpoint: str):
+    """
+    Ответ метода берется из кэша пользователя, если он есть (см. mint.api.cache)
+    """
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self: "HTTPClient", *args, **kwargs):
+            return await self._cached(endpoint, lambda: method(self, *args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def invalidates(mutation: str):
+    """
+    После метода (в том числе неудачного) сбрасываются записи кэша, которые он меняет
+    """
+    def decorator(method):
+        @wraps(method)
+        async def wrapper(self: "HTTPClient", *args, **kwargs):
+            try:
+                return await method(self, *args, **kwargs)
+            finally:
+                self.invalidate(mutation)
+        return wrapper
+    return decorator
+
+
 class HTTPClient(BaseHTTPClient):
     _DEFAULT_HEADERS = {
         'authority': 'www.mintchain.io',
         'authorization': 'Bearer',
     }
 
-    def __init__(self, auth_token: str = None, **session_kwargs):
-        super().__init__(**session_kwargs)
+    def __init__(
+            self,
+            auth_token: str = None,
+            proxy_database_id: int = None,
+            proxy: Proxy = None,
+            pool: SessionPool | None = session_pool,
+            **session_kwargs,
+    ):
+        """
+        :param pool: Пул сессий (см. mint.api.sessions). Сессия берется из пула при первом запросе
+            и возвращается в пул в close(). None - своя сессия на время жизни клиента.
+        """
         self.auth_token = auth_token
+        self.proxy_database_id = proxy_database_id
+        self.account_database_id: int | None = None  # Для трассировки запросов
+        self._proxy = proxy
+        self._pool = pool
+        self._session_kwargs = {
+            "headers": dict(session_kwargs.pop("headers", None) or self._DEFAULT_HEADERS),
+            **session_kwargs,
+        }
+        self._leased_session: BaseAsyncSession | None = None
+
+    @property
+    def _session(self) -> BaseAsyncSession:
+        if self._leased_session is None:
+            if self._pool is None:
+                self._leased_session = BaseAsyncSession(proxy=self._proxy, **self._session_kwargs)
+            else:
+                self._leased_session = self._pool.acquire(self._proxy, **self._session_kwargs)
+        return self._leased_session
+
+    @property
+    def proxy(self) -> Proxy | None:
+        return self._proxy
+
+    @proxy.setter
+    def proxy(self, proxy: Proxy | None):
+        self._proxy = proxy
+        if self._leased_session is not None:
+            self._leased_session.proxy = proxy
+            if self._pool is not None:
+                # Ключ сессии в пуле больше не совпадает с прокси, при возврате она закрывается
+                self._pool.discard(self._leased_session)
+
+    async def close(self):
+        session, self._leased_session = self._leased_session, None
+        if session is None:
+            return
+
+        if self._pool is None:
+            await session.close()
+        else:
+            await self._pool.release(session)
 
     @property
     def hidden_token(self) -> str | None:
@@ -36,8 +154,16 @@ class HTTPClient(BaseHTTPClient):
         auth: bool = True,
         query_auth: bool = False,
         payload_auth: bool = False,
+        adapter: TypeAdapter = ANY_RESPONSE,
         **kwargs,
     ) -> tuple[requests.Response, Any]:
+        """
+        Ответ разбирается из байтов один раз: JSON сразу проверяется и превращается в модели
+        заранее созданным валидатором (envelope_adapter), без промежуточного текста и словарей.
+
+        :param adapter: Валидатор ответа с нужным типом result (USER_RESPONSE, TASK_LIST_RESPONSE, ...)
+        :return: Ответ и result (или тело ответа, если это не JSON с code)
+        """
         # cookies = kwargs["cookies"] = kwargs.get("cookies") or {}
 
         if self.auth_token and auth:
@@ -51,39 +177,118 @@ class HTTPClient(BaseHTTPClient):
                 headers = kwargs["headers"] = kwargs.get("headers") or {}
                 headers["authorization"] = f"Bearer {self.auth_token}"
 
-        # fmt: off
-        log_message = f"[{self.hidden_token}] Request {method} {url}"
-        if kwargs.get('data'): log_message += f"\nRequest data: {kwargs.get('data')}"
-        if kwargs.get('json'): log_message += f"\nRequest data: {kwargs.get('json')}"
-        logger.debug(log_message)
-        # fmt: on
-
-        response = await self._session.request(method, url, **kwargs)
+        # Сообщения собираются, только если уровень DEBUG пишется хоть куда-то
+        logger.opt(lazy=True).debug("{}", lambda: self._request_log_message(method, url, kwargs))
+
+        while True:
+            try:
+                # Во время обновления сайта запрос ждет, см. mint.breaker
+                async with mint_breaker.guard():
+                    return await self._send(method, url, adapter, **kwargs)
+            except HTTPException as exc:
+                if not (is_maintenance(exc) and mint_breaker.probe):
+                    raise
+                # Сервер запрос не выполнил: отправляем его снова, когда предохранитель пропустит
+                logger.info(f"[{self.hidden_token}] {method} {url} paused until maintenance ends")
+
+    async def _send(
+        self,
+        method,
+        url,
+        adapter: TypeAdapter,
+        **kwargs,
+    ) -> tuple[requests.Response, Any]:
+        await proxy_governor.throttle(self.proxy_database_id)
+        async with service_limits.slot("mint_api"):
+            if request_tracer.enabled:
+                response = await self._traced_request(method, url, **kwargs)
+            else:
+                response = await self._session.request(method, url, **kwargs)
 
-        data = response.text
-        try:
-            data = response.json()
-        except json.decoder.JSONDecodeError:
-            pass
+        content = response.content
 
         # fmt: off
-        log_message = (f"[{self.hidden_token}] Response {method} {url}"
-                       f"\nStatus code: {response.status_code}"
-                       f"\nResponse data: {data}")
-        logger.debug(log_message)
+        logger.opt(lazy=True).debug(
+            "{}", lambda: f"[{self.hidden_token}] Response {method} {url}"
+                          f"\nStatus code: {response.status_code}"
+                          f"\nResponse data: {content.decode(errors='replace')}")
         # fmt: on
 
         if 300 > response.status_code >= 200:
-            if isinstance(data, dict):
-                if data["code"] != 10000:
+            try:
+                envelope = adapter.validate_json(content)
+            except ValidationError:
+                # Не JSON с code, ответ с ошибкой или result не подходит под модель
+                data = decode_body(content)
+                if not isinstance(data, dict):
+                    return response, data
+                if data.get("code") != SUCCESS_CODE:
                     raise HTTPException(response, data)
+                raise
+
+            if envelope.get("code") != SUCCESS_CODE:
+                raise HTTPException(response, envelope)
+
+            return response, envelope.get("result")
+
+        raise HTTPException(response, decode_body(content))
+
+    @property
+    def _cache_scope(self) -> Hashable | None:
+        """
+        :return: Ключ пользователя в кэше ответов или None, если кэш не используется
+        """
+        if not CONFIG.CACHE.ENABLED:
+            return None
+        return self.account_database_id if self.account_database_id is not None else self.auth_token
 
-                data = data["result"]
+    async def _cached(self, endpoint: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        scope = self._cache_scope
+        if scope is None:
+            return await fetch()
 
-            return response, data
+        value = response_cache.get(scope, endpoint)
+        if value is MISSING:
+            generation = response_cache.generation(scope)
+            value = await fetch()
+            response_cache.put(scope, endpoint, value, generation)
+        return value
 
-        raise HTTPException(response, data)
+    def invalidate(self, mutation: str):
+        """
+        Сбрасывает записи кэша пользователя, которые меняет mutation (см. mint.api.cache.INVALIDATES)
+        """
+        scope = self._cache_scope
+        if scope is not None:
+            response_cache.invalidate(scope, mutation)
+
+    def _request_log_message(self, method, url, kwargs: dict) -> str:
+        # fmt: off
+        log_message = f"[{self.hidden_token}] Request {method} {url}"
+        if kwargs.get('data'): log_message += f"\nRequest data: {kwargs.get('data')}"
+        if kwargs.get('json'): log_message += f"\nRequest data: {kwargs.get('json')}"
+        # fmt: on
+        return log_message
 
+    async def _traced_request(self, method, url, **kwargs) -> requests.Response:
+        """
+        Запрос с записью span (см. mint.tracing)
+        """
+        session = self._session
+        session.curl_infos = CURL_INFOS
+        started_at = time.time()
+        try:
+            response = await session.request(method, url, **kwargs)
+        except Exception as exc:
+            request_tracer.record(started_at, method, url, None, 0, {},
+                                  self.proxy_database_id, self.account_database_id, type(exc).__name__)
+            raise
+
+        request_tracer.record(started_at, method, url, response.status_code, len(response.content),
+                              response.infos, self.proxy_database_id, self.account_database_id)
+        return response
+
+    @invalidates("login")
     async def login(self, address: str, message: str, signature: str) -> User:
         url = "https://www.mintchain.io/api/tree/login"
         payload = {
@@ -91,15 +296,16 @@ class HTTPClient(BaseHTTPClient):
             "signature": signature,
             "message": message,
         }
-        response, data = await self.request("POST", url, json=payload, auth=False)
-        self.auth_token = data["access_token"]
-        return User(**data["user"])
+        response, data = await self.request("POST", url, json=payload, auth=False, adapter=LOGIN_RESPONSE)
+        self.auth_token = data.access_token
+        return data.user
 
     # @retry(
     #     retry=retry_if_exception(lambda exc: isinstance(exc, HTTPException) and exc.message == ""),
     #     stop=stop_after_attempt(3),
     #     wait=wait_fixed(30),
     # )
+    @invalidates("bind")
     async def bind_twitter(self, address: str, auth_code: str) -> int:
         url = "https://www.mintchain.io/api/twitter/verify"
         query = {
@@ -110,11 +316,13 @@ class HTTPClient(BaseHTTPClient):
         twitter_id = int(data)
         return twitter_id
 
+    @invalidates("bind")
     async def bind_discord(self, auth_code: str):
         url = "https://www.mintchain.io/api/discord/verify"
         payload = {"code": auth_code}
         await self.request("POST", url, json=payload)
 
+    @invalidates("discord-task")
     async def submit_discord_task(self):
         """
         :return: ME amount
@@ -123,6 +331,7 @@ class HTTPClient(BaseHTTPClient):
         response, data = await self.request("POST", url)
         return data["amount"]
 
+    @invalidates("invitation")
     async def accept_invite(self, invite_code: str) -> int:
         """
         :return: Invited ID
@@ -132,20 +341,23 @@ class HTTPClient(BaseHTTPClient):
         response, data = await self.request("GET", url, params=query, query_auth=True)
         return data["inviteId"]
 
+    @cached(USER_INFO)
     async def request_self(self) -> User:
         url = "https://www.mintchain.io/api/tree/user-info"
-        response, data = await self.request("GET", url)
-        return User(**data)
+        response, user = await self.request("GET", url, adapter=USER_RESPONSE)
+        return user
 
+    @cached(ENERGY_LIST)
     async def request_energy_list(self) -> list[Energy]:
         """
         :return: Energy list
         """
         url = "https://www.mintchain.io/api/tree/energy-list"
         payload = {}
-        response, data = await self.request("GET", url, data=payload)
-        return [Energy(**energy_data) for energy_data in data]
+        response, energy_list = await self.request("GET", url, data=payload, adapter=ENERGY_LIST_RESPONSE)
+        return energy_list
 
+    @invalidates("claim")
     async def claim_energy(
             self,
             *,
@@ -172,12 +384,24 @@ class HTTPClient(BaseHTTPClient):
         return data
 
     async def request_task_list(self) -> list[Task]:
+        scope = self._cache_scope
+        if scope is not None:
+            # Каталог заданий общий, у пользователя хранятся только id (см. ResponseCache.pack_tasks)
+            packed = response_cache.get(scope, TASK_LIST)
+            if packed is not MISSING:
+                tasks = response_cache.unpack_tasks(packed)
+                if tasks is not None:
+                    return tasks
+            generation = response_cache.generation(scope)
+
         url = "https://www.mintchain.io/api/tree/task-list"
         payload = {}
-        response, data = await self.request("GET", url, data=payload)
-        tasks = [Task(**task_data) for task_data in data]
+        response, tasks = await self.request("GET", url, data=payload, adapter=TASK_LIST_RESPONSE)
+        if scope is not None:
+            response_cache.put(scope, TASK_LIST, response_cache.pack_tasks(tasks), generation)
         return tasks
 
+    @invalidates("task-submit")
     async def sumbit_task(self, task_id: int, twitter_url: str = None):
         """
         :return: ME amount
@@ -189,6 +413,7 @@ class HTTPClient(BaseHTTPClient):
         me_amount = data["amount"]
         return me_amount
 
+    @invalidates("inject")
     async def inject(self, me_amount: int, address: str) -> bool:
         url = "https://www.mintchain.io/api/tree/inject"
         payload = {
@@ -198,18 +423,21 @@ class HTTPClient(BaseHTTPClient):
         response, data = await self.request("POST", url, json=payload)
         return data
 
+    @cached(ASSETS)
     async def request_assets(self) -> list[Asset]:
         url = "https://www.mintchain.io/api/tree/asset"
         payload = {}
-        response, data = await self.request("GET", url, data=payload)
-        return [Asset(**asset_data) for asset_data in data]
+        response, assets = await self.request("GET", url, data=payload, adapter=ASSETS_RESPONSE)
+        return assets
 
+    @invalidates("open-box")
     async def open_box(self, box_id: int) -> int | None:
         url = "https://www.mintchain.io/api/tree/open-box"
         payload = {"boxId": box_id}
         response, data = await self.request("POST", url, data=payload)
         return data["energy"]
 
+    @invalidates("wallet-verify")
     async def verify_wallet(self) -> bool:
         """
         :return: Verified or not
@@ -218,6 +446,7 @@ class HTTPClient(BaseHTTPClient):
         response, data = await self.request("POST", url, payload_auth=True)
         return data["data"]
 
+    @cached(GREEN_ID)
     async def get_green_id(self) -> tuple[str, bool]:
         url = "https://www.mintchain.io/api/tree/green-id"
         response, data = await self.request("GET", url)
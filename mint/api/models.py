@@ -1,7 +1,21 @@
-from typing import Optional, Any
+from typing import Generic, Optional, Any, TypeVar
 from datetime import datetime
 
 from pydantic import BaseModel, Field, field_validator
+from typing_extensions import TypedDict
+
+
+T = TypeVar("T")
+
+
+class Envelope(TypedDict, Generic[T], total=False):
+    """
+    Ответ Mint API: {"code": 10000, "result": ...} или {"code": ..., "msg": ...} при ошибке.
+    TypedDict, а не модель: обертка проверяется без создания лишнего объекта
+    """
+    code: int
+    msg: Optional[str]
+    result: Optional[T]
 
 
 class Asset(BaseModel):
@@ -57,6 +71,11 @@ class User(BaseModel):
         return int(v) if v is not None and v.isdigit() else v
 
 
+class LoginResult(BaseModel):
+    access_token: str
+    user: User
+
+
 class Task(BaseModel):
     id: int
     name: str
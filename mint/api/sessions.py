@@ -0,0 +1,119 @@
+"""
+Пул HTTP сессий Mint API (SESSIONS), общий для всех клиентов процесса:
+- Сессия (curl_cffi) выдается HTTPClient на время жизни клиента и возвращается в пул при закрытии,
+    поэтому keep-alive соединения через прокси переживают повторы и переходят к следующему аккаунту
+    на том же прокси: TCP и TLS рукопожатия не повторяются.
+- Ключ пула — прокси и профиль браузера (impersonate). Куки сессии очищаются при возврате.
+- Свободные сессии закрываются через SESSIONS.IDLE_TIMEOUT секунд,
+    у одного ключа хранится не более SESSIONS.MAX_IDLE_PER_PROXY свободных сессий.
+- close() закрывает все сессии (в конце запуска, см. process_groups).
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+
+from better_proxy import Proxy
+from twitter.base import BaseAsyncSession
+
+from common.loop import LoopBound
+
+from ..config import CONFIG
+
+
+SessionKey = tuple[str | None, str]
+
+
+def session_key(proxy: Proxy | None, impersonate: str = None) -> SessionKey:
+    return proxy.as_url if proxy else None, str(impersonate or BaseAsyncSession.DEFAULT_IMPERSONATE)
+
+
+class SessionPool(LoopBound):
+    def __init__(self):
+        self._idle: dict[SessionKey, list[tuple[float, BaseAsyncSession]]] = defaultdict(list)
+        self._keys: dict[BaseAsyncSession, SessionKey] = {}
+        self.created = 0
+        self.reused = 0
+
+    def _reset_loop_state(self):
+        # Сессии прошлого event loop закрыть уже нельзя
+        self._idle.clear()
+        self._keys.clear()
+
+    def acquire(self, proxy: Proxy | None = None, **session_kwargs) -> BaseAsyncSession:
+        """
+        :return: Свободная сессия с тем же прокси и профилем браузера или новая
+        """
+        self._check_loop()
+        key = session_key(proxy, session_kwargs.get("impersonate"))
+        idle = self._idle.get(key)
+        if idle:
+            _, session = idle.pop()
+            self.reused += 1
+            return session
+
+        session = BaseAsyncSession(proxy=proxy, **session_kwargs)
+        self._keys[session] = key
+        self.created += 1
+        return session
+
+    def discard(self, session: BaseAsyncSession):
+        """
+        Сессия не вернется в пул, а закроется при release.
+        """
+        self._keys.pop(session, None)
+
+    async def release(self, session: BaseAsyncSession):
+        """
+        Возвращает сессию в пул (или закрывает, если пул выключен или полон).
+        """
+        self._check_loop()
+        key = self._keys.get(session)
+        if (key is None or not CONFIG.SESSIONS.ENABLED
+                or len(self._idle[key]) >= CONFIG.SESSIONS.MAX_IDLE_PER_PROXY):
+            await self._close(session)
+        else:
+            session.cookies.clear()
+            self._idle[key].append((time.monotonic(), session))
+        await self.evict_idle()
+
+    async def evict_idle(self):
+        """
+        Закрывает сессии, свободные дольше SESSIONS.IDLE_TIMEOUT.
+        """
+        expired_before = time.monotonic() - CONFIG.SESSIONS.IDLE_TIMEOUT
+        expired = []
+        for key, idle in list(self._idle.items()):
+            # Свободные сессии одного ключа лежат по времени возврата
+            while idle and idle[0][0] < expired_before:
+                expired.append(idle.pop(0)[1])
+            if not idle:
+                del self._idle[key]
+        for session in expired:
+            await self._close(session)
+
+    async def _close(self, session: BaseAsyncSession):
+        self._keys.pop(session, None)
+        await session.close()
+
+    async def close(self):
+        if self._loop is not asyncio.get_running_loop():
+            return
+
+        sessions = [session for idle in self._idle.values() for _, session in idle]
+        self._idle.clear()
+        for session in sessions:
+            await self._close(session)
+
+    def __bool__(self):
+        return bool(self.created)
+
+    def __str__(self):
+        return f"HTTP sessions: created {self.created}, reused {self.reused}"
+
+    def reset_stats(self):
+        self.created = 0
+        self.reused = 0
+
+
+session_pool = SessionPool()
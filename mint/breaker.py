@@ -0,0 +1,152 @@
+"""
+Предохранитель на время обслуживания mintchain.io (ответ "System Maintenance"):
+- Первый такой ответ размыкает предохранитель: новые аккаунты не запускаются,
+    новые запросы к Mint API ждут. Уже отправленные не отменяются: шаг с побочными эффектами (твит, Discord)
+    не прерывается на середине. Запрос, на который сайт ответил "System Maintenance", сервер не выполнил,
+    поэтому он ждет и отправляется повторно (см. HTTPClient.request), а шаг продолжается с того же места.
+    Ожидание не учитывается в дедлайнах шага и аккаунта (см. mint.deadline.paused).
+- Через MAINTENANCE.PROBE_DELAY один запрос пропускается как пробный.
+    Если сайт снова отвечает "System Maintenance", пауза до следующей пробы удваивается (до MAINTENANCE.MAX_PROBE_DELAY).
+- Как только на пробный запрос приходит ответ (успешный или HTTPException), предохранитель замыкается
+    и работа продолжается. Если пробный запрос не дошел до сайта (ошибка прокси, таймаут, DNS),
+    пробу делает следующий запрос.
+- Если пробы отключены (MAINTENANCE.PROBE = false), ожидающие запросы сразу получают MaintenanceError
+    и запуск останавливается, как и раньше.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from enum import Enum
+from typing import AsyncIterator
+
+from loguru import logger
+
+from common.loop import LoopBound
+
+from .api.errors import HTTPException, MaintenanceError
+from .config import CONFIG
+from .deadline import paused
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"  # Работаем
+    OPEN = "open"  # Обслуживание, запросы ждут
+    HALF_OPEN = "half-open"  # Пропускается один пробный запрос
+
+
+def is_maintenance(exc: BaseException) -> bool:
+    if isinstance(exc, MaintenanceError):
+        return True
+    return isinstance(exc, HTTPException) and exc.message == "System Maintenance"
+
+
+class MaintenanceBreaker(LoopBound):
+    def __init__(self, probe: bool = True, probe_delay: float = 60, max_probe_delay: float = 900):
+        self.probe = probe
+        self.probe_delay = probe_delay
+        self.max_probe_delay = max_probe_delay
+        self.state = BreakerState.CLOSED
+        self._changed: asyncio.Event | None = None
+        self._probe_task: asyncio.Task | None = None
+        self._delay = probe_delay
+        self._timer: asyncio.TimerHandle | None = None
+
+    def _reset_loop_state(self):
+        self.state = BreakerState.CLOSED
+        self._changed = asyncio.Event()
+        self._probe_task = None
+        self._delay = self.probe_delay
+        self._timer = None
+
+    def _set_state(self, state: BreakerState):
+        self.state = state
+        # Будим всех ожидающих, дальше каждый проверяет состояние сам
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def trip(self):
+        """
+        Размыкает предохранитель. Новые запросы к Mint API ждут, отправленные выполняются до конца.
+        """
+        self._check_loop()
+        if self._probe_task is not None and self._probe_task is asyncio.current_task():
+            self._probe_task = None
+            self._delay = min(self._delay * 2, self.max_probe_delay)
+        elif self.state is not BreakerState.CLOSED:
+            return
+        else:
+            logger.warning("На сайте mintchain происходит обновление. Запросы к Mint API приостановлены")
+
+        self._set_state(BreakerState.OPEN)
+
+        if self.probe:
+            logger.info(f"Next Mint API probe in {self._delay:.0f} sec.")
+            self._timer = self._loop.call_later(self._delay, self._set_state, BreakerState.HALF_OPEN)
+
+    def _reset(self):
+        self._probe_task = None
+        self._delay = self.probe_delay
+        logger.success("Mint API is back. Resuming")
+        self._set_state(BreakerState.CLOSED)
+
+    async def _admit(self):
+        while True:
+            if self.state is BreakerState.CLOSED:
+                return
+
+            if not self.probe:
+                raise MaintenanceError()
+
+            if self.state is BreakerState.HALF_OPEN and self._probe_task is None:
+                self._probe_task = asyncio.current_task()
+                return
+
+            await self._changed.wait()
+
+    async def wait_dispatch(self):
+        """
+        Ждет, пока можно запускать новые аккаунты: предохранитель замкнут или пора делать пробный запрос.
+        """
+        self._check_loop()
+        while self.state is BreakerState.OPEN and self.probe:
+            await self._changed.wait()
+
+    @asynccontextmanager
+    async def guard(self) -> AsyncIterator[None]:
+        """
+        Оборачивает один запрос к Mint API.
+        """
+        self._check_loop()
+        if self.state is BreakerState.CLOSED:
+            await self._admit()
+        else:
+            async with paused():
+                await self._admit()
+
+        task = asyncio.current_task()
+        try:
+            yield
+        except Exception as exc:
+            if is_maintenance(exc):
+                self.trip()
+            elif self._probe_task is task and isinstance(exc, HTTPException):
+                # Сайт ответил, пусть и ошибкой, значит обслуживание закончилось.
+                # Ошибка соединения (прокси, таймаут, DNS) ничего не говорит о сайте:
+                # пробу сделает следующий запрос (см. finally)
+                self._reset()
+            raise
+        else:
+            if self._probe_task is task:
+                self._reset()
+        finally:
+            if self._probe_task is task:
+                # Пробный запрос прерван: пробу сделает следующий запрос
+                self._probe_task = None
+                self._set_state(self.state)
+
+
+mint_breaker = MaintenanceBreaker(
+    CONFIG.MAINTENANCE.PROBE,
+    CONFIG.MAINTENANCE.PROBE_DELAY,
+    CONFIG.MAINTENANCE.MAX_PROBE_DELAY,
+)
@@ -1,5 +1,7 @@
 import asyncio
+from contextlib import asynccontextmanager
 from functools import wraps
+from typing import AsyncIterator
 import random
 
 from loguru import logger
@@ -7,8 +9,11 @@ from better_web3.utils import sign_message
 from eth_utils import to_wei
 from eth_account.account import LocalAccount
 import web3
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from .database import AsyncSessionmaker, MintAccount, MintUser, update_or_create
+from common.utils import utcnow
+
+from .database import AsyncSessionmaker, MintAccount, MintUser, update_account_state, update_or_create
 from .api.http import HTTPClient
 from .api.errors import HTTPException
 from .api.models import Task
@@ -18,7 +23,9 @@ from .errors import TwitterScriptError
 from .onchain.scripts import request_balances, wait_fot_tx_receipt
 from .onchain.chains import sepolia, mintchain_testnet, mintchain
 from .onchain.contracts import eth_to_mintchain_bridge
-from .config import CONFIG
+from .config import CONFIG, BRIDGE_POLL_INTERVAL
+from .deadline import bridge_timeout, time_left
+from .limits import service_limits
 
 
 TWITTER_OAUTH2_PARAMS = {
@@ -44,10 +51,32 @@ DISCORD_MINTCHAIN_GUILD_VERIFY_REACTION = '✅'
 
 
 class Client:
-    def __init__(self, account: MintAccount):
+    def __init__(self, account: MintAccount, keep_sessions: bool = False):
+        """
+        :param keep_sessions: Не закрывать сессию Twitter между шагами (закрывается в close()).
+            Используется в стадийном режиме, где клиент живет все стадии (см. mint.pipeline).
+        """
         self._account = None
-        self.http = HTTPClient()
+        self.http = HTTPClient(timeout=CONFIG.REQUESTS.TIMEOUT)
         self.account = account
+        self.keep_sessions = keep_sessions
+        self._twitter_client: TwitterClient | None = None
+        # Шаги аккаунта выполняются параллельно (см. mint.steps), а объекты аккаунта
+        #   можно добавить только в одну открытую сессию, поэтому сессии открываются по очереди
+        self.db_lock = asyncio.Lock()
+        self._relogin_lock = asyncio.Lock()
+        # Изменения аккаунта и пользователя копятся и записываются в бд одним обращением (см. save):
+        #   в конце обработки, а с журналом запуска еще и перед отметкой о выполнении шага
+        self._account_changes: dict = {}
+        self._user_changes: dict = {}
+        # Данные пользователя совпадают с сайтом (запрошены и дальше изменены по ответам), см. request_self
+        self._user_fresh = False
+        # Сколько раз данные пользователя устаревали (см. _invalidate_user)
+        self._user_invalidations = 0
+        # Номер последнего изменения данных пользователя и номер изменения каждого поля (см. request_self)
+        self._user_version = 0
+        self._user_field_versions: dict[str, int] = {}
+        self._user_lock = asyncio.Lock()
 
     @property
     def account(self) -> MintAccount:
@@ -57,9 +86,113 @@ class Client:
     def account(self, account: MintAccount):
         self._account = account
         self.http.auth_token = account.auth_token
+        self.http.proxy_database_id = account.proxy_database_id
+        self.http.account_database_id = account.database_id
+
+        if self.account.proxy:
+            self.http.proxy = account.proxy.better_proxy
+
+    @asynccontextmanager
+    async def _db_session(self) -> AsyncIterator[AsyncSession]:
+        async with self.db_lock:
+            async with AsyncSessionmaker() as session:
+                yield session
 
+    def _new_twitter_client(self) -> TwitterClient:
+        # TODO Вынести эту конструкцию как @property MintAccount.better_proxy
+        proxy = None
         if self.account.proxy:
-            self.http._session.proxy = account.proxy.better_proxy
+            proxy = self.account.proxy.better_proxy
+
+        return TwitterClient(
+            self.account.twitter_account,
+            proxy=proxy,
+            proxy_database_id=self.account.proxy_database_id,
+            db_lock=self.db_lock,
+        )
+
+    @asynccontextmanager
+    async def _twitter_session(self) -> AsyncIterator[TwitterClient]:
+        """
+        Данные аккаунта Twitter сохраняются в бд по завершении, как и при закрытии TwitterClient
+        """
+        if not self.keep_sessions:
+            async with self._new_twitter_client() as twitter_client:
+                yield twitter_client
+            return
+
+        if self._twitter_client is None:
+            self._twitter_client = await self._new_twitter_client().__aenter__()
+
+        try:
+            yield self._twitter_client
+        finally:
+            await self._twitter_client.save()
+
+    async def close(self):
+        if self._twitter_client is not None:
+            await self._twitter_client.close()
+            self._twitter_client = None
+        await self.http.close()
+
+    def update_account(self, **values):
+        """
+        Меняет поля аккаунта. В бд они записываются в save.
+        """
+        for key, value in values.items():
+            setattr(self.account, key, value)
+        self._account_changes.update(values)
+
+    def _update_user(self, **values):
+        self._user_version += 1
+        for key, value in values.items():
+            setattr(self.account.user, key, value)
+            self._user_field_versions[key] = self._user_version
+        self._user_changes.update(values)
+
+    def _invalidate_user(self):
+        """
+        Данные пользователя на сайте изменились не по ответу: следующий request_self запросит их снова
+        """
+        self._user_fresh = False
+        self._user_invalidations += 1
+
+    def _add_me(self, amount):
+        """
+        Начисляет энергию из ответа (claim, open-box, task-submit) без повторного запроса пользователя.
+        """
+        if isinstance(amount, int) and not isinstance(amount, bool):
+            self._update_user(me=(self.account.user.me or 0) + amount)
+        else:
+            self._invalidate_user()
+
+    async def save(self):
+        """
+        Записывает накопленные изменения аккаунта и пользователя одним обращением к бд.
+        Изменения, которые параллельные шаги сделают во время записи, запишет следующий save.
+        Возвращается после записи всех изменений, сделанных до вызова, в том числе начатой другим шагом.
+        """
+        async with self.db_lock:
+            if not self._account_changes and not self._user_changes:
+                return
+
+            account_changes, self._account_changes = self._account_changes, {}
+            user_changes, self._user_changes = self._user_changes, {}
+            try:
+                async with AsyncSessionmaker() as session:
+                    await update_account_state(
+                        session,
+                        self.account.database_id,
+                        account_changes,
+                        self.account.user.id if self.account.user else None,
+                        user_changes,
+                    )
+                    await session.commit()
+            except BaseException:
+                # Не записаны: вернем, не затирая изменения, сделанные во время записи
+                self._account_changes = account_changes | self._account_changes
+                self._user_changes = user_changes | self._user_changes
+                raise
 
     async def relogin(self) -> bool:
         """
@@ -75,7 +208,7 @@ class Client:
         logger.success(f"{self.account} Logged in")
 
         # Сохраняем информацию об аккаунте в БД
-        async with AsyncSessionmaker() as session:
+        async with self._db_session() as session:
             session.add(self.account)
             self.account.auth_token = self.http.auth_token
             self.account.user, _ = await update_or_create(
@@ -86,6 +219,9 @@ class Client:
             )
             await session.commit()
 
+        # Данные пользователя из ответа на вход уже записаны и новее накопленных
+        self._user_changes.clear()
+        self._user_fresh = True
         return True
 
     async def login(self) -> bool:
@@ -109,7 +245,11 @@ class Client:
                 if not exc.message == "Authentication failed":
                     raise
 
-                await self.relogin()
+                # Параллельные шаги могут получить ошибку одновременно, но перелогин нужен один
+                auth_token = self.http.auth_token
+                async with self._relogin_lock:
+                    if self.http.auth_token == auth_token:
+                        await self.relogin()
                 return await method(self, *args, **kwargs)
 
         return wrapper
@@ -122,7 +262,7 @@ class Client:
         if not self.account.discord_account:
             return False
 
-        async with AsyncSessionmaker() as session:
+        async with self._db_session() as session:
             session.add(self.account)
             await session.refresh(self.account.discord_account, attribute_names=["mint_user"])
 
@@ -167,6 +307,8 @@ class Client:
                 verify_reaction=DISCORD_MINTCHAIN_GUILD_VERIFY_REACTION,
                 verify_message_id=DISCORD_MINTCHAIN_GUILD_VERIFY_MESSAGE_ID,
                 verify_channel_id=DISCORD_MINTCHAIN_GUILD_VERIFY_CHANNEL_ID,
+                proxy_database_id=self.account.proxy_database_id,
+                db_lock=self.db_lock,
             )
         except ValueError as exc:
             logger.warning(f"{self.account} {self.account.discord_account} {exc}")
@@ -180,6 +322,7 @@ class Client:
         logger.success(f"{self.account} {self.account.discord_account} Discord bound!")
         # Так как метод привязки Discord не возвращает id привязанного Discord аккаунта,
         #   запрашиваем данные о пользователе снова
+        self._invalidate_user()
         await self.request_self()
         return True
 
@@ -194,16 +337,10 @@ class Client:
                         f"\n\tInviter user ID: {self.account.user.inviter_user_id}")
             return False
 
-        self.account.user.inviter_user_id = await self.http.accept_invite(self.account.invite_code)
+        self._update_user(inviter_user_id=await self.http.accept_invite(self.account.invite_code))
         logger.success(f"{self.account} Account invited!"
                        f"\n\tInviter user ID: {self.account.user.inviter_user_id}"
                        f"\n\tInvite code: {self.account.invite_code}")
-
-        # Сохраняем состояние аккаунта в БД
-        async with AsyncSessionmaker() as session:
-            session.add(self.account)
-            await session.commit()
-
         return True
 
     @relogin_on_error
@@ -217,6 +354,7 @@ class Client:
         for energy in energy_list:
             if not energy.freeze:
                 claimed_me = await self.http.claim_energy(id=f"{energy.amount}_", **energy.model_dump())
+                self._add_me(claimed_me)
                 logger.success(f"{self.account} Claimed {claimed_me} energy")
                 claimed = True
 
@@ -226,9 +364,13 @@ class Client:
                 continue
 
             claimed_me = await self.http.open_box(asset.id)
+            self._add_me(claimed_me)
             logger.success(f"{self.account} Box claimed! Claimed {claimed_me} energy")
             claimed = True
 
+        # См. mint.planner
+        self.update_account(energy_claimed_at=utcnow())
+        # Запрос, только если данные пользователя еще не запрашивались или ответ не содержал энергию
         await self.request_self()
         return claimed
 
@@ -238,17 +380,23 @@ class Client:
         token_id, claimed = await self.http.get_green_id()
         _eth_account = self.account.wallet.eth_account
         if not claimed:
-            balance_wei = await mintchain.eth.get_balance(_eth_account.address)
+            async with service_limits.slot("rpc"):
+                balance_wei = await mintchain.eth.get_balance(_eth_account.address)
             if balance_wei:
                 contract_address = "0x776Fcec07e65dC03E35a9585f9194b8a9082CDdb"
                 tx_params = {
                     "data": f"0x379607f500000000000000000000000000000000000000000000000000000000000{hex(int(token_id))[2:]}"}
-                tx_params = await mintchain._build_tx_base_params(address_from=_eth_account.address,
-                                                                  address_to=contract_address, tx_params=tx_params)
-                gas = await mintchain.eth.estimate_gas(tx_params)
-                tx_params = await mintchain._build_tx_base_params(gas, tx_params=tx_params)
-                tx_params = await mintchain._build_tx_fee_params(tx_params=tx_params)
-                tx_hash = await mintchain.sign_and_send_tx(_eth_account, tx_params)
+                try:
+                    async with service_limits.slot("rpc"):
+                        tx_params = await mintchain._build_tx_base_params(address_from=_eth_account.address,
+                                                                          address_to=contract_address, tx_params=tx_params)
+                        gas = await mintchain.eth.estimate_gas(tx_params)
+                        tx_params = await mintchain._build_tx_base_params(gas, tx_params=tx_params)
+                        tx_params = await mintchain._build_tx_fee_params(tx_params=tx_params)
+                        tx_hash = await mintchain.sign_and_send_tx(_eth_account, tx_params)
+                finally:
+                    # Повтор шага должен увидеть, что Green ID уже заминчен
+                    self.http.invalidate("green-id-mint")
                 logger.success(f"{self.account} Green ID Minted.\n\tTx Hash: {tx_hash}")
             else:
                 logger.warning(f"{self.account} No ETH Mintchain mainnet balance to mint greed ID")
@@ -262,24 +410,23 @@ class Client:
 
         tasks = await self.http.request_task_list()
         unclaimed_tasks: list[Task] = [task for task in tasks if not task.claimed]
-
-        proxy = None
-        if self.account.proxy:
-            proxy = self.account.proxy.better_proxy
+        completed_task_ids = set()
 
         for task in unclaimed_tasks:
             if task.id in CONFIG.TASKS.TASK_IDS_TO_IGNORE:
                 pass
 
             elif task.id == 1:
-                async with TwitterClient(self.account.twitter_account, proxy=proxy) as twitter_client:  # type: TwitterClient
+                async with self._twitter_session() as twitter_client:
                     await twitter_client.follow("1643440230903730176")
                 claimed_me = await self.http.sumbit_task(task.id)
+                self._add_me(claimed_me)
                 interacted = True
+                completed_task_ids.add(task.id)
                 logger.success(f"{self.account} Task '{task.name}' completed! Claimed {claimed_me} energy")
 
             elif task.id == 3:
-                async with TwitterClient(self.account.twitter_account, proxy=proxy) as twitter_client:  # type: TwitterClient
+                async with self._twitter_session() as twitter_client:
                     text = """I'm collecting @Mint_Blockchain's ME $MINT in the #MintForest🌳!
 
 Mint is the L2 for NFT industry, powered by @nftscan_com and @Optimism.
@@ -289,7 +436,9 @@ Join Mint Forest here: https://mintchain.io/mint-forest
 #MintBlockchain #L2forNFT"""
                     tweet = await twitter_client.tweet(text)
                 claimed_me = await self.http.sumbit_task(task.id, twitter_url=tweet.url)
+                self._add_me(claimed_me)
                 interacted = True
+                completed_task_ids.add(task.id)
                 logger.success(f"{self.account} Task '{task.name}' completed! Claimed {claimed_me} energy")
 
             elif task.id == 5:  # Testnet Bridge task
@@ -302,6 +451,13 @@ Join Mint Forest here: https://mintchain.io/mint-forest
                     continue
 
                 if not mintchain_balance_wei:
+                    left = time_left()
+                    if left is not None and (bridge_timeout() is None or left < bridge_timeout()):
+                        logger.warning(f"{self.account} [{wallet.address}]"
+                                       f" Not enough time before the deadline to bridge ({left:.0f} sec. left)."
+                                       f" Will try next run")
+                        continue
+
                     logger.info(f"{self.account} [{wallet.address}] Bridging...")
                     try:
                         eth_to_mintchain_bridge_amount = to_wei(random.uniform(*CONFIG.BRIDGE.SEPOLIA_ETH_BRIDGE_AMOUNT_RANGE), 'ether')
@@ -316,8 +472,14 @@ Join Mint Forest here: https://mintchain.io/mint-forest
                     # tx_hash = await mintchain_to_eth_bridge.bridge(wallet, mintchain_to_eth_bridge_amount)
                     # await wait_fot_tx_receipt(mintchain, self.account, tx_hash, value=eth_to_mintchain_bridge_amount)
 
+                    # Ожидание ограничено отдельно: повтор шага по дедлайну отправил бы средства повторно
+                    wait_until = asyncio.get_running_loop().time() + CONFIG.DEADLINE.BRIDGE_WAIT
                     while not mintchain_balance_wei:
-                        sleep_time = 30  # sec.
+                        if CONFIG.DEADLINE.BRIDGE_WAIT and asyncio.get_running_loop().time() >= wait_until:
+                            logger.warning(f"{self.account} [{wallet.address}]"
+                                           f" Bridged funds did not arrive in {CONFIG.DEADLINE.BRIDGE_WAIT:g} sec.")
+                            break
+                        sleep_time = BRIDGE_POLL_INTERVAL
                         logger.info(
                             f"{self.account} [{wallet.address}]"
                             f" No {mintchain_testnet.name} ${mintchain_testnet.native_currency.symbol} balance."
@@ -325,8 +487,13 @@ Join Mint Forest here: https://mintchain.io/mint-forest
                         await asyncio.sleep(sleep_time)
                         sepolia_balance_wei, mintchain_balance_wei = await request_balances(self.account)
 
+                    if not mintchain_balance_wei:
+                        continue
+
                 claimed_me = await self.http.sumbit_task(task.id)
+                self._add_me(claimed_me)
                 interacted = True
+                completed_task_ids.add(task.id)
                 logger.success(f"{self.account} Task '{task.name}' completed! Claimed {claimed_me} energy")
 
             elif task.id == 2:  # Discord bind task
@@ -338,7 +505,7 @@ Join Mint Forest here: https://mintchain.io/mint-forest
                                    f" Информация о Discord аккаунте этого Mint аккаунта не запрошена")
                     continue
 
-                async with AsyncSessionmaker() as session:
+                async with self._db_session() as session:
                     session.add(self.account)
                     await session.refresh(self.account.discord_account, attribute_names=["mint_user"])
 
@@ -350,38 +517,58 @@ Join Mint Forest here: https://mintchain.io/mint-forest
                 # TODO Проверка на нахождение на сервере
 
                 claimed_me = await self.http.submit_discord_task()
+                self._add_me(claimed_me)
                 interacted = True
+                completed_task_ids.add(task.id)
                 logger.success(f"{self.account} Task '{task.name}' completed! Claimed {claimed_me} energy")
 
             else:
                 logger.warning(f"{self.account} Can't complete task '{task.name}'")
 
+        # Если невыполненных заданий не осталось, до следующей проверки шаг пропускается (см. mint.planner)
+        if all(task.id in completed_task_ids or task.id in CONFIG.TASKS.TASK_IDS_TO_IGNORE
+               for task in unclaimed_tasks):
+            self.update_account(tasks_completed_at=utcnow())
+
         return interacted
 
     @relogin_on_error
     async def request_self(self):
-        user = await self.http.request_self()
-        logger.info(f"{self.account} User data requested")
-
-        # Сохраняем информацию о пользователе в БД
-        async with AsyncSessionmaker() as session:
-            session.add(self.account)
-            # По сути это как update из Django ORM
-            # Здесь нет смысла делать update_or_create, так как аккаунт уже создан и запрошен на моменте логина
-            for key, value in user.model_dump().items():
-                setattr(self.account.user, key, value)
-            await session.commit()
+        """
+        Запрашивает данные пользователя, если они могли измениться.
+        Одновременные вызовы из параллельных шагов объединяются в один запрос,
+        изменения по ответам (энергия, инвайт, инжект) применяются без запроса.
+        В бд данные записываются в save.
+        """
+        async with self._user_lock:
+            if self._user_fresh:
+                return
+
+            version = self._user_version
+            invalidations = self._user_invalidations
+            user = await self.http.request_self()
+            logger.info(f"{self.account} User data requested")
+            # Здесь нет смысла делать update_or_create, так как аккаунт уже создан и запрошен на моменте логина.
+            #   Поля, которые параллельные шаги изменили во время запроса (инвайт, привязки, энергия), новее ответа
+            self._update_user(**{key: value for key, value in user.model_dump().items()
+                                 if self._user_field_versions.get(key, 0) <= version})
+            # Если данные устарели во время запроса (привязка, верификация), ответ мог их не застать
+            self._user_fresh = self._user_invalidations == invalidations
 
     @relogin_on_error
     async def inject_all(self) -> bool:
         """
         :return: Interacted (Injected or not)
         """
+        # Баланс мог измениться после последнего запроса (клейм энергии, задания)
+        await self.request_self()
         if not self.account.user.me:
             return False
 
-        await self.http.inject(self.account.user.me, self.account.wallet.address)
-        logger.success(f"{self.account} Injected {self.account.user.me} ME")
+        me = self.account.user.me
+        await self.http.inject(me, self.account.wallet.address)
+        logger.success(f"{self.account} Injected {me} ME")
+        self._update_user(me=0, injected_me=(self.account.user.injected_me or 0) + me)
         await self.request_self()
         return True
 
@@ -399,7 +586,7 @@ Join Mint Forest here: https://mintchain.io/mint-forest
             if exc.message == "Unfortunately, you did not pass our verification process.":
                 # Если кошелек не прошел проверку, сохраняем информацию об этом
                 self.account.wallet.verification_failed = True
-                async with AsyncSessionmaker() as session:
+                async with self._db_session() as session:
                     session.add(self.account)
                     await session.commit()
                 raise
@@ -413,13 +600,15 @@ Join Mint Forest here: https://mintchain.io/mint-forest
                 raise
 
         logger.success(f"{self.account} {self.account.wallet.address} Wallet verified!")
+        self._update_user(status="verified")
+        self._invalidate_user()
         return True
 
     @relogin_on_error
     async def try_to_bind_twitter(self) -> bool:
 
         # Запрашиваем у БД все требуемые для работы данные
-        async with AsyncSessionmaker() as session:
+        async with self._db_session() as session:
             session.add(self.account)
             await session.refresh(self.account, attribute_names=["twitter_account"])
             await session.refresh(self.account.twitter_account, attribute_names=["user"])
@@ -430,14 +619,9 @@ Join Mint Forest here: https://mintchain.io/mint-forest
             logger.warning(f"{self.account} No Twitter account")
             return False
 
-        # TODO Вынести эту конструкцию как @property MintAccount.better_proxy
-        proxy = None
-        if self.account.proxy:
-            proxy = self.account.proxy.better_proxy
-
         # Проверяем, запрошена ли информация о пользователе Twitter
         if not self.account.twitter_account.user:
-            async with TwitterClient(self.account.twitter_account, proxy=proxy):
+            async with self._twitter_session():
                 # Здесь неявно запрашивается информация о пользователе
                 pass
 
@@ -467,7 +651,7 @@ Join Mint Forest here: https://mintchain.io/mint-forest
 
         # Проверку на срок было решено отключить, так как, если что, api mintchain просто вернет ошибку в запросе
 
-        async with TwitterClient(self.account.twitter_account, proxy=proxy) as twitter_client:  # type: TwitterClient
+        async with self._twitter_session() as twitter_client:
 
             # if twitter_client.account.followers_count < 10:
             #     raise TwitterScriptError(
@@ -481,7 +665,7 @@ Join Mint Forest here: https://mintchain.io/mint-forest
             auth_code = await twitter_client.oauth2(**TWITTER_OAUTH2_PARAMS)
 
         try:
-            self.account.user.twitter_id = await self.http.bind_twitter(self.account.wallet.address, auth_code)
+            self._update_user(twitter_id=await self.http.bind_twitter(self.account.wallet.address, auth_code))
             logger.success(f"{self.account} Twitter bound")
         except HTTPException as exc:
             if exc.message == "Necessary condition: followers >= 10":
@@ -494,9 +678,4 @@ Join Mint Forest here: https://mintchain.io/mint-forest
                 raise
             # TODO Делать проверка на ошибку bound_to_another_mint_user
 
-        # Сохраняем информацию об аккаунте в БД
-        async with AsyncSessionmaker() as session:
-            session.add(self.account)
-            await session.commit()
-
         return True
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 
 from common.utils import load_toml
 
@@ -22,6 +22,118 @@ class TasksConfig(BaseModel):
     TASK_IDS_TO_IGNORE: tuple = (6, )
 
 
+class ProxyConfig(BaseModel):
+    MAX_ACCOUNTS: int = 1  # Сколько аккаунтов одновременно работают через один прокси (0 - без ограничений)
+    REQUESTS_PER_MINUTE: float = 0  # Запросов в минуту через один прокси (0 - без ограничений)
+    BURST: int = 5
+
+
+class SchedulerConfig(BaseModel):
+    PERIOD_HOURS: float = 24  # Бесконечный режим: как часто запускается каждый аккаунт
+    RETRY_MINUTES: float = 30  # Через сколько повторить аккаунт, обработка которого не удалась (0 - через период)
+
+
+class RetryConfig(BaseModel):
+    # Пауза перед первым повтором шага — CONCURRENCY.DELAY_BETWEEN_RETRIES, затем растет в MULTIPLIER раз
+    MULTIPLIER: float = 2
+    MAX_DELAY: float = 120  # sec.
+    STEP_MAX_ATTEMPTS: dict[str, int] = {}  # Попыток на шаг (по умолчанию CONCURRENCY.MAX_RETRIES)
+
+
+class MaintenanceConfig(BaseModel):
+    PROBE: bool = True  # Ждать окончания обновления mintchain.io, проверяя одним запросом (false - остановить скрипт)
+    PROBE_DELAY: float = 60  # sec. Пауза перед первой проверкой, дальше удваивается
+    MAX_PROBE_DELAY: float = 900  # sec.
+
+
+class PipelineConfig(BaseModel):
+    BATCH_SIZE: int = 500  # Стадийный режим: сколько аккаунтов проходят стадии вместе
+    STAGE_MAX_TASKS: dict[str, int] = {}  # Одновременных задач на стадию (по умолчанию CONCURRENCY.MAX_TASKS)
+
+
+class PlannerConfig(BaseModel):
+    ENABLED: bool = True  # Пропускать шаги, которым по данным из бд нечего делать
+    ENERGY_RESET_HOUR: int = 0  # Час (UTC), в который на сайте снова можно собирать энергию
+    TASKS_RECHECK_DAYS: float = 7  # Как часто проверять новые задания, если все известные выполнены
+
+
+BRIDGE_TASK_ID = 5
+BRIDGE_POLL_INTERVAL = 30  # sec. Как часто проверяется баланс Mintchain после бриджа
+
+
+class DeadlineConfig(BaseModel):
+    # sec. 0 - без ограничения
+    STEP: float = 300  # Одна попытка шага
+    STEPS: dict[str, float] = {"complete_tasks": 900}  # Для отдельных шагов
+    ACCOUNT: float = 1800  # Обработка аккаунта (без пауз между попытками)
+    BRIDGE_WAIT: float = 600  # Ожидание средств после бриджа в задании Bridge
+
+
+class ShutdownConfig(BaseModel):
+    GRACE_PERIOD: float = 60  # sec. Сколько ждать начатые аккаунты после Ctrl+C или SIGTERM
+
+
+class DatabaseConfig(BaseModel):
+    URL: str | None = None  # SQLAlchemy URL (async драйвер). По умолчанию SQLite в input/.db
+
+
+class LeaseConfig(BaseModel):
+    ENABLED: bool = False  # Захватывать аккаунты перед обработкой (несколько хостов на одной бд)
+    DURATION: float = 300  # sec. Срок аренды. Продлевается, пока аккаунт в работе
+
+
+class LimitsConfig(BaseModel):
+    # Одновременных запросов к сервису на процесс (0 - без ограничений), см. mint.limits
+    MINT_API: int = 0
+    TWITTER: int = 5
+    DISCORD: int = 2  # Сессии Discord gateway
+    RPC: int = 5
+
+
+class PriorityConfig(BaseModel):
+    # Порядок аккаунтов по ожидаемой пользе на запрос, см. mint.priority
+    ENABLED: bool = False  # Обычный режим: перед запуском загружаются записи всех аккаунтов
+    NEW_ACCOUNT: float = 3  # Ценность аккаунта, который еще не заходил (вход, верификация, привязки)
+    ENERGY: float = 1  # Энергия, которую можно собрать
+    TASKS: float = 1  # Задания, которые могут быть не выполнены
+    ME: float = 0.001  # За единицу не вложенной энергии (MintUser.me)
+    STALENESS_PER_DAY: float = 0.2  # Прибавка к ценности за день с последнего успешного запуска
+    MAX_STALE_DAYS: float = 7
+    FAILURE_DECAY: float = 0.3  # Вес последнего запуска в failure_rate
+
+
+class SessionsConfig(BaseModel):
+    # Пул HTTP сессий Mint API по прокси, см. mint.api.sessions
+    ENABLED: bool = True  # Переиспользовать keep-alive соединения между повторами и аккаунтами на одном прокси
+    MAX_IDLE_PER_PROXY: int = 2  # Свободных сессий на прокси
+    IDLE_TIMEOUT: float = 60  # sec. Свободная сессия закрывается
+
+
+class CacheConfig(BaseModel):
+    # Кэш ответов Mint API, которые только читают данные, см. mint.api.cache
+    ENABLED: bool = True
+    # sec. Сколько хранится ответ endpoint для пользователя (0 - не кэшировать)
+    TTL: dict[str, float] = {
+        "user-info": 30,
+        "energy-list": 60,
+        "asset": 60,
+        "task-list": 300,
+        "green-id": 600,
+    }
+
+
+class TracingConfig(BaseModel):
+    # Трассировка запросов к Mint API в log/requests.jsonl, см. mint.tracing
+    ENABLED: bool = False
+    MAX_BYTES: int = 50 * 1024 * 1024  # Размер файла, после которого он ротируется
+    BACKUPS: int = 3  # Сколько старых файлов хранить
+
+
+class ReloadConfig(BaseModel):
+    ENABLED: bool = True  # Применять изменения config.toml без перезапуска, см. mint.reload
+    INTERVAL: float = 5  # sec.
+
+
 class Config(BaseModel):
     LOGGING: LoggingConfig
     CONCURRENCY: ConcurrencyConfig
@@ -31,6 +143,43 @@ class Config(BaseModel):
     TRANSACTION: TransactionConfig
     BRIDGE: BridgeConfig
     TASKS: TasksConfig
+    PROXY: ProxyConfig = ProxyConfig()
+    SCHEDULER: SchedulerConfig = SchedulerConfig()
+    PIPELINE: PipelineConfig = PipelineConfig()
+    RETRY: RetryConfig = RetryConfig()
+    MAINTENANCE: MaintenanceConfig = MaintenanceConfig()
+    PLANNER: PlannerConfig = PlannerConfig()
+    DEADLINE: DeadlineConfig = DeadlineConfig()
+    SHUTDOWN: ShutdownConfig = ShutdownConfig()
+    DATABASE: DatabaseConfig = DatabaseConfig()
+    LEASE: LeaseConfig = LeaseConfig()
+    LIMITS: LimitsConfig = LimitsConfig()
+    PRIORITY: PriorityConfig = PriorityConfig()
+    RELOAD: ReloadConfig = ReloadConfig()
+    SESSIONS: SessionsConfig = SessionsConfig()
+    TRACING: TracingConfig = TracingConfig()
+    CACHE: CacheConfig = CacheConfig()
+
+    @model_validator(mode="after")
+    def check_bridge_deadlines(self) -> "Config":
+        """
+        Бридж в задании Bridge не должен прерываться дедлайном: повтор шага отправил бы средства повторно
+        """
+        if BRIDGE_TASK_ID in self.TASKS.TASK_IDS_TO_IGNORE:
+            return self
+
+        bridge_time = max(self.TRANSACTION.TIMEOUT, 0) + self.DEADLINE.BRIDGE_WAIT + BRIDGE_POLL_INTERVAL
+        deadlines = {
+            "DEADLINE.STEPS.complete_tasks": self.DEADLINE.STEPS.get("complete_tasks", self.DEADLINE.STEP),
+            "DEADLINE.ACCOUNT": self.DEADLINE.ACCOUNT,
+        }
+        for name, deadline in deadlines.items():
+            if deadline and (not self.DEADLINE.BRIDGE_WAIT or bridge_time >= deadline):
+                raise ValueError(
+                    f"{name} ({deadline:g} sec.) must exceed TRANSACTION.TIMEOUT + DEADLINE.BRIDGE_WAIT"
+                    f" + {BRIDGE_POLL_INTERVAL} sec. ({bridge_time:g} sec.) and DEADLINE.BRIDGE_WAIT must not be 0,"
+                    f" otherwise a bridge cut off by the deadline is sent again on retry")
+        return self
 
 
 CONFIG = Config(**load_toml(CONFIG_TOML))
@@ -1,4 +1,4 @@
-from .database import AsyncSessionmaker, alembic_utils
+from .database import AsyncSessionmaker, async_engine, alembic_utils
 from .models import (
     MintAccount,
     MintUser,
@@ -8,8 +8,33 @@ from .models import (
     DiscordGuildJoinStatus,
     Wallet,
     Proxy,
+    Run,
+    RunStep,
+)
+from .snapshot import AccountFlag, AccountSnapshot
+from .crud import (
+    get_groups,
+    get_accounts_by_groups,
+    get_account_ids_by_groups,
+    count_accounts_by_groups,
+    get_accounts_by_ids,
+    get_account_snapshots_by_groups,
+    get_account_snapshots_by_ids,
+    get_account_keys_by_groups,
+    get_unscheduled_account_ids,
+    get_due_account_ids,
+    get_nearest_run_at,
+    set_next_run_at,
+    update_account_state,
+    claim_account_leases,
+    renew_account_leases,
+    release_account_leases,
+    create_run,
+    get_last_run,
+    get_completed_steps,
+    update_or_create,
+    get_or_create,
 )
-from .crud import get_groups, get_accounts_by_groups, update_or_create, get_or_create
 
 __all__ = [
     "AsyncSessionmaker",
@@ -22,8 +47,29 @@ __all__ = [
     "DiscordGuildJoinStatus",
     "Wallet",
     "Proxy",
+    "Run",
+    "RunStep",
+    "AccountFlag",
+    "AccountSnapshot",
     "get_groups",
     "get_accounts_by_groups",
+    "get_account_ids_by_groups",
+    "count_accounts_by_groups",
+    "get_accounts_by_ids",
+    "get_account_snapshots_by_groups",
+    "get_account_snapshots_by_ids",
+    "get_account_keys_by_groups",
+    "get_unscheduled_account_ids",
+    "get_due_account_ids",
+    "get_nearest_run_at",
+    "set_next_run_at",
+    "update_account_state",
+    "claim_account_leases",
+    "renew_account_leases",
+    "release_account_leases",
+    "create_run",
+    "get_last_run",
+    "get_completed_steps",
     "update_or_create",
     "get_or_create",
 ]
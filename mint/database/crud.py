@@ -1,10 +1,14 @@
 from typing import Type, TypeVar
+from datetime import datetime
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, inspect, update, or_, and_
 from sqlalchemy.orm import joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from .models import MintAccount
+from common.utils import utcnow
+
+from .models import MintAccount, MintUser, Wallet, Run, RunStep
+from .snapshot import AccountSnapshot
 
 
 T = TypeVar('T')  # Для поддержки типизации возвращаемого значения функции
@@ -57,22 +61,332 @@ async def get_groups(session: AsyncSession) -> set[str]:
     return groups
 
 
-async def get_accounts_by_groups(session: AsyncSession, groups: list[str]) -> list[MintAccount]:
+_ACCOUNT_RELATIONSHIPS = (
+    joinedload(MintAccount.wallet),
+    joinedload(MintAccount.proxy),
+    joinedload(MintAccount.user),
+    joinedload(MintAccount.twitter_account),
+    joinedload(MintAccount.discord_account),
+    # joinedload(MintAccount.twitter_account.user),
+    # joinedload(MintAccount.user.wallet),
+    # joinedload(MintAccount.user.twitter_user),
+    # joinedload(MintAccount.user.discord_account),
+)
+
+
+def _accounts_by_groups_filter(groups: list[str]):
     # Приведение имен групп к нижнему регистру
     groups = [group.lower() for group in groups]
+    return func.lower(MintAccount.group).in_(groups)
+
+
+async def count_accounts_by_groups(session: AsyncSession, groups: list[str]) -> int:
+    query = select(func.count(MintAccount.database_id)).filter(_accounts_by_groups_filter(groups))
+    return await session.scalar(query)
+
 
+async def get_account_ids_by_groups(session: AsyncSession, groups: list[str]) -> list[int]:
+    query = select(MintAccount.database_id).filter(_accounts_by_groups_filter(groups))
+    return list(await session.scalars(query))
+
+
+async def get_accounts_by_groups(
+        session: AsyncSession,
+        groups: list[str],
+        *,
+        after_database_id: int = None,
+        limit: int = None,
+) -> list[MintAccount]:
+    """
+    :param after_database_id: Вернуть только аккаунты с database_id больше этого (для постраничной загрузки).
+    :param limit: Максимальное количество аккаунтов.
+    """
     # Запрос аккаунтов с предзагрузкой всех необходимых связей
     query = select(MintAccount).options(
-        joinedload(MintAccount.wallet),
-        joinedload(MintAccount.proxy),
-        joinedload(MintAccount.user),
-        joinedload(MintAccount.twitter_account),
-        joinedload(MintAccount.discord_account),
-        # joinedload(MintAccount.twitter_account.user),
-        # joinedload(MintAccount.user.wallet),
-        # joinedload(MintAccount.user.twitter_user),
-        # joinedload(MintAccount.user.discord_account),
-    ).filter(func.lower(MintAccount.group).in_(groups))
+        *_ACCOUNT_RELATIONSHIPS
+    ).filter(_accounts_by_groups_filter(groups)).order_by(MintAccount.database_id)
+
+    if after_database_id is not None:
+        query = query.filter(MintAccount.database_id > after_database_id)
+
+    if limit is not None:
+        query = query.limit(limit)
 
     accounts = list(await session.scalars(query))
     return accounts
+
+
+async def get_accounts_by_ids(session: AsyncSession, database_ids: list[int]) -> list[MintAccount]:
+    query = select(MintAccount).options(
+        *_ACCOUNT_RELATIONSHIPS
+    ).filter(MintAccount.database_id.in_(database_ids))
+    accounts_by_id = {account.database_id: account for account in await session.scalars(query)}
+    # Сохраняем порядок database_ids
+    return [accounts_by_id[database_id] for database_id in database_ids if database_id in accounts_by_id]
+
+
+# Столбцы для AccountSnapshot.from_row
+SNAPSHOT_COLUMNS = (
+    MintAccount.database_id,
+    MintAccount.group,
+    MintAccount.proxy_database_id,
+    MintAccount.twitter_database_id,
+    MintAccount.discord_database_id,
+    MintAccount.next_run_at,
+    MintAccount.energy_claimed_at,
+    MintAccount.tasks_completed_at,
+    MintAccount.last_success_at,
+    MintAccount.failure_rate,
+    Wallet.verification_failed,
+    MintUser.id.label("user_id"),
+    MintUser.status,
+    MintUser.inviter_user_id,
+    MintUser.twitter_id,
+    MintUser.discord_id,
+    MintUser.me,
+)
+
+
+def _snapshots_query():
+    return (select(*SNAPSHOT_COLUMNS)
+            .join(MintAccount.wallet)
+            .outerjoin(MintUser, MintAccount.mint_user_id == MintUser.id))
+
+
+async def get_account_snapshots_by_groups(
+        session: AsyncSession,
+        groups: list[str],
+        *,
+        after_database_id: int = None,
+        limit: int = None,
+) -> list[AccountSnapshot]:
+    """
+    Как get_accounts_by_groups, но без ORM объектов (см. AccountSnapshot)
+    """
+    query = _snapshots_query().filter(_accounts_by_groups_filter(groups)).order_by(MintAccount.database_id)
+
+    if after_database_id is not None:
+        query = query.filter(MintAccount.database_id > after_database_id)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return [AccountSnapshot.from_row(row) for row in await session.execute(query)]
+
+
+async def get_account_snapshots_by_ids(session: AsyncSession, database_ids: list[int]) -> list[AccountSnapshot]:
+    query = _snapshots_query().filter(MintAccount.database_id.in_(database_ids))
+    snapshots_by_id = {row.database_id: AccountSnapshot.from_row(row) for row in await session.execute(query)}
+    # Сохраняем порядок database_ids
+    return [snapshots_by_id[database_id] for database_id in database_ids if database_id in snapshots_by_id]
+
+
+async def get_account_keys_by_groups(
+        session: AsyncSession,
+        groups: list[str],
+        *,
+        after_database_id: int = None,
+        limit: int = None,
+) -> list[tuple[int, int | None]]:
+    """
+    :return: database_id и proxy_database_id аккаунтов по порядку database_id (для деления на части)
+    """
+    query = select(MintAccount.database_id, MintAccount.proxy_database_id).filter(
+        _accounts_by_groups_filter(groups)).order_by(MintAccount.database_id)
+
+    if after_database_id is not None:
+        query = query.filter(MintAccount.database_id > after_database_id)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    return [tuple(row) for row in await session.execute(query)]
+
+
+async def get_unscheduled_account_ids(session: AsyncSession, groups: list[str]) -> list[tuple[int, int | None]]:
+    """
+    :return: database_id и proxy_database_id аккаунтов без next_run_at
+    """
+    query = select(MintAccount.database_id, MintAccount.proxy_database_id).filter(
+        _accounts_by_groups_filter(groups),
+        MintAccount.next_run_at.is_(None),
+    ).order_by(MintAccount.database_id)
+    return [tuple(row) for row in await session.execute(query)]
+
+
+async def get_due_account_ids(session: AsyncSession, groups: list[str], now: datetime) -> list[tuple[int, int | None]]:
+    """
+    :return: database_id и proxy_database_id аккаунтов, которым пора работать, начиная с самых просроченных
+    """
+    query = select(MintAccount.database_id, MintAccount.proxy_database_id).filter(
+        _accounts_by_groups_filter(groups),
+        MintAccount.next_run_at <= now,
+    ).order_by(MintAccount.next_run_at)
+    return [tuple(row) for row in await session.execute(query)]
+
+
+async def get_nearest_run_at(session: AsyncSession, groups: list[str], after: datetime) -> datetime | None:
+    query = select(func.min(MintAccount.next_run_at)).filter(
+        _accounts_by_groups_filter(groups),
+        MintAccount.next_run_at > after,
+    )
+    return await session.scalar(query)
+
+
+async def set_next_run_at(session: AsyncSession, next_run_at_by_id: dict[int, datetime]):
+    """
+    :param next_run_at_by_id: database_id аккаунта -> новое значение next_run_at
+    """
+    if not next_run_at_by_id:
+        return
+
+    await session.execute(update(MintAccount), [
+        {"database_id": database_id, "next_run_at": next_run_at}
+        for database_id, next_run_at in next_run_at_by_id.items()
+    ])
+
+
+async def update_account_state(
+        session: AsyncSession,
+        account_database_id: int,
+        account_values: dict,
+        user_id: int | None = None,
+        user_values: dict = None,
+):
+    """
+    Записывает изменения аккаунта и пользователя Mint, накопленные за обработку (см. Client.save).
+    Ключи, которых нет среди столбцов, пропускаются.
+    """
+    if account_values:
+        await session.execute(
+            update(MintAccount)
+            .where(MintAccount.database_id == account_database_id)
+            .values(**_column_values(MintAccount, account_values))
+        )
+    if user_values and user_id is not None:
+        await session.execute(
+            update(MintUser)
+            .where(MintUser.id == user_id)
+            .values(**_column_values(MintUser, user_values))
+        )
+
+
+def _column_values(model: Type[T], values: dict) -> dict:
+    columns = inspect(model).column_attrs.keys()
+    return {key: value for key, value in values.items() if key in columns}
+
+
+async def claim_account_leases(
+        session: AsyncSession,
+        database_ids: list[int],
+        owner: str,
+        now: datetime,
+        expires_at: datetime,
+        *,
+        processed_before: datetime = None,
+) -> set[int]:
+    """
+    Захватывает свободные аккаунты одним UPDATE: проверка и захват атомарны и в SQLite, и в серверных бд.
+    Свободен аккаунт без аренды или с истекшей арендой. Своя аренда продлевается.
+
+    :param processed_before: Не захватывать аккаунты, обработанные после этого времени.
+    :return: database_id захваченных аккаунтов
+    """
+    if not database_ids:
+        return set()
+
+    released = MintAccount.lease_owner.is_(None)
+    if processed_before is not None:
+        released = and_(released, or_(MintAccount.processed_at.is_(None), MintAccount.processed_at < processed_before))
+
+    await session.execute(
+        update(MintAccount).where(
+            MintAccount.database_id.in_(database_ids),
+            or_(released, MintAccount.lease_owner == owner, MintAccount.lease_expires_at <= now),
+        ).values(lease_owner=owner, lease_expires_at=expires_at).execution_options(synchronize_session=False)
+    )
+    query = select(MintAccount.database_id).filter(
+        MintAccount.database_id.in_(database_ids),
+        MintAccount.lease_owner == owner,
+    )
+    return set(await session.scalars(query))
+
+
+async def renew_account_leases(
+        session: AsyncSession,
+        database_ids: list[int],
+        owner: str,
+        expires_at: datetime,
+) -> set[int]:
+    """
+    :return: database_id аккаунтов, аренда которых еще принадлежит owner
+    """
+    if not database_ids:
+        return set()
+
+    await session.execute(
+        update(MintAccount).where(
+            MintAccount.database_id.in_(database_ids),
+            MintAccount.lease_owner == owner,
+        ).values(lease_expires_at=expires_at).execution_options(synchronize_session=False)
+    )
+    query = select(MintAccount.database_id).filter(
+        MintAccount.database_id.in_(database_ids),
+        MintAccount.lease_owner == owner,
+    )
+    return set(await session.scalars(query))
+
+
+async def release_account_leases(
+        session: AsyncSession,
+        database_ids: list[int],
+        owner: str,
+        processed_at: datetime = None,
+):
+    """
+    :param processed_at: Если передано, аккаунты отмечаются обработанными.
+    """
+    if not database_ids:
+        return
+
+    values = {"lease_owner": None, "lease_expires_at": None}
+    if processed_at is not None:
+        values["processed_at"] = processed_at
+
+    await session.execute(
+        update(MintAccount).where(
+            MintAccount.database_id.in_(database_ids),
+            MintAccount.lease_owner == owner,
+        ).values(**values).execution_options(synchronize_session=False)
+    )
+
+
+async def create_run(session: AsyncSession, groups: list[str], shard: str = None) -> Run:
+    run = Run(groups=_run_groups_key(groups), shard=shard, started_at=utcnow())
+    session.add(run)
+    await session.commit()
+    return run
+
+
+async def get_last_run(session: AsyncSession, groups: list[str], shard: str = None) -> Run | None:
+    """
+    :return: Последний запуск этих же групп (и части, если задана)
+    """
+    query = select(Run).filter(
+        Run.groups == _run_groups_key(groups),
+        Run.shard.is_(None) if shard is None else Run.shard == shard,
+    ).order_by(Run.id.desc()).limit(1)
+    return await session.scalar(query)
+
+
+def _run_groups_key(groups: list[str]) -> str:
+    return ",".join(sorted({group.lower() for group in groups}))
+
+
+async def get_completed_steps(session: AsyncSession, run_id: int, account_database_id: int) -> set[str]:
+    query = select(RunStep.step).filter(
+        RunStep.run_id == run_id,
+        RunStep.account_database_id == account_database_id,
+        RunStep.status == "done",
+    )
+    return set(await session.scalars(query))
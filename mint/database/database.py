@@ -1,11 +1,28 @@
 from asyncio import current_task
+from sqlalchemy import event, make_url
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession, async_scoped_session
 
 from common.sqlalchemy.alembic import AsyncAlembicUtils
+from ..config import CONFIG
 from ..paths import DATABASE_FILEPATH, ALEMBIC_INI
 
-DATABASE_URL = f"sqlite+aiosqlite:///{DATABASE_FILEPATH}"
-async_engine = create_async_engine(DATABASE_URL, echo=False)
+# Общая серверная бд (DATABASE.URL) нужна, чтобы с одними аккаунтами работали несколько хостов (см. mint.leases)
+DATABASE_URL = CONFIG.DATABASE.URL or f"sqlite+aiosqlite:///{DATABASE_FILEPATH}"
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+# timeout: сколько секунд ждать, пока другой процесс держит блокировку на запись
+async_engine = create_async_engine(DATABASE_URL, echo=False, connect_args={"timeout": 30} if IS_SQLITE else {})
+
+
+if IS_SQLITE:
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        # WAL позволяет читать базу, пока другой процесс в нее пишет (см. mint.multiprocess)
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+
 AsyncSessionmaker = async_sessionmaker(
     bind=async_engine,
     class_=AsyncSession,
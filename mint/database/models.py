@@ -305,6 +305,19 @@ class MintAccount(Base):
     discord_database_id: Mapped[int | None] = mapped_column(ForeignKey("discord_account.database_id"))
     wallet_address:      Mapped[str]        = mapped_column(ForeignKey("wallet.address"))
 
+    # Бесконечный режим (см. mint.scheduler). Время в UTC
+    next_run_at: Mapped[datetime | None] = mapped_column(index=True)
+    # Планировщик шагов (см. mint.planner). Время в UTC
+    energy_claimed_at:  Mapped[datetime | None]
+    tasks_completed_at: Mapped[datetime | None]
+    # Аренда аккаунта хостом (см. mint.leases). Время в UTC
+    lease_owner:      Mapped[str | None]      = mapped_column(String(64))
+    lease_expires_at: Mapped[datetime | None] = mapped_column(index=True)
+    processed_at:     Mapped[datetime | None]
+    # Приоритет аккаунта (см. mint.priority). Время в UTC
+    last_success_at: Mapped[datetime | None]
+    failure_rate:    Mapped[float | None]  # Скользящая доля неудачных запусков (0..1)
+
     proxy:           Mapped[Proxy          | None] = relationship(back_populates="mint_accounts")
     user:            Mapped[MintUser       | None] = relationship(back_populates="mint_account")
     twitter_account: Mapped[TwitterAccount | None] = relationship(back_populates="mint_account")
@@ -317,3 +330,50 @@ class MintAccount(Base):
 
     def __str__(self):
         return f"[{self.database_id}]({self.group})" if self.group else f"[{self.database_id}]"
+
+
+class Run(Base):
+    """
+    Запуск обработки групп (см. mint.journal)
+    """
+    __tablename__ = "run"
+
+    # fmt: off
+    id:         Mapped[Int_PK]
+    groups:     Mapped[str]        = mapped_column(String(255))
+    shard:      Mapped[str | None] = mapped_column(String(16))
+    started_at: Mapped[datetime]
+
+    steps: Mapped[list["RunStep"]] = relationship(back_populates="run")
+    # fmt: on
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(id={self.id}, groups={self.groups}, shard={self.shard})"
+
+    def __str__(self):
+        return f"Run #{self.id} ({self.groups}, started at {self.started_at:%Y-%m-%d %H:%M})"
+
+
+class RunStep(Base):
+    """
+    Результат шага обработки аккаунта в рамках запуска
+    """
+    __tablename__ = "run_step"
+    __table_args__ = (PrimaryKeyConstraint("run_id", "account_database_id", "step"),)
+
+    # fmt: off
+    run_id:              Mapped[int] = mapped_column(ForeignKey("run.id"))
+    account_database_id: Mapped[int] = mapped_column(ForeignKey("mint_account.database_id"))
+    step:                Mapped[str] = mapped_column(String(32))
+
+    status:      Mapped[str]        = mapped_column(String(16))  # "done" или "failed"
+    interacted:  Mapped[bool]       = mapped_column(default=False)
+    error:       Mapped[str | None] = mapped_column(String(255))
+    finished_at: Mapped[datetime]
+
+    run: Mapped[Run] = relationship(back_populates="steps")
+    # fmt: on
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(run_id={self.run_id},"
+                f" account_database_id={self.account_database_id}, step={self.step}, status={self.status})")
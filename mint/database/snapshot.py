@@ -0,0 +1,143 @@
+"""
+Компактная запись об аккаунте (AccountSnapshot) для планирования и раздачи воркерам:
+- Только id, флаги и время, без ORM состояния и связей (Wallet с LocalAccount, Proxy с BetterProxy, ...).
+- Загружается одним запросом по столбцам (см. get_account_snapshots_by_groups).
+- Полная модель MintAccount загружается только на время обработки аккаунта (см. get_accounts_by_ids).
+"""
+
+import sys
+from datetime import datetime
+from enum import IntFlag, auto
+
+from .models import MintAccount
+
+
+class AccountFlag(IntFlag):
+    HAS_USER = auto()  # Аккаунт заходил на сайт, данные пользователя есть в бд
+    VERIFIED = auto()
+    INVITED = auto()
+    HAS_TWITTER_ACCOUNT = auto()
+    TWITTER_BOUND = auto()
+    HAS_DISCORD_ACCOUNT = auto()
+    DISCORD_BOUND = auto()
+    VERIFICATION_FAILED = auto()
+
+
+def account_flags(
+        twitter_database_id: int | None,
+        discord_database_id: int | None,
+        verification_failed: bool,
+        has_user: bool,
+        status: str = None,
+        inviter_user_id: int = None,
+        twitter_id: int = None,
+        discord_id: int = None,
+) -> AccountFlag:
+    flags = AccountFlag(0)
+    if twitter_database_id is not None:
+        flags |= AccountFlag.HAS_TWITTER_ACCOUNT
+    if discord_database_id is not None:
+        flags |= AccountFlag.HAS_DISCORD_ACCOUNT
+    if verification_failed:
+        flags |= AccountFlag.VERIFICATION_FAILED
+    if has_user:
+        flags |= AccountFlag.HAS_USER
+        if status == "verified":
+            flags |= AccountFlag.VERIFIED
+        if inviter_user_id:
+            flags |= AccountFlag.INVITED
+        if twitter_id:
+            flags |= AccountFlag.TWITTER_BOUND
+        if discord_id:
+            flags |= AccountFlag.DISCORD_BOUND
+    return flags
+
+
+class AccountSnapshot:
+    __slots__ = (
+        "database_id",
+        "group",
+        "proxy_database_id",
+        "flags",
+        "me",
+        "next_run_at",
+        "energy_claimed_at",
+        "tasks_completed_at",
+        "last_success_at",
+        "failure_rate",
+    )
+
+    def __init__(
+            self,
+            database_id: int,
+            group: str | None = None,
+            proxy_database_id: int | None = None,
+            flags: int = 0,
+            me: int = 0,
+            next_run_at: datetime | None = None,
+            energy_claimed_at: datetime | None = None,
+            tasks_completed_at: datetime | None = None,
+            last_success_at: datetime | None = None,
+            failure_rate: float | None = None,
+    ):
+        self.database_id = database_id
+        # Имен групп немного, а аккаунтов может быть сотни тысяч
+        self.group = sys.intern(group) if group else group
+        self.proxy_database_id = proxy_database_id
+        self.flags = int(flags)
+        self.me = me or 0
+        self.next_run_at = next_run_at
+        self.energy_claimed_at = energy_claimed_at
+        self.tasks_completed_at = tasks_completed_at
+        self.last_success_at = last_success_at
+        self.failure_rate = failure_rate or 0.0
+
+    @classmethod
+    def from_row(cls, row) -> "AccountSnapshot":
+        """
+        :param row: Строка запроса по столбцам SNAPSHOT_COLUMNS (см. crud)
+        """
+        return cls(
+            row.database_id,
+            row.group,
+            row.proxy_database_id,
+            account_flags(
+                row.twitter_database_id, row.discord_database_id, row.verification_failed,
+                row.user_id is not None, row.status, row.inviter_user_id, row.twitter_id, row.discord_id,
+            ),
+            row.me,
+            row.next_run_at,
+            row.energy_claimed_at,
+            row.tasks_completed_at,
+            row.last_success_at,
+            row.failure_rate,
+        )
+
+    def update(self, mint_account: MintAccount):
+        """
+        Обновляет запись по модели после обработки аккаунта
+        """
+        user = mint_account.user
+        self.group = sys.intern(mint_account.group) if mint_account.group else mint_account.group
+        self.proxy_database_id = mint_account.proxy_database_id
+        self.flags = int(account_flags(
+            mint_account.twitter_database_id, mint_account.discord_database_id, mint_account.wallet.verification_failed,
+            user is not None,
+            *((user.status, user.inviter_user_id, user.twitter_id, user.discord_id) if user is not None else ()),
+        ))
+        self.me = (user.me if user is not None else 0) or 0
+        self.next_run_at = mint_account.next_run_at
+        self.energy_claimed_at = mint_account.energy_claimed_at
+        self.tasks_completed_at = mint_account.tasks_completed_at
+        self.last_success_at = mint_account.last_success_at
+        self.failure_rate = mint_account.failure_rate or 0.0
+
+    def has(self, flag: AccountFlag) -> bool:
+        return bool(self.flags & flag)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(database_id={self.database_id}, group={self.group})"
+
+    def __str__(self):
+        # Как у MintAccount, чтобы логи не зависели от того, что передано
+        return f"[{self.database_id}]({self.group})" if self.group else f"[{self.database_id}]"
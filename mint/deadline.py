@@ -0,0 +1,142 @@
+"""
+Дедлайны (DEADLINE):
+- Каждая попытка шага ограничена DEADLINE.STEP (или DEADLINE.STEPS для отдельных шагов).
+    Зависшая попытка отменяется и считается временной ошибкой (DeadlineExceededError, см. mint.retry).
+- Обработка аккаунта ограничена DEADLINE.ACCOUNT. Выполняющиеся шаги отменяются,
+    аккаунт откладывается (завершенные шаги сохраняются) и освобождает воркер.
+- Каждый HTTP запрос ограничен REQUESTS.TIMEOUT.
+- Ожидание окончания обновления сайта (см. mint.breaker) не учитывается в дедлайнах шага и аккаунта:
+    иначе шаг отменялся бы на середине и повторялся целиком.
+- Бридж в задании Bridge не начинается, если до дедлайна не успеть дождаться транзакции и средств
+    (см. bridge_timeout): отмена после отправки средств привела бы к повторному бриджу.
+    Конфиг, в котором бридж не укладывается в дедлайны, не загружается (см. Config.check_bridge_deadlines).
+- Сработавшие дедлайны учитываются в deadline_stats.
+"""
+
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+from .config import CONFIG, BRIDGE_POLL_INTERVAL
+from .errors import DeadlineExceededError
+
+
+T = TypeVar("T")
+
+
+class DeadlineStats:
+    def __init__(self):
+        self.steps: Counter[str] = Counter()
+        self.accounts = 0
+
+    def __bool__(self):
+        return bool(self.steps or self.accounts)
+
+    def __str__(self):
+        steps = ", ".join(f"{name} {count}" for name, count in self.steps.most_common()) or "none"
+        return f"Deadlines exceeded: accounts {self.accounts}, steps: {steps}"
+
+    def reset(self):
+        self.steps.clear()
+        self.accounts = 0
+
+
+deadline_stats = DeadlineStats()
+
+# Дедлайны, которые ограничивают текущую задачу (аккаунта и попытки шага)
+_deadlines: ContextVar[tuple[asyncio.Timeout, ...]] = ContextVar("deadlines", default=())
+# Приостановленный дедлайн -> (сколько задач его приостановили, сколько оставалось до него)
+_pauses: dict[asyncio.Timeout, tuple[int, float | None]] = {}
+
+
+@contextmanager
+def tracked(deadline: asyncio.Timeout) -> Iterator[None]:
+    """
+    Делает deadline видимым для paused внутри блока (и в задачах, созданных в нем)
+    """
+    token = _deadlines.set(_deadlines.get() + (deadline, ))
+    try:
+        yield
+    finally:
+        _deadlines.reset(token)
+
+
+@asynccontextmanager
+async def paused() -> AsyncIterator[None]:
+    """
+    Время внутри блока не учитывается в дедлайнах текущей задачи: они отключаются на это время.
+    Дедлайн аккаунта общий для его параллельных шагов и возобновляется, когда его отпустят все.
+    """
+    loop = asyncio.get_running_loop()
+    deadlines = [deadline for deadline in _deadlines.get() if not deadline.expired()]
+    for deadline in deadlines:
+        count, remaining = _pauses.get(deadline, (0, None))
+        if count == 0:
+            when = deadline.when()
+            remaining = None if when is None else when - loop.time()
+            deadline.reschedule(None)
+        _pauses[deadline] = (count + 1, remaining)
+
+    try:
+        yield
+    finally:
+        for deadline in deadlines:
+            count, remaining = _pauses.pop(deadline)
+            if count > 1:
+                _pauses[deadline] = (count - 1, remaining)
+            elif remaining is not None and not deadline.expired():
+                deadline.reschedule(loop.time() + remaining)
+
+
+def step_timeout(step: str) -> float | None:
+    return CONFIG.DEADLINE.STEPS.get(step, CONFIG.DEADLINE.STEP) or None
+
+
+def account_timeout() -> float | None:
+    return CONFIG.DEADLINE.ACCOUNT or None
+
+
+def bridge_timeout() -> float | None:
+    """
+    :return: Сколько может занять бридж: ожидание транзакции и средств с последней проверкой баланса
+        (None - ожидание средств не ограничено)
+    """
+    if not CONFIG.DEADLINE.BRIDGE_WAIT:
+        return None
+    return max(CONFIG.TRANSACTION.TIMEOUT, 0) + CONFIG.DEADLINE.BRIDGE_WAIT + BRIDGE_POLL_INTERVAL
+
+
+def time_left() -> float | None:
+    """
+    :return: Сколько осталось до ближайшего дедлайна текущей задачи (None - без ограничения)
+    """
+    loop = asyncio.get_running_loop()
+    return min((deadline.when() - loop.time() for deadline in _deadlines.get() if deadline.when() is not None),
+               default=None)
+
+
+def with_deadline(action: Callable[[], Awaitable[T]], step: str) -> Callable[[], Awaitable[T]]:
+    """
+    :return: action, каждый вызов которого ограничен дедлайном шага
+    """
+    timeout = step_timeout(step)
+    if timeout is None:
+        return action
+
+    @wraps(action)
+    async def wrapper() -> T:
+        deadline = asyncio.timeout(timeout)
+        try:
+            async with deadline:
+                with tracked(deadline):
+                    return await action()
+        except TimeoutError:
+            if not deadline.expired():
+                raise
+            deadline_stats.steps[step] += 1
+            raise DeadlineExceededError(timeout) from None
+
+    return wrapper
@@ -9,6 +9,8 @@ from better_proxy import Proxy as BetterProxy
 import discord
 
 from .database import AsyncSessionmaker, DiscordAccount, DiscordGuildJoinStatus, update_or_create
+from .governor import proxy_governor
+from .limits import service_limits
 
 
 invites_paused = False
@@ -25,9 +27,15 @@ class DiscordClient(discord.Client):
             verify_reaction: str = None,
             verify_message_id: int = None,
             verify_channel_id: int = None,
+            proxy_database_id: int = None,
+            db_lock: asyncio.Lock = None,
             **options,
     ):
+        """
+        :param db_lock: Блокировка сессий БД для объектов аккаунта (см. mint.client.Client.db_lock).
+        """
         self.db_account = account
+        self.db_lock = db_lock or asyncio.Lock()
         self.auth_code = None
         self.oauth2_data = oauth2_data
         self.invite_code_or_url = invite_code_or_url
@@ -37,6 +45,15 @@ class DiscordClient(discord.Client):
         options["proxy"] = str(proxy) if proxy else None
         super().__init__(**options)
 
+        # Каждый запрос к API Discord учитывается в ограничении запросов на прокси
+        http_request = self.http.request
+
+        async def throttled_request(*args, **kwargs):
+            await proxy_governor.throttle(proxy_database_id)
+            return await http_request(*args, **kwargs)
+
+        self.http.request = throttled_request
+
     async def _run_event(
         self,
         coro,
@@ -76,7 +93,7 @@ class DiscordClient(discord.Client):
                 return
 
     async def on_ready(self):
-        async with AsyncSessionmaker() as session:
+        async with self.db_lock, AsyncSessionmaker() as session:
             session.add(self.db_account)
 
             self.db_account.status = "GOOD"
@@ -201,6 +218,8 @@ async def join_guild_and_make_oauth2(
             verify_reaction: str = None,
             verify_message_id: int = None,
             verify_channel_id: int = None,
+            proxy_database_id: int = None,
+            db_lock: asyncio.Lock = None,
     ) -> str:
     """
     :return: auth_code
@@ -213,11 +232,18 @@ async def join_guild_and_make_oauth2(
         verify_reaction=verify_reaction,
         verify_message_id=verify_message_id,
         verify_channel_id=verify_channel_id,
+        proxy_database_id=proxy_database_id,
+        db_lock=db_lock,
     )
     try:
-        await client.start()
+        async with service_limits.slot("discord"):
+            await client.start()
     except discord.errors.DiscordServerError as exc:
         logger.warning(f"{account} {exc}")
+    finally:
+        # При отмене по дедлайну (см. mint.deadline) соединение с gateway нужно закрыть
+        if not client.is_closed():
+            await client.close()
 
     if not client.auth_code:
         raise ValueError(f"Failed to authorise Discord account")
@@ -21,3 +21,47 @@ class DiscordScriptError(ScriptError):
     def __init__(self, account: DiscordAccount, exception_message: str):
         self.account = account
         super().__init__(f"{account} {exception_message}")
+
+
+class WorkerProcessError(ScriptError):
+    def __init__(self, failed_processes: list[int]):
+        self.failed_processes = failed_processes
+        super().__init__(f"Worker processes failed: {', '.join(map(str, failed_processes))}")
+
+
+class StepFailedError(ScriptError):
+    """
+    Шаг обработки аккаунта не удался (см. mint.retry). Зависящие от него шаги пропускаются
+    """
+    def __init__(self, cause: Exception):
+        self.cause = cause
+        super().__init__(str(cause))
+
+
+class RetryLaterError(ScriptError):
+    """
+    Шаг нужно повторить через delay секунд, не занимая воркер (см. mint.retry, mint.pool.Deferred)
+    """
+    def __init__(self, cause: Exception, delay: float, attempt: int):
+        self.cause = cause
+        self.delay = delay
+        self.attempt = attempt  # Номер следующей попытки
+        super().__init__(str(cause))
+
+
+class DeadlineExceededError(ScriptError):
+    """
+    Попытка шага не уложилась в дедлайн (см. mint.deadline)
+    """
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        super().__init__(f"Deadline exceeded ({timeout:g} sec.)")
+
+
+class LeaseLostError(ScriptError):
+    """
+    Аренду аккаунта забрал другой хост (см. mint.leases). Оставшиеся шаги аккаунта не выполняются
+    """
+    def __init__(self, account: MintAccount):
+        self.account = account
+        super().__init__(f"{account} Lease lost: the account is processed by another host. Stopped")
@@ -0,0 +1,131 @@
+import asyncio
+from collections import defaultdict, deque
+from functools import partial
+from typing import Callable
+
+from common.loop import LoopBound
+from common.ratelimit import TokenBucket
+
+from .config import CONFIG
+
+
+AccountKey = int | str
+
+
+def account_key(proxy_database_id: int | None, account_database_id: int) -> AccountKey:
+    """
+    Ключ ограничения max_accounts. Аккаунты без прокси работают с собственного IP и друг друга
+    не ограничивают, поэтому у каждого свой ключ (как у частей, см. mint.sharding.proxy_partition_key).
+    """
+    if proxy_database_id is None:
+        return f"account:{account_database_id}"
+    return proxy_database_id
+
+
+class ProxyGovernor(LoopBound):
+    """
+    Ограничения на один прокси (ключ — Proxy.database_id), общие для всех клиентов, которые через него ходят:
+    - Не более max_accounts аккаунтов в работе одновременно (0 - без ограничений), ключ — account_key.
+        Аккаунты, которым не хватило места, паркуются и возвращаются в работу, когда место освобождается.
+    - Не более requests_per_minute запросов (token bucket с запасом burst, 0 - без ограничений).
+        Запросы аккаунтов без прокси учитываются под ключом None (собственный IP).
+    """
+
+    def __init__(self, max_accounts: int = 0, requests_per_minute: float = 0, burst: int = 1):
+        self.max_accounts = max_accounts
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self._in_flight: dict[AccountKey, int] = defaultdict(int)
+        self._parked: dict[AccountKey, deque[Callable[[], None]]] = defaultdict(deque)
+        self._buckets: dict[int | None, TokenBucket] = {}
+
+    def _reset_loop_state(self):
+        self._in_flight.clear()
+        self._parked.clear()
+        self._buckets.clear()
+
+    def reconfigure(self, max_accounts: int, requests_per_minute: float, burst: int):
+        """
+        Меняет ограничения во время работы. Припаркованные аккаунты возвращаются в работу
+        и снова проверяют место у прокси по новым ограничениям.
+        """
+        if (max_accounts, requests_per_minute, burst) == (self.max_accounts, self.requests_per_minute, self.burst):
+            return
+
+        self.max_accounts = max_accounts
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        self._buckets.clear()
+        for key in list(self._parked):
+            for _ in range(len(self._parked.get(key, ()))):
+                self._resume_parked(key)
+
+    def in_flight(self, key: AccountKey) -> int:
+        return self._in_flight.get(key, 0)
+
+    def try_acquire_account(self, key: AccountKey) -> bool:
+        self._check_loop()
+        if self.max_accounts > 0 and self._in_flight[key] >= self.max_accounts:
+            return False
+
+        self._in_flight[key] += 1
+        return True
+
+    def park(self, key: AccountKey, resume: Callable[[], None]):
+        """
+        :param resume: Будет вызван, когда у прокси освободится место.
+        """
+        self._check_loop()
+        self._parked[key].append(resume)
+
+    def release_account(self, key: AccountKey):
+        self._check_loop()
+        self._in_flight[key] -= 1
+        if self._in_flight[key] <= 0:
+            del self._in_flight[key]
+
+        self._resume_parked(key)
+
+    def _resume_parked(self, key: AccountKey):
+        parked = self._parked.get(key)
+        if parked:
+            resume = parked.popleft()
+            if not parked:
+                del self._parked[key]
+            resume()
+
+    async def acquire_account(self, key: AccountKey):
+        """
+        Ждет места у прокси. Для кода, который сам не паркует аккаунты (см. mint.pipeline).
+        """
+        while not self.try_acquire_account(key):
+            waiter = asyncio.get_running_loop().create_future()
+            self.park(key, partial(self._wake, key, waiter))
+            await waiter
+
+    def _wake(self, key: AccountKey, waiter: asyncio.Future):
+        if waiter.done():
+            # Ожидание отменено, место достается следующему
+            self._resume_parked(key)
+        else:
+            waiter.set_result(None)
+
+    async def throttle(self, proxy_database_id: int | None):
+        """
+        Ждет разрешения на один запрос через прокси.
+        """
+        if self.requests_per_minute <= 0:
+            return
+
+        self._check_loop()
+        bucket = self._buckets.get(proxy_database_id)
+        if bucket is None:
+            bucket = self._buckets[proxy_database_id] = TokenBucket(self.requests_per_minute / 60, self.burst)
+        await bucket.acquire()
+
+
+proxy_governor = ProxyGovernor(
+    CONFIG.PROXY.MAX_ACCOUNTS,
+    CONFIG.PROXY.REQUESTS_PER_MINUTE,
+    CONFIG.PROXY.BURST,
+)
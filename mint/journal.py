@@ -0,0 +1,91 @@
+"""
+Журнал запуска:
+- Каждый запуск обработки групп получает id (таблица run).
+- Результат каждого шага обработки аккаунта (login, verify_wallet, ...) записывается в таблицу run_step.
+- При продолжении запуска (--resume) завершенные шаги пропускаются без запросов к API,
+    поэтому после падения скрипта обработанные аккаунты пролистываются за секунды.
+"""
+
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from common.utils import utcnow
+
+from .database import AsyncSessionmaker, AccountSnapshot, MintAccount, RunStep, create_run, get_last_run, get_completed_steps
+
+
+DONE = "done"
+FAILED = "failed"
+
+
+class RunJournal:
+    def __init__(self, run_id: int):
+        self.run_id = run_id
+
+    async def completed_steps(self, account: AccountSnapshot | MintAccount) -> set[str]:
+        async with AsyncSessionmaker() as session:
+            return await get_completed_steps(session, self.run_id, account.database_id)
+
+    async def record(
+            self,
+            account: MintAccount,
+            step: str,
+            status: str,
+            *,
+            interacted: bool = False,
+            error: BaseException = None,
+    ):
+        async with AsyncSessionmaker() as session:
+            await session.merge(RunStep(
+                run_id=self.run_id,
+                account_database_id=account.database_id,
+                step=step,
+                status=status,
+                interacted=interacted,
+                error=f"{type(error).__name__}: {error}"[:255] if error is not None else None,
+                finished_at=utcnow(),
+            ))
+            await session.commit()
+
+    async def run_step(
+            self,
+            account: MintAccount,
+            step: str,
+            action: Callable[[], Awaitable[bool | None]],
+            persist: Callable[[], Awaitable] = None,
+    ) -> bool:
+        """
+        Выполняет шаг и записывает результат. Ошибка записывается и пробрасывается дальше.
+
+        :param persist: Записывает изменения шага в бд (см. Client.save). Вызывается до отметки о выполнении,
+            иначе при падении процесса шаг считался бы выполненным, а его результат (twitter_id, инвайт) потерян.
+        :return: Interacted
+        """
+        try:
+            interacted = bool(await action())
+            if persist is not None:
+                await persist()
+        except Exception as exc:
+            await self.record(account, step, FAILED, error=exc)
+            raise
+
+        await self.record(account, step, DONE, interacted=interacted)
+        return interacted
+
+
+async def start_run(groups: list[str], shard: str = None, resume: bool = False) -> int:
+    """
+    :param resume: Продолжить последний запуск этих же групп, если он есть.
+    :return: id запуска
+    """
+    async with AsyncSessionmaker() as session:
+        if resume:
+            run = await get_last_run(session, groups, shard)
+            if run is not None:
+                logger.info(f"Resuming {run}")
+                return run.id
+
+        run = await create_run(session, groups, shard)
+        logger.info(f"Started {run}")
+        return run.id
@@ -0,0 +1,162 @@
+"""
+Аренда аккаунтов для совместной работы нескольких хостов с одной бд (LEASE.ENABLED):
+- Загруженные аккаунты захватываются одним UPDATE (владелец и срок аренды). Аккаунты, арендованные
+    другим хостом, пропускаются, поэтому один аккаунт никогда не обрабатывается двумя хостами одновременно.
+- Пока аккаунт в очереди или в работе, аренда продлевается в фоне (каждую треть LEASE.DURATION).
+- Аренда упавшего хоста истекает, и аккаунт забирает другой хост.
+    Если аренда потеряна, пока аккаунт в работе, его оставшиеся шаги не выполняются (см. holds, LeaseLostError).
+- Аренда считается своей только до срока, подтвержденного последним захватом или продлением (с запасом
+    EXPIRY_MARGIN): если продление не удалось или задержалось, аккаунт не обрабатывается дальше,
+    ведь после срока его может захватить другой хост.
+- По окончании обработки аренда снимается, аккаунт отмечается обработанным (MintAccount.processed_at).
+    В обычном режиме аккаунты, обработанные другим хостом после начала запуска, повторно не берутся.
+- Снятие аренды копится и записывается в бд пачкой вместе с продлением.
+
+Работает и с SQLite (несколько процессов одного хоста), и с серверной бд (DATABASE.URL).
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable
+
+from loguru import logger
+
+from common.utils import utcnow
+
+from .database import (
+    AsyncSessionmaker,
+    AccountSnapshot,
+    claim_account_leases,
+    renew_account_leases,
+    release_account_leases,
+)
+from .pool import Deferred
+
+
+EXPIRY_MARGIN = 0.2  # Доля срока аренды: запас на задержку записи в бд и разницу часов хостов
+
+
+def default_owner() -> str:
+    return f"{socket.gethostname()[:32]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class AccountLeases:
+    def __init__(self, duration: float, owner: str = None, *, processed_before: datetime = None):
+        """
+        :param duration: sec. Срок аренды.
+        :param processed_before: Не брать аккаунты, обработанные после этого времени (начало запуска).
+            В бесконечном режиме не передается: там очередь определяет MintAccount.next_run_at.
+        """
+        self.duration = timedelta(seconds=duration)
+        self.owner = owner or default_owner()
+        self.processed_before = processed_before
+        self.held: set[int] = set()
+        # Когда истекает подтвержденная в бд аренда (time.monotonic), не позже срока в бд
+        self._expires_at: dict[int, float] = {}
+        self._processed: set[int] = set()  # Обработаны, аренда еще не снята в бд
+        self._lost = 0
+
+    async def claim(self, session, database_ids: list[int]) -> set[int]:
+        """
+        Захватывает аккаунты в переданной сессии (коммит делает вызывающий).
+
+        :return: database_id захваченных аккаунтов
+        """
+        expires_at = time.monotonic() + self.duration.total_seconds()
+        now = utcnow()
+        claimed = await claim_account_leases(
+            session, database_ids, self.owner, now, now + self.duration, processed_before=self.processed_before)
+        self.held |= claimed
+        self._expires_at.update(dict.fromkeys(claimed, expires_at))
+        if len(claimed) < len(database_ids):
+            logger.debug(f"Leases: {len(database_ids) - len(claimed)} accounts are leased by other hosts")
+        return claimed
+
+    async def claim_accounts(self, accounts: list[AccountSnapshot]) -> list[AccountSnapshot]:
+        async with AsyncSessionmaker() as session:
+            claimed = await self.claim(session, [account.database_id for account in accounts])
+            await session.commit()
+        return [account for account in accounts if account.database_id in claimed]
+
+    def holds(self, database_id: int) -> bool:
+        """
+        :return: Аренда аккаунта еще у этого хоста: ее не забрал другой хост и она не истекла
+            (False и тогда, когда продление не удалось и срок почти вышел)
+        """
+        if database_id not in self.held:
+            return False
+        margin = self.duration.total_seconds() * EXPIRY_MARGIN
+        return time.monotonic() < self._expires_at.get(database_id, 0) - margin
+
+    def release(self, database_id: int):
+        """
+        Аккаунт обработан. Аренда снимается в бд при следующей записи (flush).
+        """
+        if database_id in self.held:
+            self._processed.add(database_id)
+
+    async def flush(self):
+        """
+        Снимает аренду обработанных аккаунтов и продлевает аренду остальных.
+        """
+        processed = list(self._processed)
+        held = list(self.held - self._processed)
+        expires_at = time.monotonic() + self.duration.total_seconds()
+        async with AsyncSessionmaker() as session:
+            await release_account_leases(session, processed, self.owner, processed_at=utcnow())
+            still_held = await renew_account_leases(session, held, self.owner, utcnow() + self.duration)
+            await session.commit()
+
+        self.held -= set(processed)
+        self._processed -= set(processed)
+        self._expires_at.update(dict.fromkeys(still_held, expires_at))
+        lost = set(held) - still_held
+        for database_id in (*processed, *lost):
+            self._expires_at.pop(database_id, None)
+        if lost:
+            # Аренда истекла (хост не успел продлить) и аккаунт забрал другой хост
+            self._lost += len(lost)
+            self.held -= lost
+            logger.warning(f"Leases lost for {len(lost)} accounts: {', '.join(map(str, sorted(lost)))}")
+
+    async def run(self):
+        """
+        Фоновое продление аренды.
+        """
+        while True:
+            await asyncio.sleep(self.duration.total_seconds() / 3)
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.error(f"Failed to renew leases: {exc}")
+
+    async def close(self):
+        """
+        Снимает всю аренду: необработанные аккаунты сразу становятся доступны другим хостам.
+        """
+        unprocessed = list(self.held - self._processed)
+        await self.flush()
+        async with AsyncSessionmaker() as session:
+            await release_account_leases(session, unprocessed, self.owner)
+            await session.commit()
+        self.held.clear()
+        self._expires_at.clear()
+        if self._lost:
+            logger.warning(f"Leases lost during the run: {self._lost}")
+
+    def wrap(self, process: Callable[[AccountSnapshot, Any], Awaitable]) -> Callable[[AccountSnapshot, Any], Awaitable]:
+        """
+        :return: process для WorkerPool, который снимает аренду после обработки (отложенный аккаунт ее сохраняет)
+        """
+        async def process_leased(account: AccountSnapshot, state: Any = None):
+            # При ошибке или отмене аренда снимается в close() без отметки об обработке
+            result = await process(account, state)
+            if not isinstance(result, Deferred):
+                self.release(account.database_id)
+            return result
+
+        return process_leased
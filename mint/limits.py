@@ -0,0 +1,92 @@
+"""
+Ограничения одновременных запросов по сервисам (LIMITS), общие для всех аккаунтов процесса:
+- mint_api: mintchain.io (HTTPClient)
+- twitter: Twitter API (TwitterClient)
+- discord: сессии Discord gateway (join_guild_and_make_oauth2), самые тяжелые
+- rpc: RPC узлы (балансы, транзакции)
+
+Слот занимается только на время запроса (или сессии gateway), а не шага или аккаунта,
+поэтому медленный сервис не задерживает запросы к остальным: CONCURRENCY.MAX_TASKS можно поднять,
+ограничив узкие места здесь. Время ожидания слотов учитывается для отчета по запуску.
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from common.loop import LoopBound
+
+from .config import CONFIG
+
+
+class ServiceLimits(LoopBound):
+    def __init__(self, limits: dict[str, int]):
+        """
+        :param limits: Имя сервиса -> максимум одновременных запросов (0 - без ограничений).
+        """
+        self.limits = limits
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self.wait_time: dict[str, float] = defaultdict(float)
+        self.count: dict[str, int] = defaultdict(int)
+
+    def _reset_loop_state(self):
+        self._semaphores.clear()
+
+    def _semaphore(self, service: str) -> asyncio.Semaphore | None:
+        limit = self.limits.get(service, 0)
+        if limit <= 0:
+            return None
+
+        semaphore = self._semaphores.get(service)
+        if semaphore is None:
+            semaphore = self._semaphores[service] = asyncio.Semaphore(limit)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, service: str) -> AsyncIterator[None]:
+        self._check_loop()
+        semaphore = self._semaphore(service)
+        if semaphore is None:
+            yield
+            return
+
+        started_at = time.perf_counter()
+        async with semaphore:
+            self.wait_time[service] += time.perf_counter() - started_at
+            self.count[service] += 1
+            yield
+
+    def reconfigure(self, limits: dict[str, int]):
+        """
+        Меняет лимиты во время работы: новые запросы ждут слот уже по новым лимитам,
+        начатые доработают со старыми.
+        """
+        self.limits = limits
+        self._semaphores.clear()
+
+    def __bool__(self):
+        return bool(self.count)
+
+    def __str__(self):
+        return "Service limits (waited for a slot):" + "".join(
+            f"\n\t{service}: {self.wait_time[service]:.1f} sec. ({count} requests, limit {self.limits[service]})"
+            for service, count in self.count.items()
+        )
+
+    def reset_stats(self):
+        self.wait_time.clear()
+        self.count.clear()
+
+
+def configured_limits() -> dict[str, int]:
+    return {
+        "mint_api": CONFIG.LIMITS.MINT_API,
+        "twitter": CONFIG.LIMITS.TWITTER,
+        "discord": CONFIG.LIMITS.DISCORD,
+        "rpc": CONFIG.LIMITS.RPC,
+    }
+
+
+service_limits = ServiceLimits(configured_limits())
@@ -0,0 +1,158 @@
+"""
+Запуск обработки в нескольких процессах, у каждого свой event loop, движок SQLAlchemy и HTTP сессии.
+
+Аккаунты делятся между процессами по proxy_partition_key, поэтому аккаунты одного прокси
+всегда обрабатываются одним процессом и ProxyGovernor внутри процесса продолжает соблюдать ограничения.
+Процессы присылают родителю прогресс, статистику воркеров и ошибки через общую очередь.
+Ctrl+C и SIGTERM родителя передаются процессам как запрос корректной остановки (см. mint.shutdown).
+"""
+
+import asyncio
+import multiprocessing
+import queue
+import signal
+import traceback
+
+from loguru import logger
+from tqdm import tqdm
+
+from common.logger import setup_logger
+from common.loop import run
+
+from .config import CONFIG
+from .errors import WorkerProcessError
+from .paths import LOG_DIR
+from .sharding import Shard
+
+
+# Типы событий от дочерних процессов: (kind, process_index, payload)
+PROGRESS = "progress"
+STATS = "stats"
+ERROR = "error"
+
+
+async def _run_child_async(
+        index: int,
+        groups: list[str],
+        options: dict,
+        partition: Shard,
+        events: multiprocessing.Queue,
+        stop: multiprocessing.Event,
+):
+    # Импорт внутри процесса: движок БД и клиенты создаются уже в нем
+    from .process import process_groups
+    from .shutdown import shutdown
+
+    task = asyncio.create_task(process_groups(
+        groups,
+        partition=partition,
+        on_progress=lambda count: events.put((PROGRESS, index, count)),
+        **options,
+    ))
+    while not task.done():
+        await asyncio.wait((task, ), timeout=0.5)
+        if stop.is_set() and not shutdown.requested:
+            shutdown.request()
+
+    stats = await task
+    processed = sum(worker_stats.processed for worker_stats in stats)
+    failed = sum(worker_stats.failed for worker_stats in stats)
+    events.put((STATS, index, (processed, failed)))
+
+
+def _run_child(
+        index: int,
+        groups: list[str],
+        options: dict,
+        partition: Shard,
+        events: multiprocessing.Queue,
+        stop: multiprocessing.Event,
+):
+    setup_logger(LOG_DIR, CONFIG.LOGGING.LEVEL)
+    logger.enable("twitter")
+    try:
+        run(_run_child_async(index, groups, options, partition, events, stop), CONFIG.CONCURRENCY.EVENT_LOOP)
+    except asyncio.CancelledError:
+        pass
+    except BaseException:
+        events.put((ERROR, index, traceback.format_exc()))
+        raise
+
+
+def run_in_processes(
+        groups: list[str],
+        processes: int,
+        *,
+        mint_green_id: bool,
+        bind_discord: bool,
+        shard: Shard = None,
+        forever: bool = False,
+        run_id: int = None,
+        stages: bool = False,
+        total: int = None,
+):
+    """
+    :param processes: Количество процессов. В каждом работает CONCURRENCY.MAX_TASKS воркеров.
+    :param total: Количество аккаунтов для прогресс-бара.
+    :raises WorkerProcessError: Если хотя бы один процесс завершился с ошибкой.
+        В этом случае остальным процессам посылается сигнал остановки, как и при ошибке в однопроцессном режиме.
+    """
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    stop = context.Event()
+    options = {
+        "mint_green_id": mint_green_id,
+        "bind_discord": bind_discord,
+        "shard": shard,
+        "forever": forever,
+        "run_id": run_id,
+        "stages": stages,
+    }
+
+    children = [
+        context.Process(
+            target=_run_child,
+            args=(index, groups, options, Shard(index, processes), events, stop),
+            name=f"mint-worker-{index}",
+        )
+        for index in range(1, processes + 1)
+    ]
+    for child in children:
+        child.start()
+    logger.info(f"Started {processes} worker processes")
+
+    # Процессы сами получают Ctrl+C из терминала, SIGTERM передается им через stop
+    previous_sigterm_handler = signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    failed_processes = set()
+    progress = tqdm(total=total)
+    try:
+        while any(child.is_alive() for child in children) or not events.empty():
+            try:
+                kind, index, payload = events.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except KeyboardInterrupt:
+                stop.set()
+                continue
+
+            if kind == PROGRESS:
+                progress.update(payload)
+            elif kind == STATS:
+                processed, failed = payload
+                logger.info(f"Process #{index}: processed {processed}, failed {failed}")
+            elif kind == ERROR:
+                logger.error(f"Process #{index} failed:\n{payload}")
+                failed_processes.add(index)
+                stop.set()
+    finally:
+        for child in children:
+            child.join()
+        progress.close()
+        signal.signal(signal.SIGTERM, previous_sigterm_handler)
+
+    for index, child in enumerate(children, start=1):
+        if child.exitcode:
+            failed_processes.add(index)
+
+    if failed_processes:
+        raise WorkerProcessError(sorted(failed_processes))
@@ -10,6 +10,7 @@ from common.utils import load_json
 from .chains import sepolia, mintchain_testnet
 
 from ..paths import ABI_DIR
+from ..limits import service_limits
 
 
 class MintchainToEthBridge(Contract):
@@ -35,7 +36,8 @@ class MintchainToEthBridge(Contract):
             **kwargs,
     ) -> HexStr:
         bridge_fn = self._withdraw(amount=value)
-        return await self.chain.execute_fn(account, bridge_fn, value=value, **kwargs)
+        async with service_limits.slot("rpc"):
+            return await self.chain.execute_fn(account, bridge_fn, value=value, **kwargs)
 
 
 class EthToMintchainBridge(Contract):
@@ -56,7 +58,8 @@ class EthToMintchainBridge(Contract):
             **kwargs,
     ) -> HexStr:
         bridge_fn = self._deposit()
-        return await self.chain.execute_fn(account, bridge_fn, value=value, **kwargs)
+        async with service_limits.slot("rpc"):
+            return await self.chain.execute_fn(account, bridge_fn, value=value, **kwargs)
 
 
 eth_to_mintchain_bridge = EthToMintchainBridge(sepolia)
@@ -5,6 +5,7 @@ from eth_utils import from_wei
 
 from ..config import CONFIG
 from ..database import MintAccount
+from ..limits import service_limits
 from .chains import sepolia, mintchain_testnet
 
 
@@ -47,8 +48,10 @@ async def request_balances(account: MintAccount) -> tuple[Wei, Wei]:
     """
     wallet = account.wallet.eth_account
 
-    sepolia_balance_wei = await sepolia.get_balance(wallet.address)
-    mintchain_balance_wei = await mintchain_testnet.get_balance(wallet.address)
+    async with service_limits.slot("rpc"):
+        sepolia_balance_wei = await sepolia.get_balance(wallet.address)
+    async with service_limits.slot("rpc"):
+        mintchain_balance_wei = await mintchain_testnet.get_balance(wallet.address)
     sepolia_balance_ether = from_wei(sepolia_balance_wei, 'ether')
     mintchain_balance_ether = from_wei(mintchain_balance_wei, 'ether')
     logger.info(f"{account} [{wallet.address}] Balances:"
@@ -0,0 +1,174 @@
+"""
+Стадийный режим:
+- Аккаунты обрабатываются порциями (PIPELINE.BATCH_SIZE). Для порции сначала выполняется первый шаг
+    у всех аккаунтов (все логины), затем второй (все верификации) и т.д. в порядке зависимостей шагов.
+- У каждой стадии свое ограничение одновременных задач (PIPELINE.STAGE_MAX_TASKS).
+- Клиенты аккаунтов живут все стадии порции, поэтому HTTP сессии Mint и Twitter создаются один раз.
+- По каждой стадии собирается своя статистика (время и пропускная способность).
+- Пауза после аккаунта (CONCURRENCY.DELAY_BETWEEN_ACCOUNTS) одна на аккаунт за порцию:
+    она держит прокси аккаунта, но не слот стадии (см. cool_down).
+- Пауза перед повторной попыткой шага тоже не держит ни слот стадии, ни прокси: шаг возвращает Deferred,
+    и аккаунт снова встает в очередь стадии после паузы. Стадия заканчивается, когда шаг завершен у всех аккаунтов.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, TypeVar
+
+from .breaker import mint_breaker
+from .config import CONFIG
+from .governor import AccountKey, ProxyGovernor, proxy_governor
+from .pool import Deferred
+from .shutdown import shutdown
+from .steps import Step
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class StageStats:
+    name: str
+    processed: int = 0
+    failed: int = 0
+    busy_time: float = 0.0  # sec. Суммарное время шага по аккаунтам
+    wall_time: float = 0.0  # sec. Время стадии от начала до конца
+
+    def add(self, other: "StageStats"):
+        self.processed += other.processed
+        self.failed += other.failed
+        self.busy_time += other.busy_time
+        self.wall_time += other.wall_time
+
+    def __str__(self):
+        accounts = self.processed + self.failed
+        throughput = accounts / self.wall_time * 60 if self.wall_time else 0
+        average_time = self.busy_time / accounts if accounts else 0
+        return (f"Stage {self.name}:"
+                f" processed {self.processed}, failed {self.failed}, {self.wall_time:.1f} sec."
+                f" ({throughput:.1f} accounts/min, {average_time:.2f} sec. per account)")
+
+
+def stage_order(steps: list[Step]) -> list[str]:
+    """
+    :return: Имена шагов в порядке зависимостей (при прочих равных — в порядке объявления)
+    """
+    names = {step.name for step in steps}
+    ordered = []
+    pending = list(steps)
+    while pending:
+        ready = [
+            step for step in pending
+            if all(name in ordered or name not in names for name in step.requires)
+        ]
+        if not ready:
+            raise ValueError(f"Unsatisfiable step dependencies: {[step.name for step in pending]}")
+
+        for step in ready:
+            ordered.append(step.name)
+            pending.remove(step)
+    return ordered
+
+
+def stage_max_tasks(name: str) -> int:
+    return CONFIG.PIPELINE.STAGE_MAX_TASKS.get(name, CONFIG.CONCURRENCY.MAX_TASKS)
+
+
+async def iter_batches(items: AsyncIterable[T], batch_size: int) -> AsyncIterator[list[T]]:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
+
+
+async def cool_down(key: AccountKey, delay: float, governor: ProxyGovernor = None):
+    """
+    Держит место аккаунта у прокси delay секунд, как Cooldown в WorkerPool.
+    """
+    governor = governor or proxy_governor
+    await governor.acquire_account(key)
+    try:
+        await asyncio.sleep(delay)
+    finally:
+        governor.release_account(key)
+
+
+async def run_stage(
+        name: str,
+        items: list[T],
+        run: Callable[[T], Awaitable[bool | Deferred]],
+        *,
+        proxy_key: Callable[[T], AccountKey],
+        max_tasks: int = None,
+        governor: ProxyGovernor = None,
+) -> StageStats:
+    """
+    Выполняет стадию для всех items. Ограничения ProxyGovernor соблюдаются на время шага.
+    Неожиданная ошибка отменяет стадию и пробрасывается.
+    После запроса остановки (см. mint.shutdown) шаг для оставшихся items не запускается.
+
+    :param run: Выполняет шаг. Возвращает True, если шаг выполнен, False, если не удался,
+        Deferred, если шаг нужно повторить через Deferred.delay секунд.
+    :param proxy_key: Ключ ограничения аккаунтов на прокси для элемента (см. account_key).
+    """
+    governor = governor or proxy_governor
+    semaphore = asyncio.Semaphore(max(max_tasks or stage_max_tasks(name), 1))
+    stats = StageStats(name)
+
+    async def run_once(item: T) -> bool | Deferred | None:
+        key = proxy_key(item)
+        await governor.acquire_account(key)
+        try:
+            await mint_breaker.wait_dispatch()
+        except BaseException:
+            governor.release_account(key)
+            raise
+
+        try:
+            async with semaphore:
+                if shutdown.requested:
+                    return None
+                started_at = time.perf_counter()
+                try:
+                    return await run(item)
+                finally:
+                    stats.busy_time += time.perf_counter() - started_at
+        finally:
+            governor.release_account(key)
+
+    async def run_one(item: T):
+        while True:
+            succeeded = await run_once(item)
+            if not isinstance(succeeded, Deferred):
+                break
+
+            # Пауза без слота стадии и прокси. Остановка ее прерывает: отложенный шаг больше не запускается
+            try:
+                await asyncio.wait_for(shutdown.wait(), succeeded.delay)
+            except TimeoutError:
+                pass
+
+        if succeeded is None:
+            return
+        if succeeded:
+            stats.processed += 1
+        else:
+            stats.failed += 1
+
+    started_at = time.perf_counter()
+    tasks = [asyncio.create_task(run_one(item)) for item in items]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        stats.wall_time = time.perf_counter() - started_at
+
+    return stats
@@ -0,0 +1,135 @@
+"""
+Планировщик шагов по локальному состоянию (AccountSnapshot из бд), без запросов к Mint API
+и без загрузки полной модели аккаунта:
+- Шаг пропускается, если по данным из бд делать нечего: кошелек проверен, инвайт принят, соц. сети привязаны,
+    энергия уже собрана после последнего сброса (PLANNER.ENERGY_RESET_HOUR),
+    все задания выполнены (перепроверяются раз в PLANNER.TASKS_RECHECK_DAYS).
+- Пропущенный шаг считается выполненным для зависящих от него шагов.
+- login остается в плане, если есть другие шаги (с сохраненным auth_token он не делает запросов).
+- Аккаунт без шагов вообще не запускается (ни одного запроса).
+- Считается, сколько запросов удалось не делать (см. PlannerStats).
+"""
+
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from common.utils import utcnow
+
+from .config import CONFIG
+from .database import AccountFlag, AccountSnapshot
+from .steps import Step
+
+
+# Запросы, которые шаг делает, даже если делать нечего (проверка состояния на сайте)
+CHECK_REQUESTS = {
+    "claim_energy": 3,  # request_energy_list, request_assets, request_self
+    "complete_tasks": 1,  # request_task_list
+}
+
+
+@dataclass
+class PlannerStats:
+    planned: int = 0  # Аккаунтов запущено
+    skipped: int = 0  # Аккаунтов без шагов
+    skipped_steps: int = 0
+    avoided_requests: int = 0
+
+    def record(self, plan: "Plan"):
+        if plan.steps:
+            self.planned += 1
+        else:
+            self.skipped += 1
+        self.skipped_steps += len(plan.skipped)
+        self.avoided_requests += plan.avoided_requests
+
+    def __bool__(self):
+        return bool(self.planned or self.skipped)
+
+    def __str__(self):
+        return (f"Planner: {self.planned} accounts planned, {self.skipped} skipped (nothing to do),"
+                f" {self.skipped_steps} steps skipped, ~{self.avoided_requests} requests avoided")
+
+
+@dataclass
+class Plan:
+    steps: list[Step]
+    skipped: dict[str, str] = field(default_factory=dict)  # Шаг: причина
+
+    @property
+    def avoided_requests(self) -> int:
+        return sum(CHECK_REQUESTS.get(name, 0) for name in self.skipped)
+
+
+def last_energy_reset(now: datetime) -> datetime:
+    reset = now.replace(hour=CONFIG.PLANNER.ENERGY_RESET_HOUR, minute=0, second=0, microsecond=0)
+    return reset if reset <= now else reset - timedelta(days=1)
+
+
+def skip_reason(account: AccountSnapshot, step: str, now: datetime) -> str | None:
+    """
+    :return: Почему шаг можно не выполнять или None, если шаг нужен
+    """
+    if not account.has(AccountFlag.HAS_USER):
+        # Аккаунт ни разу не заходил, о нем ничего не известно
+        return None
+
+    if step == "verify_wallet" and account.has(AccountFlag.VERIFIED):
+        return "wallet verified"
+
+    if step == "accept_invite" and account.has(AccountFlag.INVITED):
+        return "already invited"
+
+    if step == "bind_twitter":
+        if not account.has(AccountFlag.HAS_TWITTER_ACCOUNT):
+            return "no Twitter account"
+        if account.has(AccountFlag.TWITTER_BOUND):
+            return "Twitter bound"
+
+    if step == "bind_discord":
+        if not account.has(AccountFlag.HAS_DISCORD_ACCOUNT):
+            return "no Discord account"
+        if account.has(AccountFlag.DISCORD_BOUND):
+            return "Discord bound"
+
+    if step == "claim_energy":
+        claimed_at = account.energy_claimed_at
+        if claimed_at and claimed_at >= last_energy_reset(now):
+            return f"energy claimed at {claimed_at:%Y-%m-%d %H:%M}"
+
+    if step == "complete_tasks":
+        completed_at = account.tasks_completed_at
+        if completed_at and now - completed_at < timedelta(days=CONFIG.PLANNER.TASKS_RECHECK_DAYS):
+            return f"tasks completed at {completed_at:%Y-%m-%d %H:%M}"
+
+    return None
+
+
+def plan_steps(account: AccountSnapshot, steps: list[Step], now: datetime = None) -> Plan:
+    """
+    :param steps: Все шаги аккаунта (см. account_steps).
+    :return: Нужные шаги
+    """
+    if not CONFIG.PLANNER.ENABLED:
+        return Plan(steps)
+
+    now = now or utcnow()
+    skipped = {}
+    needed = set()
+    for step in steps:
+        if reason := skip_reason(account, step.name, now):
+            skipped[step.name] = reason
+        else:
+            needed.add(step.name)
+
+    # Вкладывать нечего, если энергия не начисляется в этом запуске и на балансе ее нет
+    if ("inject" in needed and account.has(AccountFlag.HAS_USER) and not account.me
+            and not needed & {"claim_energy", "complete_tasks"}):
+        needed.discard("inject")
+        skipped["inject"] = "no energy"
+
+    # Вход сам по себе ничего не дает
+    if needed == {"login"}:
+        needed.clear()
+        skipped["login"] = "nothing else to do"
+
+    return Plan([step for step in steps if step.name in needed], skipped)
@@ -0,0 +1,377 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Awaitable, Callable, TypeVar
+
+from loguru import logger
+from tqdm.asyncio import tqdm
+
+from common.delay_queue import DelayQueue
+
+from .database import (
+    AsyncSessionmaker,
+    AccountSnapshot,
+    get_account_snapshots_by_groups,
+    get_account_snapshots_by_ids,
+    get_account_keys_by_groups,
+    get_account_ids_by_groups,
+    count_accounts_by_groups,
+)
+from .breaker import mint_breaker
+from .governor import AccountKey, ProxyGovernor, account_key, proxy_governor
+from .priority import prioritize
+from .shutdown import shutdown
+from .sharding import Shard, in_parts
+
+if TYPE_CHECKING:
+    from .leases import AccountLeases
+
+
+T = TypeVar("T")
+
+
+@dataclass
+class WorkerStats:
+    worker_id: int
+    processed: int = 0
+    failed: int = 0
+    busy_time: float = 0.0  # sec.
+
+    def __str__(self):
+        return (f"Worker #{self.worker_id}:"
+                f" processed {self.processed}, failed {self.failed}, busy {self.busy_time:.1f} sec.")
+
+
+@dataclass
+class Deferred:
+    """
+    Результат process: аккаунт нужно обработать снова через delay секунд (пауза перед повторной попыткой).
+    На время паузы аккаунт освобождает воркер и прокси.
+    """
+    delay: float  # sec.
+    state: Any = None  # Передается в process при следующем запуске
+
+
+@dataclass
+class Cooldown:
+    """
+    Результат process: аккаунт обработан, но его прокси свободен только через delay секунд
+    (CONCURRENCY.DELAY_BETWEEN_ACCOUNTS). Воркер освобождается сразу.
+    """
+    delay: float  # sec.
+
+
+async def count_accounts(groups: list[str], shard: Shard = None) -> int:
+    async with AsyncSessionmaker() as session:
+        if shard is None:
+            return await count_accounts_by_groups(session, groups)
+
+        database_ids = await get_account_ids_by_groups(session, groups)
+        return sum(1 for database_id in database_ids if shard.contains(database_id))
+
+
+async def _iter_account_pages(
+        groups: list[str],
+        batch_size: int,
+        shard: Shard = None,
+        partition: Shard = None,
+) -> AsyncIterator[list[AccountSnapshot]]:
+    after_database_id = None
+    while True:
+        async with AsyncSessionmaker() as session:
+            if shard is None and partition is None:
+                accounts = await get_account_snapshots_by_groups(
+                    session, groups, after_database_id=after_database_id, limit=batch_size)
+                if not accounts:
+                    return
+
+                after_database_id = accounts[-1].database_id
+            else:
+                # Части считаются по ключам, записи загружаются только для аккаунтов своей части
+                keys = await get_account_keys_by_groups(
+                    session, groups, after_database_id=after_database_id, limit=batch_size)
+                if not keys:
+                    return
+
+                after_database_id = keys[-1][0]
+                accounts = await get_account_snapshots_by_ids(session, [
+                    database_id for database_id, proxy_database_id in keys
+                    if in_parts(database_id, proxy_database_id, shard, partition)
+                ])
+
+        yield accounts
+
+
+async def iter_accounts(
+        groups: list[str],
+        batch_size: int = 100,
+        shard: Shard = None,
+        partition: Shard = None,
+        leases: "AccountLeases" = None,
+        prioritized: bool = False,
+) -> AsyncIterator[AccountSnapshot]:
+    """
+    Лениво загружает аккаунты выбранных групп порциями по batch_size (компактные записи, см. AccountSnapshot).
+    Для каждой порции открывается своя короткая сессия, чтобы не держать блокировку SQLite на все время работы.
+
+    :param shard: Отдавать только аккаунты этой части группы (по database_id, см. --shard).
+    :param partition: Отдавать только аккаунты этой части группы по прокси (см. proxy_partition_key).
+    :param leases: Отдавать только захваченные аккаунты (см. mint.leases).
+    :param prioritized: Отдавать по убыванию приоритета (см. mint.priority). Для этого сначала загружаются
+        записи всех аккаунтов, захватываются аккаунты по-прежнему порциями.
+    """
+    pages = _iter_account_pages(groups, batch_size, shard, partition)
+    if prioritized:
+        accounts = prioritize([account async for page in pages for account in page])
+        logger.debug(f"Prioritized {len(accounts)} accounts")
+        pages = _iter_slices(accounts, batch_size)
+
+    async for accounts in pages:
+        if leases is not None:
+            accounts = await leases.claim_accounts(accounts)
+
+        for account in accounts:
+            yield account
+
+
+async def _iter_slices(items: list[T], size: int) -> AsyncIterator[list[T]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+BACKLOG_PER_WORKER = 4
+
+
+class WorkerPool:
+    """
+    Пул долгоживущих воркеров:
+    - Воркеры берут аккаунты из общей очереди, которую лениво наполняет загрузчик.
+    - Загрузчик ждет (backpressure), если в очереди и у воркеров уже backlog аккаунтов,
+        поэтому потребление памяти не зависит от размера группы.
+    - Аккаунт, прокси которого уже занят (см. ProxyGovernor), паркуется и не занимает воркер.
+    - Паузы тоже не занимают воркер: process возвращает Deferred или Cooldown,
+        и аккаунт ждет в очереди отложенных (DelayQueue), пока воркеры обрабатывают другие.
+    - Пока на сайте идет обновление (см. mint.breaker), новые аккаунты не запускаются.
+    - Неожиданная ошибка в любом воркере останавливает весь пул и пробрасывается из run().
+    - После запроса остановки (см. mint.shutdown) новые аккаунты не запускаются,
+        run() завершается, как только воркеры доработают начатые.
+    - Количество воркеров можно менять во время работы (resize, см. mint.reload).
+    """
+
+    def __init__(
+            self,
+            process: Callable[[AccountSnapshot, Any], Awaitable[Deferred | Cooldown | None]],
+            workers: int = 1,
+            *,
+            backlog: int = None,
+            governor: ProxyGovernor = None,
+            on_progress: Callable[[int], None] = None,
+    ):
+        """
+        :param process: Обрабатывает аккаунт. Вторым аргументом получает Deferred.state (при первом запуске None).
+        :param on_progress: Вызывается с количеством завершенных аккаунтов вместо обновления своего tqdm.
+        """
+        self._process = process
+        self.workers = max(workers, 1)
+        self._auto_backlog = backlog is None
+        self.backlog = backlog or self.workers * BACKLOG_PER_WORKER
+        self.governor = governor or proxy_governor
+        self.on_progress = on_progress
+        self.stats: list[WorkerStats] = []
+
+        self._queue: asyncio.Queue[tuple[AccountSnapshot, Any]] | None = None
+        self._delayed: DelayQueue[Callable[[], None]] | None = None
+        self._custody: asyncio.Semaphore | None = None
+        self._unfinished = 0
+        self._all_done: asyncio.Event | None = None
+        self._progress: tqdm | None = None
+        self._exception: BaseException | None = None
+        self._failed: asyncio.Event | None = None
+        self._busy: set[asyncio.Task] = set()
+        self._workers: set[asyncio.Task] = set()  # Работающие воркеры
+        self._tasks: list[asyncio.Task] = []  # Все воркеры запуска, включая завершенные
+        self._retiring = 0  # Сколько занятых воркеров завершится после текущего аккаунта
+
+    async def _feed(self, accounts: AsyncIterable[AccountSnapshot]):
+        async for account in accounts:
+            # Каждый аккаунт в очереди или в работе держит одно место в custody
+            await self._custody.acquire()
+            self._unfinished += 1
+            self._all_done.clear()
+            self._queue.put_nowait((account, None))
+
+    def _finish(self):
+        self._custody.release()
+        if self.on_progress:
+            self.on_progress(1)
+        else:
+            self._progress.update(1)
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._all_done.set()
+
+    def _spawn_worker(self):
+        stats = WorkerStats(len(self.stats) + 1)
+        self.stats.append(stats)
+        task = asyncio.create_task(self._worker(stats))
+        self._workers.add(task)
+        self._tasks.append(task)
+        task.add_done_callback(self._workers.discard)
+
+    def resize(self, workers: int):
+        """
+        Меняет количество воркеров. Новые воркеры сразу берут аккаунты из очереди,
+        свободные лишние останавливаются сразу, занятые — после текущего аккаунта.
+        """
+        workers = max(workers, 1)
+        if workers == self.workers:
+            return
+
+        logger.info(f"Workers: {self.workers} -> {workers}")
+        added = workers - self.workers
+        self.workers = workers
+        if self._queue is None:
+            # Пул еще не запущен
+            if self._auto_backlog:
+                self.backlog = workers * BACKLOG_PER_WORKER
+            return
+
+        if added > 0:
+            # Сначала отменяется остановка занятых воркеров
+            kept = min(self._retiring, added)
+            self._retiring -= kept
+            for _ in range(added - kept):
+                self._spawn_worker()
+            if self._auto_backlog:
+                # Уменьшается backlog только при следующем запуске
+                for _ in range(added * BACKLOG_PER_WORKER):
+                    self._custody.release()
+                self.backlog += added * BACKLOG_PER_WORKER
+            return
+
+        excess = -added
+        for task in list(self._workers):
+            if excess and task not in self._busy:
+                self._workers.discard(task)
+                task.cancel()
+                excess -= 1
+        self._retiring += excess
+
+    async def _worker(self, stats: WorkerStats):
+        while True:
+            if self._retiring:
+                self._retiring -= 1
+                return
+
+            if shutdown.requested:
+                # Доработал начатый аккаунт: новые после остановки не берутся
+                return
+
+            # Во время обновления сайта новые аккаунты не запускаются
+            await mint_breaker.wait_dispatch()
+            account, state = await self._queue.get()
+            if shutdown.requested:
+                return
+            proxy_key = account_key(account.proxy_database_id, account.database_id)
+
+            if not self.governor.try_acquire_account(proxy_key):
+                self.governor.park(proxy_key, partial(self._queue.put_nowait, (account, state)))
+                continue
+
+            started_at = time.perf_counter()
+            result = None
+            self._busy.add(asyncio.current_task())
+            try:
+                result = await self._process(account, state)
+                if not isinstance(result, Deferred):
+                    stats.processed += 1
+            except Exception as exc:
+                stats.failed += 1
+                self._fail(exc)
+                return
+            finally:
+                self._busy.discard(asyncio.current_task())
+                stats.busy_time += time.perf_counter() - started_at
+                if isinstance(result, Cooldown):
+                    self._delayed.put(partial(self._release, proxy_key), result.delay)
+                elif isinstance(result, Deferred):
+                    self.governor.release_account(proxy_key)
+                    self._delayed.put(partial(self._queue.put_nowait, (account, result.state)), result.delay)
+                else:
+                    self._release(proxy_key)
+
+    def _release(self, proxy_key: AccountKey):
+        self.governor.release_account(proxy_key)
+        self._finish()
+
+    async def _run_delayed(self):
+        while True:
+            callback = await self._delayed.get()
+            callback()
+
+    async def _stop_dispatch(self, feeder: asyncio.Task, delayed: asyncio.Task):
+        """
+        Останавливает запуск аккаунтов и ждет, пока воркеры доработают начатые.
+        Отложенные и ожидающие в очереди аккаунты не запускаются.
+        """
+        feeder.cancel()
+        delayed.cancel()
+        for worker in self._tasks:
+            if worker not in self._busy:
+                worker.cancel()
+        busy = list(self._busy)
+        logger.info(f"Waiting for {len(busy)} started accounts")
+        # Ждем только занятых: освободившийся воркер завершается сам, а не ждет очередь
+        await asyncio.gather(*busy, return_exceptions=True)
+
+    def _fail(self, exc: BaseException):
+        if self._exception is None:
+            self._exception = exc
+        self._failed.set()
+
+    async def _drain(self, feeder: asyncio.Task):
+        await feeder
+        await self._all_done.wait()
+
+    async def run(self, accounts: AsyncIterable[AccountSnapshot], *, total: int = None):
+        self._queue = asyncio.Queue()
+        self._delayed = DelayQueue()
+        self._custody = asyncio.Semaphore(self.backlog)
+        self._failed = asyncio.Event()
+        self._unfinished = 0
+        self._all_done = asyncio.Event()
+        self._all_done.set()
+        self._exception = None
+        self._progress = tqdm(total=total, disable=self.on_progress is not None)
+        self.stats = []
+        self._workers = set()
+        self._tasks = []
+        self._retiring = 0
+        for _ in range(self.workers):
+            self._spawn_worker()
+
+        delayed = asyncio.create_task(self._run_delayed())
+        feeder = asyncio.create_task(self._feed(accounts))
+        drain = asyncio.create_task(self._drain(feeder))
+        failed = asyncio.create_task(self._failed.wait())
+        stopping = asyncio.create_task(shutdown.wait())
+
+        try:
+            await asyncio.wait((drain, failed, stopping), return_when=asyncio.FIRST_COMPLETED)
+            if drain.done() and not drain.cancelled() and drain.exception():
+                self._fail(drain.exception())
+            elif stopping.done() and not drain.done() and not failed.done():
+                await self._stop_dispatch(feeder, delayed)
+        finally:
+            tasks = (drain, failed, stopping, feeder, delayed, *self._tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._progress.close()
+
+        for stats in self.stats:
+            logger.info(str(stats))
+
+        if self._exception is not None:
+            raise self._exception
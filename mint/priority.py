@@ -0,0 +1,82 @@
+"""
+Приоритет аккаунтов (PRIORITY): сначала аккаунты, которые дадут больше всего на один запрос,
+чтобы при прерывании запуска (обновление сайта, лимиты, остановка) самое ценное уже было сделано.
+- Ценность по данным из бд (AccountSnapshot): новый аккаунт, энергия, которую можно собрать,
+    задания, которые могут быть не выполнены, не вложенная энергия (MintUser.me).
+- Ценность растет с временем с последнего успешного запуска (до PRIORITY.MAX_STALE_DAYS).
+- Делится на примерное число запросов и умножается на долю успешных запусков (1 - failure_rate).
+- Исход каждого запуска сохраняется в бд вместе с остальными изменениями аккаунта (см. Client.save).
+
+Аккаунты с равным приоритетом идут в порядке database_id.
+"""
+
+from datetime import datetime
+
+from common.utils import utcnow
+
+from .config import CONFIG
+from .database import AccountFlag, AccountSnapshot
+from .planner import CHECK_REQUESTS, last_energy_reset
+
+
+# Примерное число запросов
+LOGIN_REQUESTS = 1  # request_self
+NEW_ACCOUNT_REQUESTS = 6  # login, верификация, инвайт, привязки
+
+
+def energy_due(account: AccountSnapshot, now: datetime) -> bool:
+    return account.energy_claimed_at is None or account.energy_claimed_at < last_energy_reset(now)
+
+
+def tasks_due(account: AccountSnapshot, now: datetime) -> bool:
+    return (account.tasks_completed_at is None
+            or (now - account.tasks_completed_at).total_seconds() >= CONFIG.PLANNER.TASKS_RECHECK_DAYS * 86400)
+
+
+def account_priority(account: AccountSnapshot, now: datetime) -> float:
+    """
+    :return: Ожидаемая польза на запрос (больше - раньше)
+    """
+    weights = CONFIG.PRIORITY
+    if not account.has(AccountFlag.HAS_USER):
+        value, requests = weights.NEW_ACCOUNT, NEW_ACCOUNT_REQUESTS
+    else:
+        value, requests = 0.0, LOGIN_REQUESTS
+        if energy_due(account, now):
+            value += weights.ENERGY
+            requests += CHECK_REQUESTS["claim_energy"] + 1
+        if tasks_due(account, now):
+            value += weights.TASKS
+            requests += CHECK_REQUESTS["complete_tasks"] + 1
+        if account.me:
+            value += account.me * weights.ME
+            requests += 1
+
+    stale_days = weights.MAX_STALE_DAYS
+    if account.last_success_at is not None:
+        stale_days = min((now - account.last_success_at).total_seconds() / 86400, weights.MAX_STALE_DAYS)
+    value *= 1 + weights.STALENESS_PER_DAY * stale_days
+
+    return value / requests * (1 - account.failure_rate)
+
+
+def prioritize(accounts: list[AccountSnapshot], now: datetime = None) -> list[AccountSnapshot]:
+    """
+    :return: Аккаунты по убыванию приоритета
+    """
+    now = now or utcnow()
+    return sorted(accounts, key=lambda account: account_priority(account, now), reverse=True)
+
+
+def record_outcome(account: AccountSnapshot, failed: bool, now: datetime = None) -> tuple[float, datetime | None]:
+    """
+    Обновляет failure_rate и last_success_at у account.
+
+    :return: Новые failure_rate и last_success_at
+    """
+    decay = CONFIG.PRIORITY.FAILURE_DECAY
+    account.failure_rate = account.failure_rate * (1 - decay) + decay * failed
+    if not failed:
+        account.last_success_at = now or utcnow()
+    return account.failure_rate, account.last_success_at
+
@@ -0,0 +1,595 @@
+import asyncio
+from dataclasses import dataclass, field, replace
+from functools import partial
+from random import randint
+from typing import AsyncIterable, Awaitable, Callable
+
+from loguru import logger
+from tqdm.asyncio import tqdm
+
+from common.utils import utcnow
+
+from . import discord as mint_discord
+from .config import CONFIG
+from .deadline import account_timeout, deadline_stats, tracked, with_deadline
+from .limits import service_limits
+from .client import Client as MintClient
+from .api.errors import MintException
+from .api.cache import response_cache
+from .api.sessions import session_pool
+from .breaker import is_maintenance
+from .errors import LeaseLostError, RetryLaterError, StepFailedError
+from .database import AccountFlag, AccountSnapshot, AsyncSessionmaker, MintAccount, async_engine, get_accounts_by_ids
+from .governor import account_key
+from .journal import RunJournal
+from .leases import AccountLeases
+from .planner import PlannerStats, plan_steps
+from .priority import record_outcome
+from .reload import config_watcher
+from .pipeline import StageStats, cool_down, iter_batches, run_stage, stage_order
+from .retry import ErrorKind, RetryPolicy, call_with_retries, error_kind
+from .pool import Cooldown, Deferred, WorkerPool, WorkerStats, count_accounts, iter_accounts
+from .scheduler import StartedAccounts, iter_due_accounts, retry_run_at
+from .shutdown import shutdown
+from .tracing import request_tracer
+from .sharding import Shard
+from .steps import Step, StepTimings, run_steps
+
+
+def account_steps(mint_green_id: bool, bind_discord: bool) -> list[Step]:
+    """
+    Шаги не привязаны к клиенту, чтобы план строился до загрузки аккаунта (см. bind_steps).
+
+    :return: Шаги обработки аккаунта. Имена шагов используются в журнале запуска (см. mint.journal)
+    """
+    steps = [
+        Step("login", MintClient.login),
+        Step("verify_wallet", MintClient.try_to_verify_wallet, requires=("login", )),
+        Step("bind_twitter", MintClient.try_to_bind_twitter, requires=("verify_wallet", )),
+        Step("accept_invite", MintClient.try_to_accept_invite, requires=("verify_wallet", )),
+        Step("claim_energy", MintClient.claim_energy, requires=("verify_wallet", )),
+        # Задания на подписку, твит и Discord требуют привязанных соц. сетей
+        Step("complete_tasks", MintClient.complete_tasks, requires=("bind_twitter", "bind_discord")),
+        # Вкладывается вся энергия, поэтому после всех шагов, которые ее начисляют
+        Step("inject", MintClient.inject_all, requires=("accept_invite", "claim_energy", "complete_tasks")),
+    ]
+    if not mint_discord.invites_paused and bind_discord:
+        steps.append(Step("bind_discord", MintClient.try_to_bind_discord, requires=("verify_wallet", )))
+    if mint_green_id:
+        steps.append(Step("mint_green_id", MintClient.mint_green_id, requires=("verify_wallet", )))
+    return steps
+
+
+def bind_steps(steps: list[Step], mint_client: MintClient) -> list[Step]:
+    return [replace(step, action=partial(step.action, mint_client)) for step in steps]
+
+
+async def load_accounts(database_ids: list[int]) -> list[MintAccount]:
+    """
+    :return: Полные модели аккаунтов со связями (на время обработки), в порядке database_ids
+    """
+    async with AsyncSessionmaker() as session:
+        return await get_accounts_by_ids(session, database_ids)
+
+
+async def run_account_step(
+        mint_account: MintAccount,
+        step: Step,
+        journal: RunJournal = None,
+        *,
+        attempt: int = 1,
+        defer: bool = False,
+        persist: Callable[[], Awaitable] = None,
+) -> bool:
+    """
+    Выполняет шаг с повторными попытками (см. mint.retry) и записью в журнал, если он передан.
+
+    :param attempt: Номер первой попытки.
+    :param defer: См. call_with_retries.
+    :param persist: Записывает изменения аккаунта в бд перед отметкой о выполнении шага в журнале
+        (см. RunJournal.run_step).
+    :return: Interacted
+    :raises StepFailedError: Если шаг не удался.
+    :raises RetryLaterError: Если defer и шаг нужно повторить позже.
+    """
+    action = with_deadline(step.action, step.name)
+    if journal:
+        action = partial(journal.run_step, mint_account, step.name, action, persist)
+
+    interacted = await call_with_retries(
+        action, RetryPolicy.for_step(step.name), f"{mint_account} [{step.name}]", attempt=attempt, defer=defer)
+    return bool(interacted)
+
+
+@dataclass
+class AccountState:
+    """
+    Состояние обработки аккаунта между запусками, если его шаги были отложены (см. Deferred)
+    """
+    completed_steps: set[str]
+    attempts: dict[str, int] = field(default_factory=dict)  # Номер следующей попытки отложенных шагов
+    failed_steps: set[str] = field(default_factory=set)  # Не удавшиеся шаги: не повторяются при продолжении
+    interacted: bool = False
+    timeouts: int = 0  # Сколько раз обработка не уложилась в DEADLINE.ACCOUNT
+
+
+async def process_account(
+        account: AccountSnapshot,
+        state: AccountState = None,
+        *,
+        mint_green_id: bool,
+        bind_discord: bool,
+        journal: RunJournal = None,
+        timings: StepTimings = None,
+        planner_stats: PlannerStats = None,
+        retry_failed: bool = False,
+        leases: AccountLeases = None,
+) -> Deferred | Cooldown | None:
+    """
+    План строится по account, полная модель аккаунта загружается, только если есть что делать,
+    и после обработки не хранится: account обновляется по ней для следующего запуска.
+
+    :param state: Состояние с прошлого запуска, если шаги аккаунта были отложены.
+    :param journal: Журнал запуска. Если передан, шаги, завершенные в этом запуске, пропускаются.
+    :param timings: Сюда добавляется время выполненных шагов.
+    :param planner_stats: Сюда добавляется результат планирования шагов (см. mint.planner).
+    :param retry_failed: Бесконечный режим: не удавшийся аккаунт переносится на время повтора (см. retry_run_at).
+    :param leases: Аренда аккаунтов. Если аренду аккаунта забрал другой хост, следующие шаги не запускаются
+        (выполняющиеся параллельно отменяются), а исход обработки не записывается: аккаунтом занимается тот хост.
+    :return: Deferred, если шаги нужно повторить позже, Cooldown, если нужна пауза после аккаунта (см. WorkerPool)
+    """
+    first_run = state is None
+    if first_run:
+        if account.has(AccountFlag.VERIFICATION_FAILED):
+            logger.warning(f"{account} Wallet failed verification before")
+            return None
+
+        state = AccountState(await journal.completed_steps(account) if journal else set())
+
+    plan = plan_steps(account, account_steps(mint_green_id, bind_discord))
+    if first_run:
+        if plan.skipped:
+            logger.debug(f"{account} Skipped steps: "
+                         + ", ".join(f"{name} ({reason})" for name, reason in plan.skipped.items()))
+        if planner_stats is not None:
+            planner_stats.record(plan)
+
+    if not plan.steps:
+        logger.info(f"{account} Nothing to do")
+        return None
+
+    mint_accounts = await load_accounts([account.database_id])
+    if not mint_accounts:
+        logger.warning(f"{account} Account was deleted")
+        return None
+
+    mint_account = mint_accounts[0]
+    mint_client = MintClient(mint_account)
+
+    durations = {}
+    deferred: dict[str, RetryLaterError] = {}
+    failed = False
+    finished = False  # Обработка не отложена: исход записывается вместе с изменениями аккаунта
+
+    async def run_step(step: Step):
+        if leases is not None and not leases.holds(account.database_id):
+            raise LeaseLostError(mint_account)
+        interacted = await run_account_step(
+            mint_account, step, journal, attempt=state.attempts.get(step.name, 1), defer=True, persist=mint_client.save)
+        state.interacted |= interacted
+
+    deadline = asyncio.timeout(account_timeout())
+    try:
+        async with deadline:
+            with tracked(deadline):
+                failed_steps = await run_steps(
+                    bind_steps(plan.steps, mint_client), run_step, state.completed_steps, durations, deferred,
+                    state.failed_steps)
+        if deferred:
+            for name, error in deferred.items():
+                state.attempts[name] = error.attempt
+            return Deferred(min(error.delay for error in deferred.values()), state)
+
+        finished = True
+        if failed_steps:
+            failed = True
+            logger.warning(f"{mint_account} Steps not completed: {', '.join(sorted(failed_steps))}")
+
+    except TimeoutError:
+        if not deadline.expired():
+            raise
+
+        deadline_stats.accounts += 1
+        state.timeouts += 1
+        if state.timeouts < CONFIG.CONCURRENCY.MAX_RETRIES:
+            delay = CONFIG.CONCURRENCY.DELAY_BETWEEN_RETRIES
+            logger.warning(f"{mint_account} Account deadline exceeded ({account_timeout():g} sec.)."
+                           f" Retry in {delay} sec.")
+            return Deferred(delay, state)
+        finished = failed = True
+        logger.error(f"{mint_account} Account deadline exceeded {state.timeouts} times")
+
+    except LeaseLostError as exc:
+        logger.warning(str(exc))
+
+    except Exception as exc:
+        if error_kind(exc) is not ErrorKind.ACCOUNT_FATAL:
+            raise
+        finished = failed = True
+        logger.error(f"{mint_account} {exc}")
+
+    finally:
+        if finished:
+            failure_rate, last_success_at = record_outcome(account, failed)
+            mint_client.update_account(failure_rate=failure_rate, last_success_at=last_success_at)
+            if failed and retry_failed:
+                mint_client.update_account(next_run_at=retry_run_at(mint_account.next_run_at))
+        # Одна запись в бд на обработку аккаунта (с журналом запуска еще и после каждого шага)
+        try:
+            await mint_client.save()
+        finally:
+            await mint_client.close()
+        account.update(mint_account)
+        if durations:
+            logger.debug(f"{mint_account} Steps: "
+                         + ", ".join(f"{name} {duration:.2f}s" for name, duration in durations.items()))
+            if timings is not None:
+                timings.add(durations)
+
+    sleep_time = randint(*CONFIG.CONCURRENCY.DELAY_BETWEEN_ACCOUNTS)
+    if state.interacted and sleep_time > 0:
+        logger.info(f"{mint_account} Cooldown {sleep_time} sec.")
+        return Cooldown(sleep_time)
+    return None
+
+
+@dataclass
+class StagedAccount:
+    account: MintAccount
+    client: MintClient
+    steps: dict[str, Step]
+    completed_steps: set[str]
+    failed_steps: set[str] = field(default_factory=set)
+    failed: bool = False  # Аккаунт остановлен (ErrorKind.ACCOUNT_FATAL или дедлайн аккаунта исчерпан)
+    lost: bool = False  # Аренду забрал другой хост (см. LeaseLostError)
+    interacted: bool = False
+    attempts: dict[str, int] = field(default_factory=dict)  # Номер следующей попытки отложенных шагов
+    # Сколько осталось от DEADLINE.ACCOUNT: учитывается только время шагов аккаунта, а не ожидание других стадий
+    time_left: float | None = field(default_factory=account_timeout)
+    timeouts: int = 0  # Сколько раз шаги не уложились в DEADLINE.ACCOUNT
+
+    def ready(self, step: Step) -> bool:
+        # Шаги, зависящие от не удавшихся, никогда не будут готовы
+        return (not self.failed
+                and not self.lost
+                and step.name not in self.completed_steps
+                and all(name in self.completed_steps or name not in self.steps for name in step.requires))
+
+
+async def _run_staged_step(
+        staged: StagedAccount,
+        step: Step,
+        journal: RunJournal = None,
+        leases: AccountLeases = None,
+) -> bool | Deferred:
+    """
+    Шаг ограничен остатком дедлайна аккаунта. Как и в пуле воркеров, пауза перед повторной попыткой
+    (и после превышения дедлайна аккаунта) не ждется здесь, а возвращается как Deferred (см. run_stage).
+
+    :return: Выполнен ли шаг или Deferred, если его нужно повторить позже
+    """
+    if leases is not None and not leases.holds(staged.account.database_id):
+        logger.warning(str(LeaseLostError(staged.account)))
+        staged.lost = True
+        return False
+
+    loop = asyncio.get_running_loop()
+    deadline = asyncio.timeout(staged.time_left)
+    try:
+        async with deadline:
+            with tracked(deadline):
+                interacted = await run_account_step(
+                    staged.account, step, journal,
+                    attempt=staged.attempts.get(step.name, 1), defer=True, persist=staged.client.save)
+    except RetryLaterError as exc:
+        staged.attempts[step.name] = exc.attempt
+        return Deferred(exc.delay)
+    except StepFailedError:
+        staged.failed_steps.add(step.name)
+        return False
+    except TimeoutError:
+        if not deadline.expired():
+            raise
+
+        deadline_stats.accounts += 1
+        staged.timeouts += 1
+        staged.time_left = account_timeout()
+        if staged.timeouts < CONFIG.CONCURRENCY.MAX_RETRIES:
+            delay = CONFIG.CONCURRENCY.DELAY_BETWEEN_RETRIES
+            logger.warning(f"{staged.account} Account deadline exceeded ({account_timeout():g} sec.)."
+                           f" Retry in {delay} sec.")
+            return Deferred(delay)
+        logger.error(f"{staged.account} Account deadline exceeded {staged.timeouts} times")
+        staged.failed = True
+        return False
+    except Exception as exc:
+        if error_kind(exc) is not ErrorKind.ACCOUNT_FATAL:
+            raise
+        logger.error(f"{staged.account} {exc}")
+        staged.failed = True
+        return False
+    finally:
+        # Ожидание обновления сайта (см. mint.deadline.paused) уже исключено из дедлайна
+        if deadline.when() is not None and not deadline.expired():
+            staged.time_left = max(deadline.when() - loop.time(), 0)
+
+    staged.completed_steps.add(step.name)
+    staged.interacted |= interacted
+    return True
+
+
+async def process_accounts_by_stages(
+        accounts: list[AccountSnapshot],
+        mint_green_id: bool,
+        bind_discord: bool,
+        journal: RunJournal = None,
+        planner_stats: PlannerStats = None,
+        cooldowns: set[asyncio.Task] = None,
+        leases: AccountLeases = None,
+) -> tuple[list[StageStats], int]:
+    """
+    Стадийный режим (см. mint.pipeline): каждый шаг выполняется для всех аккаунтов, прежде чем начнется следующий.
+    Каждый аккаунт проходит только стадии из своего плана (см. mint.planner).
+    Полные модели загружаются одним запросом для аккаунтов, у которых есть что делать.
+
+    :param cooldowns: Сюда добавляются паузы после аккаунтов (см. cool_down). Если не передан, паузы ожидаются здесь.
+    :param leases: Аренда аккаунтов. Аккаунт, аренду которого забрал другой хост, не проходит следующие стадии.
+    :return: Статистика стадий, количество аккаунтов, у которых не удался какой-либо шаг
+    """
+    all_steps = account_steps(mint_green_id, bind_discord)
+    plans = {}
+    snapshots = {account.database_id: account for account in accounts}
+    for account in accounts:
+        if account.has(AccountFlag.VERIFICATION_FAILED):
+            logger.warning(f"{account} Wallet failed verification before")
+            continue
+
+        plan = plan_steps(account, all_steps)
+        if planner_stats is not None:
+            planner_stats.record(plan)
+        if not plan.steps:
+            logger.info(f"{account} Nothing to do")
+            continue
+
+        plans[account.database_id] = plan
+
+    staged_accounts = []
+    mint_accounts = await load_accounts(list(plans)) if plans else []
+    for mint_account in mint_accounts:
+        mint_client = MintClient(mint_account, keep_sessions=True)
+        steps = bind_steps(plans[mint_account.database_id].steps, mint_client)
+        completed_steps = await journal.completed_steps(mint_account) if journal else set()
+        staged_accounts.append(StagedAccount(mint_account, mint_client, {step.name: step for step in steps}, completed_steps))
+
+    if not staged_accounts:
+        return [], 0
+
+    stages_stats = []
+    completed = False
+    try:
+        for stage in stage_order(all_steps):
+            if shutdown.requested:
+                break
+
+            if stage == "bind_discord" and mint_discord.invites_paused:
+                continue
+
+            stage_accounts = [
+                staged for staged in staged_accounts
+                if stage in staged.steps and staged.ready(staged.steps[stage])
+            ]
+            stage_stats = await run_stage(
+                stage,
+                stage_accounts,
+                lambda staged: _run_staged_step(staged, staged.steps[stage], journal, leases),
+                proxy_key=lambda staged: account_key(staged.account.proxy_database_id, staged.account.database_id),
+            )
+            logger.info(str(stage_stats))
+            stages_stats.append(stage_stats)
+        completed = True
+    finally:
+        for staged in staged_accounts:
+            # Порция, прерванная остановкой, не считается обработанной
+            if completed and not shutdown.requested and not staged.lost:
+                failure_rate, last_success_at = record_outcome(
+                    snapshots[staged.account.database_id], staged.failed or bool(staged.failed_steps))
+                staged.client.update_account(failure_rate=failure_rate, last_success_at=last_success_at)
+            try:
+                await staged.client.save()
+            finally:
+                await staged.client.close()
+
+    # Пауза одна на аккаунт и держит только его прокси: следующая порция на этом прокси ее дождется
+    tasks = set()
+    for staged in staged_accounts:
+        sleep_time = randint(*CONFIG.CONCURRENCY.DELAY_BETWEEN_ACCOUNTS)
+        if staged.interacted and sleep_time > 0:
+            logger.info(f"{staged.account} Cooldown {sleep_time} sec.")
+            tasks.add(asyncio.create_task(cool_down(
+                account_key(staged.account.proxy_database_id, staged.account.database_id), sleep_time)))
+    if cooldowns is not None:
+        cooldowns |= tasks
+        for task in tasks:
+            task.add_done_callback(cooldowns.discard)
+    elif tasks:
+        await asyncio.gather(*tasks)
+
+    return stages_stats, sum(1 for staged in staged_accounts if staged.failed or staged.failed_steps)
+
+
+async def _process_batches_by_stages(
+        accounts: AsyncIterable[AccountSnapshot],
+        mint_green_id: bool,
+        bind_discord: bool,
+        journal: RunJournal = None,
+        total: int = None,
+        on_progress: Callable[[int], None] = None,
+        planner_stats: PlannerStats = None,
+        leases: AccountLeases = None,
+) -> list[WorkerStats]:
+    stats = WorkerStats(1)
+    stages_stats: dict[str, StageStats] = {}
+    cooldowns: set[asyncio.Task] = set()
+    progress = tqdm(total=total, disable=on_progress is not None)
+    try:
+        async for batch in iter_batches(accounts, CONFIG.PIPELINE.BATCH_SIZE):
+            batch_stages_stats, failed = await process_accounts_by_stages(
+                batch, mint_green_id, bind_discord, journal, planner_stats, cooldowns, leases)
+            for stage_stats in batch_stages_stats:
+                stages_stats.setdefault(stage_stats.name, StageStats(stage_stats.name)).add(stage_stats)
+                stats.busy_time += stage_stats.busy_time
+
+            # Порция, прерванная остановкой, не считается обработанной
+            if shutdown.requested:
+                break
+
+            if leases is not None:
+                for account in batch:
+                    leases.release(account.database_id)
+
+            stats.processed += len(batch) - failed
+            stats.failed += failed
+            if on_progress:
+                on_progress(len(batch))
+            else:
+                progress.update(len(batch))
+    finally:
+        # После последней порции прокси ждать некому
+        for task in list(cooldowns):
+            task.cancel()
+        await asyncio.gather(*cooldowns, return_exceptions=True)
+        progress.close()
+        for stage_stats in stages_stats.values():
+            logger.info(f"Total: {stage_stats}")
+
+    logger.info(str(stats))
+    return [stats]
+
+
+async def process_groups(
+        groups: list[str],
+        *,
+        mint_green_id: bool,
+        bind_discord: bool,
+        shard: Shard = None,
+        partition: Shard = None,
+        on_progress: Callable[[int], None] = None,
+        forever: bool = False,
+        run_id: int = None,
+        stages: bool = False,
+) -> list[WorkerStats]:
+    """
+    :param partition: Часть аккаунтов для этого процесса (см. mint.multiprocess).
+    :param on_progress: См. WorkerPool. Если передан, количество аккаунтов не запрашивается.
+    :param forever: Бесконечный режим: аккаунты равномерно распределены по суткам (см. mint.scheduler).
+    :param run_id: id запуска для журнала шагов (см. mint.journal).
+    :param stages: Стадийный режим (см. mint.pipeline). Не совместим с forever.
+    :return: Статистика воркеров (в стадийном режиме пустая, если остановка отменила начатые аккаунты)
+    """
+    accounts_count = None
+    if on_progress is None and not forever:
+        # Сами аккаунты загружаются пулом воркеров лениво, здесь запрашивается только их количество
+        accounts_count = await count_accounts(groups, shard)
+        if shard:
+            logger.info(f"Shard {shard}: {accounts_count} accounts")
+
+    journal = RunJournal(run_id) if run_id is not None else None
+    timings = StepTimings()
+    planner_stats = PlannerStats()
+
+    # Несколько хостов на одной бд (см. mint.leases)
+    leases = None
+    if CONFIG.LEASE.ENABLED:
+        leases = AccountLeases(CONFIG.LEASE.DURATION, processed_before=None if forever else utcnow())
+        logger.info(f"Leasing accounts as {leases.owner}")
+
+    process = partial(
+        process_account,
+        mint_green_id=mint_green_id,
+        bind_discord=bind_discord,
+        journal=journal,
+        timings=timings,
+        planner_stats=planner_stats,
+        retry_failed=forever,
+        leases=leases,
+    )
+    if leases:
+        process = leases.wrap(process)
+
+    # Бесконечный режим: не доработавшие аккаунты возвращаются на прежнее время (см. mint.scheduler)
+    started = None
+    if forever:
+        started = StartedAccounts()
+        process = started.wrap(process)
+
+    pool = WorkerPool(process, CONFIG.CONCURRENCY.MAX_TASKS, on_progress=on_progress)
+
+    prioritized = CONFIG.PRIORITY.ENABLED
+    if forever:
+        accounts = iter_due_accounts(
+            groups, shard=shard, partition=partition, leases=leases, prioritized=prioritized, started=started)
+    else:
+        accounts = iter_accounts(groups, shard=shard, partition=partition, leases=leases, prioritized=prioritized)
+
+    # Ctrl+C и SIGTERM останавливают обработку корректно (см. mint.shutdown)
+    shutdown.install()
+    renewal = asyncio.create_task(leases.run()) if leases else None
+    # Изменения config.toml применяются без перезапуска (см. mint.reload)
+    watcher = asyncio.create_task(config_watcher.run()) if CONFIG.RELOAD.ENABLED else None
+    unsubscribe = config_watcher.subscribe(lambda: pool.resize(CONFIG.CONCURRENCY.MAX_TASKS))
+    try:
+        if stages:
+            return await shutdown.run(_process_batches_by_stages(
+                accounts, mint_green_id, bind_discord, journal, accounts_count, on_progress, planner_stats,
+                leases)) or []
+
+        await shutdown.run(pool.run(accounts, total=accounts_count))
+
+    except MintException as exc:
+        if is_maintenance(exc):
+            logger.warning(f"На сайте mintchain происходит обновление. Попробуйте запустить скрипт позже.")
+        else:
+            raise exc
+    finally:
+        shutdown.uninstall()
+        unsubscribe()
+        if watcher:
+            watcher.cancel()
+        mint_discord.invites_paused = False
+        if started:
+            await started.close()
+        if leases:
+            renewal.cancel()
+            await leases.close()
+        await session_pool.close()
+        await asyncio.to_thread(request_tracer.close)
+        # Соединения с бд закрываются до завершения event loop, чтобы записи не потерялись
+        await async_engine.dispose()
+        if planner_stats:
+            logger.info(str(planner_stats))
+        if deadline_stats:
+            logger.warning(str(deadline_stats))
+            deadline_stats.reset()
+        if service_limits:
+            logger.info(str(service_limits))
+            service_limits.reset_stats()
+        if session_pool:
+            logger.info(str(session_pool))
+            session_pool.reset_stats()
+        if response_cache:
+            logger.info(str(response_cache))
+            response_cache.reset_stats()
+        if timings:
+            logger.info(str(timings))
+
+    return pool.stats
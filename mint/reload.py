@@ -0,0 +1,154 @@
+"""
+Перезагрузка конфига без перезапуска (RELOAD):
+- Файл config.toml проверяется раз в RELOAD.INTERVAL секунд (по времени изменения).
+- Новый конфиг проверяется той же моделью Config. Если файл не разбирается или не проходит проверку,
+    ошибка пишется в лог и продолжается работа со старым конфигом.
+- Изменения применяются к CONFIG на месте: паузы, повторы, дедлайны, планировщик и приоритет
+    читаются из CONFIG при каждом использовании, ограничения (PROXY, LIMITS, MAINTENANCE, SHUTDOWN)
+    и TRACING переносятся в их объекты, количество воркеров меняют подписчики (см. WorkerPool.resize).
+- Разделы, которые используются только при запуске (RESTART_ONLY), не меняются до перезапуска.
+"""
+
+import asyncio
+import tomllib
+from typing import Callable
+
+from loguru import logger
+from pydantic import ValidationError
+
+from common.utils import load_toml
+
+from .breaker import mint_breaker
+from .config import CONFIG, Config
+from .governor import proxy_governor
+from .limits import configured_limits, service_limits
+from .paths import CONFIG_TOML
+from .shutdown import shutdown
+from .tracing import request_tracer
+
+
+# Раздел -> поля (None - весь раздел)
+RESTART_ONLY: dict[str, tuple[str, ...] | None] = {
+    "LOGGING": None,
+    "DATABASE": None,
+    "LEASE": None,
+    "RELOAD": None,
+    "CONCURRENCY": ("PROCESSES", "EVENT_LOOP"),
+}
+
+
+def _changed_fields(old: Config, new: Config) -> list[str]:
+    old_data, new_data = old.model_dump(), new.model_dump()
+    return [
+        f"{section}.{field}"
+        for section, fields in new_data.items()
+        for field, value in fields.items()
+        if old_data[section].get(field) != value
+    ]
+
+
+def _keep_restart_only(new: Config) -> list[str]:
+    """
+    Возвращает в new значения, которые меняются только при перезапуске.
+
+    :return: Измененные поля, которые не будут применены
+    """
+    kept = []
+    for section, fields in RESTART_ONLY.items():
+        old_section, new_section = getattr(CONFIG, section), getattr(new, section)
+        if fields is None:
+            if old_section != new_section:
+                kept.append(section)
+                setattr(new, section, old_section)
+            continue
+
+        restored = {field: getattr(old_section, field)
+                    for field in fields if getattr(old_section, field) != getattr(new_section, field)}
+        if restored:
+            kept.extend(f"{section}.{field}" for field in restored)
+            setattr(new, section, new_section.model_copy(update=restored))
+    return kept
+
+
+def apply_config(new: Config) -> list[str]:
+    """
+    Применяет new к CONFIG и объектам, которые хранят свою копию настроек.
+
+    :return: Примененные поля ("SECTION.FIELD")
+    """
+    kept = _keep_restart_only(new)
+    if kept:
+        logger.warning(f"Config: {', '.join(kept)} will be applied after restart")
+
+    changed = _changed_fields(CONFIG, new)
+    for section in new.model_fields:
+        setattr(CONFIG, section, getattr(new, section))
+
+    proxy_governor.reconfigure(CONFIG.PROXY.MAX_ACCOUNTS, CONFIG.PROXY.REQUESTS_PER_MINUTE, CONFIG.PROXY.BURST)
+    service_limits.reconfigure(configured_limits())
+    mint_breaker.probe = CONFIG.MAINTENANCE.PROBE
+    mint_breaker.probe_delay = CONFIG.MAINTENANCE.PROBE_DELAY
+    mint_breaker.max_probe_delay = CONFIG.MAINTENANCE.MAX_PROBE_DELAY
+    shutdown.grace_period = CONFIG.SHUTDOWN.GRACE_PERIOD
+    request_tracer.configure(CONFIG.TRACING.ENABLED, CONFIG.TRACING.MAX_BYTES, CONFIG.TRACING.BACKUPS)
+    return changed
+
+
+class ConfigWatcher:
+    def __init__(self, path=CONFIG_TOML, interval: float = 5):
+        self.path = path
+        self.interval = interval
+        self._mtime = self._stat()
+        self._subscribers: list[Callable[[], None]] = []
+
+    def _stat(self) -> float | None:
+        try:
+            return self.path.stat().st_mtime
+        except OSError:
+            return None
+
+    def subscribe(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        :param callback: Вызывается после применения нового конфига
+        :return: Функция отписки
+        """
+        self._subscribers.append(callback)
+        return lambda: self._subscribers.remove(callback)
+
+    def reload(self) -> bool:
+        """
+        :return: Применен ли новый конфиг
+        """
+        try:
+            new = Config(**load_toml(self.path))
+        except (OSError, tomllib.TOMLDecodeError, ValidationError) as exc:
+            logger.error(f"Config: {self.path.name} is invalid, keeping the current config\n{exc}")
+            return False
+
+        changed = apply_config(new)
+        if not changed:
+            return False
+
+        logger.info(f"Config reloaded: {', '.join(changed)}")
+        for callback in list(self._subscribers):
+            try:
+                callback()
+            except Exception as exc:
+                logger.exception(f"Config: failed to apply changes: {exc}")
+        return True
+
+    def check(self) -> bool:
+        mtime = self._stat()
+        if mtime is None or mtime == self._mtime:
+            return False
+
+        self._mtime = mtime
+        return self.reload()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.check()
+
+
+config_watcher = ConfigWatcher(interval=CONFIG.RELOAD.INTERVAL)
@@ -0,0 +1,186 @@
+"""
+Повторные попытки шагов:
+- Ошибка классифицируется по таблице ERROR_RULES (первое совпадение):
+    - RETRYABLE: временная ошибка (прокси, 5XX, 429, дедлайн попытки). Шаг повторяется.
+    - FATAL: шаг не удался. Зависящие от него шаги пропускаются, остальные шаги аккаунта выполняются.
+    - ACCOUNT_FATAL: проблема аккаунта (кошелек не прошел проверку, плохой аккаунт Twitter). Аккаунт останавливается.
+    - GLOBAL_FATAL: проблема всего скрипта. Останавливается весь запуск.
+        System Maintenance останавливает запуск, только если отключены пробы (см. mint.breaker).
+    Ошибки не из таблицы считаются неожиданными и останавливают весь запуск.
+- Повторяется только шаг, а не вся обработка аккаунта.
+- Пауза между попытками растет экспоненциально (со случайным разбросом), у каждого шага свой лимит попыток.
+- В пуле воркеров пауза не ждется на месте: шаг откладывается (RetryLaterError), и аккаунт освобождает воркер.
+"""
+
+import asyncio
+import random
+from dataclasses import dataclass
+from enum import Enum
+from typing import Awaitable, Callable, TypeVar
+
+from loguru import logger
+from curl_cffi import requests
+from twitter.errors import HTTPException as TwitterHTTPException, BadAccount as TwitterBadAccountError
+
+from .api.errors import HTTPException as MintHTTPException, MaintenanceError
+from .config import CONFIG
+from .tracing import current_attempt
+from .errors import (
+    DeadlineExceededError,
+    DiscordScriptError,
+    RetryLaterError,
+    StepFailedError,
+    TwitterScriptError,
+)
+
+
+T = TypeVar("T")
+
+
+class ErrorKind(Enum):
+    RETRYABLE = "retryable"
+    FATAL = "fatal"
+    ACCOUNT_FATAL = "account fatal"
+    GLOBAL_FATAL = "global fatal"
+
+
+SERVER_ERRORS = tuple(range(500, 600))
+TOO_MANY_REQUESTS = (429, )
+# Ошибки curl, которые обычно означают плохой или медленный прокси:
+#   7 - не удалось подключиться, 23 - ошибка записи, 28 - таймаут, 35 - ошибка SSL, 56 - ошибка получения данных
+PROXY_CURL_CODES = (7, 23, 28, 35, 56)
+
+
+@dataclass(frozen=True)
+class ErrorRule:
+    exception: type[Exception] | tuple[type[Exception], ...]
+    kind: ErrorKind
+    message: str = None  # MintHTTPException.message
+    statuses: tuple[int, ...] = None  # Код ответа HTTP
+    curl_codes: tuple[int, ...] = None  # RequestsError.code
+    note: str = None  # Пояснение для лога
+
+    def matches(self, exc: Exception) -> bool:
+        if not isinstance(exc, self.exception):
+            return False
+
+        if self.message is not None and getattr(exc, "message", None) != self.message:
+            return False
+
+        if self.statuses is not None:
+            response = getattr(exc, "response", None)
+            if response is None or response.status_code not in self.statuses:
+                return False
+
+        if self.curl_codes is not None and getattr(exc, "code", None) not in self.curl_codes:
+            return False
+
+        return True
+
+
+ERROR_RULES = (
+    # Mint API
+    ErrorRule(MaintenanceError, ErrorKind.GLOBAL_FATAL),
+    ErrorRule(MintHTTPException, ErrorKind.GLOBAL_FATAL, message="System Maintenance"),
+    ErrorRule(MintHTTPException, ErrorKind.ACCOUNT_FATAL,
+              message="Unfortunately, you did not pass our verification process."),
+    ErrorRule(MintHTTPException, ErrorKind.RETRYABLE, statuses=SERVER_ERRORS + TOO_MANY_REQUESTS),
+    ErrorRule(MintHTTPException, ErrorKind.FATAL),
+    # Twitter
+    ErrorRule(TwitterBadAccountError, ErrorKind.ACCOUNT_FATAL),
+    ErrorRule(TwitterHTTPException, ErrorKind.RETRYABLE, statuses=SERVER_ERRORS + TOO_MANY_REQUESTS),
+    ErrorRule(TwitterHTTPException, ErrorKind.FATAL),
+    # Зависшая попытка шага (см. mint.deadline)
+    ErrorRule(DeadlineExceededError, ErrorKind.RETRYABLE, note="May be hung proxy"),
+    # Предусмотренные ошибки логики скрипта
+    ErrorRule((TwitterScriptError, DiscordScriptError), ErrorKind.FATAL),
+    # curl (прокси, сеть)
+    ErrorRule(requests.errors.RequestsError, ErrorKind.RETRYABLE, curl_codes=PROXY_CURL_CODES,
+              note="May be bad or slow proxy"),
+    ErrorRule(requests.errors.RequestsError, ErrorKind.FATAL),
+)
+
+
+def classify(exc: Exception) -> ErrorRule | None:
+    """
+    :return: Первое подходящее правило или None для неожиданной ошибки
+    """
+    for rule in ERROR_RULES:
+        if rule.matches(exc):
+            return rule
+    return None
+
+
+def error_kind(exc: Exception) -> ErrorKind | None:
+    rule = classify(exc)
+    return rule.kind if rule else None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int
+    base_delay: float  # sec.
+    max_delay: float  # sec.
+    multiplier: float = 2
+
+    @classmethod
+    def for_step(cls, step: str) -> "RetryPolicy":
+        return cls(
+            max_attempts=CONFIG.RETRY.STEP_MAX_ATTEMPTS.get(step, CONFIG.CONCURRENCY.MAX_RETRIES),
+            base_delay=CONFIG.CONCURRENCY.DELAY_BETWEEN_RETRIES,
+            max_delay=CONFIG.RETRY.MAX_DELAY,
+            multiplier=CONFIG.RETRY.MULTIPLIER,
+        )
+
+    def delay(self, attempt: int) -> float:
+        """
+        Пауза после неудачной попытки attempt (нумерация с единицы).
+        Случайная в пределах от половины до полного значения, чтобы повторы разных аккаунтов не совпадали.
+        """
+        delay = min(self.base_delay * self.multiplier ** (attempt - 1), self.max_delay)
+        return random.uniform(delay / 2, delay)
+
+
+async def call_with_retries(
+        action: Callable[[], Awaitable[T]],
+        policy: RetryPolicy,
+        label: str,
+        *,
+        attempt: int = 1,
+        defer: bool = False,
+) -> T:
+    """
+    :param label: Префикс для лога (аккаунт и шаг).
+    :param attempt: Номер первой попытки (при продолжении отложенного шага).
+    :param defer: Не ждать паузу перед повторной попыткой, а поднять RetryLaterError.
+    :raises StepFailedError: Если ошибка FATAL или попытки закончились.
+    Ошибки ACCOUNT_FATAL, GLOBAL_FATAL и неожиданные пробрасываются как есть.
+    Обновление сайта не тратит попытки и не повторяет шаг: ждет и повторяется сам запрос (см. mint.breaker).
+    """
+    attempt -= 1
+    while True:
+        attempt += 1
+        current_attempt.set(attempt)
+        try:
+            return await action()
+        except Exception as exc:
+            rule = classify(exc)
+            if rule is None or rule.kind in (ErrorKind.ACCOUNT_FATAL, ErrorKind.GLOBAL_FATAL):
+                raise
+
+            message = f"{label} ({rule.note}) {exc}" if rule.note else f"{label} {exc}"
+            if rule.kind is ErrorKind.FATAL:
+                logger.error(message)
+                raise StepFailedError(exc) from exc
+
+            if attempt >= policy.max_attempts:
+                logger.error(f"{message}. Attempts exhausted: {attempt}")
+                raise StepFailedError(exc) from exc
+
+            sleep_time = policy.delay(attempt)
+            logger.warning(f"{message}."
+                           f" Повторная попытка через {sleep_time:.1f}s."
+                           f" Осталось попыток: {policy.max_attempts - attempt}.")
+            if defer:
+                raise RetryLaterError(exc, sleep_time, attempt + 1) from exc
+            await asyncio.sleep(sleep_time)
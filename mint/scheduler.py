@@ -0,0 +1,174 @@
+"""
+Бесконечный режим:
+- У каждого аккаунта в БД хранится время следующего запуска (MintAccount.next_run_at, UTC).
+- Новые аккаунты равномерно распределяются по периоду (SCHEDULER.PERIOD_HOURS, по умолчанию сутки).
+- Аккаунт отдается в работу, когда наступает его время, и сразу переносится на период вперед,
+    сохраняя свое время суток. Поэтому нагрузка на mintchain.io остается ровной, а не пачками.
+- Если обработка аккаунта не удалась, он запускается снова через SCHEDULER.RETRY_MINUTES (см. retry_run_at).
+    Аккаунты, которые не доработали из-за остановки или ошибки, при завершении возвращаются
+    на прежнее время (см. StartedAccounts) и берутся сразу при следующем запуске.
+- Когда работы нет, планировщик спит до ближайшего аккаунта.
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable
+
+from loguru import logger
+
+from common.utils import utcnow
+
+from .config import CONFIG
+from .database import (
+    AsyncSessionmaker,
+    AccountSnapshot,
+    get_account_snapshots_by_ids,
+    get_unscheduled_account_ids,
+    get_due_account_ids,
+    get_nearest_run_at,
+    set_next_run_at,
+)
+from .pool import Deferred
+from .priority import prioritize
+from .sharding import Shard, in_parts
+
+if TYPE_CHECKING:
+    from .leases import AccountLeases
+
+
+# Сколько максимум спать между проверками. Заодно подхватываются новые импортированные аккаунты
+MAX_SLEEP_TIME = 60  # sec.
+
+
+def next_run_after(due: datetime, now: datetime, period: timedelta) -> datetime:
+    """
+    Следующий запуск через целое число периодов после due, но не раньше now.
+    """
+    next_run_at = due + period
+    if next_run_at <= now:
+        next_run_at += period * ((now - next_run_at) // period + 1)
+    return next_run_at
+
+
+def retry_run_at(next_run_at: datetime, now: datetime = None) -> datetime:
+    """
+    :param next_run_at: Время следующего запуска, на которое аккаунт уже перенесен.
+    :return: Время повтора аккаунта, обработка которого не удалась
+    """
+    if CONFIG.SCHEDULER.RETRY_MINUTES <= 0:
+        return next_run_at
+    return min((now or utcnow()) + timedelta(minutes=CONFIG.SCHEDULER.RETRY_MINUTES), next_run_at)
+
+
+class StartedAccounts:
+    """
+    Аккаунты, отданные в работу, и их время запуска до переноса на период вперед.
+    """
+
+    def __init__(self):
+        self._due_at: dict[int, datetime] = {}
+
+    def add(self, account: AccountSnapshot, due_at: datetime):
+        self._due_at[account.database_id] = due_at
+
+    def wrap(self, process: Callable[[AccountSnapshot, Any], Awaitable]) -> Callable[[AccountSnapshot, Any], Awaitable]:
+        """
+        :return: process для WorkerPool, который отмечает обработанные аккаунты (отложенный остается начатым)
+        """
+        async def process_scheduled(account: AccountSnapshot, state: Any = None):
+            result = await process(account, state)
+            if not isinstance(result, Deferred):
+                self._due_at.pop(account.database_id, None)
+            return result
+
+        return process_scheduled
+
+    async def close(self):
+        """
+        Возвращает прежнее время запуска аккаунтам, которые не доработали (ошибка, остановка).
+        """
+        if not self._due_at:
+            return
+
+        async with AsyncSessionmaker() as session:
+            await set_next_run_at(session, self._due_at)
+            await session.commit()
+        logger.info(f"Rescheduled {len(self._due_at)} unfinished accounts to their previous run time")
+        self._due_at.clear()
+
+
+async def schedule_new_accounts(groups: list[str], period: timedelta, shard: Shard = None, partition: Shard = None) -> int:
+    """
+    :return: Количество распределенных аккаунтов
+    """
+    async with AsyncSessionmaker() as session:
+        database_ids = [
+            database_id for database_id, proxy_database_id in await get_unscheduled_account_ids(session, groups)
+            if in_parts(database_id, proxy_database_id, shard, partition)
+        ]
+        if not database_ids:
+            return 0
+
+        now = utcnow()
+        step = period / len(database_ids)
+        await set_next_run_at(session, {
+            database_id: now + step * index for index, database_id in enumerate(database_ids)
+        })
+        await session.commit()
+
+    logger.info(f"Scheduled {len(database_ids)} new accounts over {period}")
+    return len(database_ids)
+
+
+async def iter_due_accounts(
+        groups: list[str],
+        batch_size: int = 100,
+        shard: Shard = None,
+        partition: Shard = None,
+        leases: "AccountLeases" = None,
+        prioritized: bool = False,
+        started: StartedAccounts = None,
+) -> AsyncIterator[AccountSnapshot]:
+    """
+    Бесконечно отдает аккаунты, которым пора работать. Параметры как у mint.pool.iter_accounts.
+    Порядок задает время запуска, приоритет (prioritized) упорядочивает только аккаунты одной выборки.
+    Аккаунты сначала захватываются (если переданы leases), и только захваченные переносятся на период вперед.
+
+    :param started: Сюда добавляются отданные аккаунты с прежним временем запуска.
+    """
+    while True:
+        period = timedelta(hours=CONFIG.SCHEDULER.PERIOD_HOURS)
+        await schedule_new_accounts(groups, period, shard, partition)
+
+        now = utcnow()
+        async with AsyncSessionmaker() as session:
+            database_ids = [
+                database_id for database_id, proxy_database_id in await get_due_account_ids(session, groups, now)
+                if in_parts(database_id, proxy_database_id, shard, partition)
+            ][:batch_size]
+            if leases is not None:
+                claimed = await leases.claim(session, database_ids)
+                database_ids = [database_id for database_id in database_ids if database_id in claimed]
+
+            accounts = await get_account_snapshots_by_ids(session, database_ids)
+            if prioritized:
+                accounts = prioritize(accounts, now)
+            for account in accounts:
+                if started is not None:
+                    started.add(account, account.next_run_at)
+                account.next_run_at = next_run_after(account.next_run_at, now, period)
+            await set_next_run_at(session, {account.database_id: account.next_run_at for account in accounts})
+            await session.commit()
+
+            nearest_run_at = await get_nearest_run_at(session, groups, now) if not accounts else None
+
+        if accounts:
+            for account in accounts:
+                yield account
+            continue
+
+        sleep_time = MAX_SLEEP_TIME
+        if nearest_run_at is not None:
+            sleep_time = min(max((nearest_run_at - utcnow()).total_seconds(), 0), MAX_SLEEP_TIME)
+        logger.debug(f"No accounts due. Next check in {sleep_time:.0f} sec. (nearest run at {nearest_run_at} UTC)")
+        await asyncio.sleep(sleep_time)
@@ -0,0 +1,64 @@
+import hashlib
+from dataclasses import dataclass
+
+
+def stable_hash(key: int | str) -> int:
+    """
+    В отличие от встроенного hash(), не зависит от процесса, хоста и PYTHONHASHSEED.
+    """
+    digest = hashlib.blake2b(str(key).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def proxy_partition_key(database_id: int, proxy_database_id: int | None) -> int | str:
+    """
+    Аккаунты с общим прокси получают общий ключ и попадают в одну часть,
+    поэтому ограничения ProxyGovernor продолжают работать, когда части обрабатываются разными процессами.
+    Аккаунты без прокси друг друга не ограничивают (см. mint.governor.account_key) и распределяются по database_id.
+    """
+    if proxy_database_id is None:
+        return database_id
+    return f"proxy:{proxy_database_id}"
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    Часть index из count (нумерация с единицы, как в --shard 1/4).
+    Аккаунт попадает ровно в одну часть, поэтому несколько процессов или хостов
+    могут обрабатывать одну группу без пересечений.
+    """
+    index: int
+    count: int
+
+    def __post_init__(self):
+        if self.count < 1 or not 1 <= self.index <= self.count:
+            raise ValueError(f"Invalid shard {self.index}/{self.count}")
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+    @classmethod
+    def from_str(cls, value: str) -> "Shard":
+        try:
+            index, count = value.split("/")
+            return cls(int(index), int(count))
+        except ValueError:
+            raise ValueError(f"Shard must be in 'i/n' format (1 <= i <= n), got '{value}'")
+
+    def contains(self, key: int | str) -> bool:
+        return stable_hash(key) % self.count == self.index - 1
+
+
+def in_parts(database_id: int, proxy_database_id: int | None, shard: Shard = None, partition: Shard = None) -> bool:
+    """
+    :param shard: Часть по database_id (см. --shard).
+    :param partition: Часть по proxy_partition_key (см. mint.multiprocess).
+    """
+    if shard is not None and not shard.contains(database_id):
+        return False
+
+    if partition is not None and not partition.contains(proxy_partition_key(database_id, proxy_database_id)):
+        return False
+
+    return True
@@ -0,0 +1,111 @@
+"""
+Корректная остановка по SIGINT (Ctrl+C) и SIGTERM (остановка сервиса):
+- Первый сигнал останавливает запуск новых аккаунтов (и новых стадий в стадийном режиме).
+- Начатые аккаунты дорабатывают не дольше SHUTDOWN.GRACE_PERIOD, затем отменяются.
+    При отмене клиенты закрываются как обычно: данные Twitter и Discord сохраняются в бд.
+- Затем закрываются соединения с бд, и следующий запуск начинается с актуального состояния.
+- Повторный сигнал отменяет начатые аккаунты сразу.
+"""
+
+import asyncio
+import signal
+from typing import Awaitable, TypeVar
+
+from loguru import logger
+
+from common.loop import LoopBound
+
+from .config import CONFIG
+
+
+T = TypeVar("T")
+
+SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class Shutdown(LoopBound):
+    def __init__(self, grace_period: float = 60):
+        self.grace_period = grace_period
+        self._requested: asyncio.Event | None = None
+        self._forced: asyncio.Event | None = None
+
+    def _reset_loop_state(self):
+        self._requested = asyncio.Event()
+        self._forced = asyncio.Event()
+
+    @property
+    def requested(self) -> bool:
+        return self._requested is not None and self._requested.is_set()
+
+    def request(self):
+        """
+        Можно вызывать из обработчика сигнала в потоке event loop.
+        """
+        self._check_loop()
+        if not self._requested.is_set():
+            logger.warning(f"Shutting down: no new accounts will be started."
+                           f" Waiting up to {self.grace_period:g} sec. for started ones (repeat to stop now)")
+            self._requested.set()
+        elif not self._forced.is_set():
+            logger.warning("Stopping now")
+            self._forced.set()
+
+    def _on_signal(self):
+        self._loop.call_soon_threadsafe(self.request)
+
+    def install(self):
+        """
+        Перехватывает SIGINT и SIGTERM в текущем event loop.
+        """
+        self._check_loop()
+        for signum in SIGNALS:
+            try:
+                self._loop.add_signal_handler(signum, self.request)
+            except NotImplementedError:
+                # Windows: обработчики сигналов только через signal.signal
+                signal.signal(signum, lambda *_: self._on_signal())
+
+    def uninstall(self):
+        for signum in SIGNALS:
+            try:
+                self._loop.remove_signal_handler(signum)
+            except NotImplementedError:
+                signal.signal(signum, signal.default_int_handler if signum == signal.SIGINT else signal.SIG_DFL)
+
+    async def wait(self):
+        self._check_loop()
+        await self._requested.wait()
+
+    async def run(self, work: Awaitable[T]) -> T | None:
+        """
+        Выполняет work. После запроса остановки ждет его окончания не дольше grace_period, затем отменяет.
+
+        :return: Результат work или None, если он был отменен
+        """
+        self._check_loop()
+        task = asyncio.ensure_future(work)
+        requested = asyncio.create_task(self._requested.wait())
+        try:
+            await asyncio.wait((task, requested), return_when=asyncio.FIRST_COMPLETED)
+            if not task.done():
+                forced = asyncio.create_task(self._forced.wait())
+                try:
+                    await asyncio.wait((task, forced), timeout=self.grace_period, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    forced.cancel()
+
+            if not task.done():
+                logger.warning("Cancelling started accounts")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                if task.cancelled():
+                    return None
+            return task.result()
+        finally:
+            requested.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+
+shutdown = Shutdown(CONFIG.SHUTDOWN.GRACE_PERIOD)
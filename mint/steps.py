@@ -0,0 +1,125 @@
+"""
+Шаги обработки аккаунта как граф зависимостей:
+- Шаг запускается, как только завершены все шаги из его requires.
+- Независимые шаги выполняются параллельно, поэтому время обработки аккаунта
+    определяется самой длинной цепочкой зависимостей, а не суммой всех шагов.
+- Время каждого шага замеряется (см. StepTimings).
+"""
+
+import asyncio
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from .errors import RetryLaterError, StepFailedError
+
+
+@dataclass(frozen=True)
+class Step:
+    name: str
+    action: Callable[[], Awaitable[bool | None]]
+    requires: tuple[str, ...] = ()
+
+
+class StepTimings:
+    """
+    Суммарное время шагов всех аккаунтов (для отчета по запуску)
+    """
+
+    def __init__(self):
+        self.total_time: dict[str, float] = defaultdict(float)
+        self.count: dict[str, int] = defaultdict(int)
+
+    def add(self, durations: dict[str, float]):
+        for name, duration in durations.items():
+            self.total_time[name] += duration
+            self.count[name] += 1
+
+    def __bool__(self):
+        return bool(self.count)
+
+    def __str__(self):
+        return "Step timings (avg):" + "".join(
+            f"\n\t{name}: {self.total_time[name] / count:.2f} sec. ({count} times)"
+            for name, count in self.count.items()
+        )
+
+
+async def _timed_step(run: Callable[[Step], Awaitable], step: Step) -> float:
+    started_at = time.perf_counter()
+    await run(step)
+    return time.perf_counter() - started_at
+
+
+async def run_steps(
+        steps: list[Step],
+        run: Callable[[Step], Awaitable],
+        completed: set[str],
+        durations: dict[str, float],
+        deferred: dict[str, RetryLaterError] = None,
+        failed_steps: set[str] = None,
+) -> set[str]:
+    """
+    Зависимость от шага, которого нет в steps (например, отключенная привязка Discord), считается выполненной.
+    Если шаг не удался (StepFailedError) или отложен (RetryLaterError),
+        зависящие от него шаги пропускаются, остальные продолжают выполняться.
+    Любая другая ошибка отменяет остальные выполняющиеся шаги и пробрасывается.
+
+    :param run: Выполняет шаг.
+    :param completed: Уже завершенные шаги (пропускаются). Дополняется по мере выполнения.
+    :param durations: Сюда записывается время выполнения завершенных шагов.
+    :param deferred: Сюда записываются отложенные шаги.
+    :param failed_steps: Шаги, которые уже не удались (StepFailedError) в прошлом запуске, не запускаются снова.
+        Дополняется по мере выполнения.
+    :return: Не удавшиеся и пропущенные из-за не удавшихся или отложенных шаги
+    """
+    names = {step.name for step in steps}
+    failed_steps = set() if failed_steps is None else failed_steps
+    pending = [step for step in steps if step.name not in completed and step.name not in failed_steps]
+    running: dict[asyncio.Task, Step] = {}
+    failed = failed_steps & names
+    deferred = {} if deferred is None else deferred
+
+    try:
+        while pending or running:
+            for step in list(pending):
+                if all(name in completed or name not in names for name in step.requires):
+                    pending.remove(step)
+                    running[asyncio.create_task(_timed_step(run, step))] = step
+
+            if not running:
+                if not failed and not deferred:
+                    raise ValueError(f"Unsatisfiable step dependencies: {[step.name for step in pending]}")
+                # Оставшиеся шаги зависят от не удавшихся или отложенных
+                failed.update(step.name for step in pending)
+                break
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            exception = None
+            for task in done:
+                step = running.pop(task)
+                if isinstance(task.exception(), StepFailedError):
+                    failed.add(step.name)
+                    failed_steps.add(step.name)
+                    continue
+
+                if isinstance(task.exception(), RetryLaterError):
+                    deferred[step.name] = task.exception()
+                    continue
+
+                if task.exception() is not None:
+                    exception = exception or task.exception()
+                    continue
+
+                durations[step.name] = task.result()
+                completed.add(step.name)
+
+            if exception is not None:
+                raise exception
+    finally:
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    return failed
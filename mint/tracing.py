@@ -0,0 +1,174 @@
+"""
+Трассировка запросов к Mint API (TRACING):
+- Каждый запрос HTTPClient записывается одной строкой JSON (span): метод, endpoint без параметров,
+    статус, размер ответа, время DNS, соединения, TLS, до первого байта и общее (по данным curl),
+    прокси, аккаунт и номер повтора шага.
+- Запись идет в отдельном потоке через очередь, event loop не ждет диск.
+    Файл ротируется по размеру (TRACING.MAX_BYTES, TRACING.BACKUPS).
+- Выключенная трассировка стоит одну проверку request_tracer.enabled на запрос.
+
+Найти медленные endpoint и прокси: log/requests.jsonl, например
+    jq -s 'group_by(.proxy) | map({proxy: .[0].proxy, total: (map(.total) | add / length)})' log/requests.jsonl
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+from contextvars import ContextVar
+from pathlib import Path
+
+from curl_cffi import CurlInfo
+from loguru import logger
+
+from .config import CONFIG
+from .paths import LOG_DIR
+
+
+# Номер попытки текущего шага (см. call_with_retries)
+current_attempt: ContextVar[int] = ContextVar("current_attempt", default=1)
+
+CURL_INFOS = [
+    CurlInfo.NAMELOOKUP_TIME,
+    CurlInfo.CONNECT_TIME,
+    CurlInfo.APPCONNECT_TIME,
+    CurlInfo.STARTTRANSFER_TIME,
+    CurlInfo.TOTAL_TIME,
+]
+
+
+def trace_filepath() -> Path:
+    # У каждого процесса (--processes) свой файл
+    if multiprocessing.parent_process() is None:
+        return LOG_DIR / "requests.jsonl"
+    return LOG_DIR / f"requests.{os.getpid()}.jsonl"
+
+
+def _span(record: tuple) -> dict:
+    """
+    Разбирает запись из очереди в span. Выполняется в потоке записи.
+    """
+    started_at, method, url, status, size, infos, proxy, account, attempt, error = record
+    dns, connect, tls, ttfb, total = (infos.get(info, 0) for info in CURL_INFOS)
+    # Время curl накопительное от начала запроса. 0 - этап пропущен (соединение переиспользовано)
+    handshake_end = max(tls, connect, dns)
+    span = {
+        "ts": round(started_at, 3),
+        "method": method,
+        "endpoint": url.split("?", 1)[0],
+        "status": status,
+        "bytes": size,
+        "dns": round(dns * 1000, 2),
+        "connect": round(max(connect - dns, 0) * 1000, 2) if connect else 0,
+        "tls": round(max(tls - connect, 0) * 1000, 2) if tls else 0,
+        "ttfb": round(max(ttfb - handshake_end, 0) * 1000, 2) if ttfb else 0,
+        "total": round(total * 1000, 2),
+        "proxy": proxy,
+        "account": account,
+        "retry": attempt - 1,
+    }
+    if error is not None:
+        span["error"] = error
+    return span
+
+
+class RequestTracer:
+    def __init__(self, enabled: bool = False, max_bytes: int = 50 * 1024 * 1024, backups: int = 3):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.filepath: Path | None = None
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._writer: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, max_bytes: int, backups: int):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def record(
+            self,
+            started_at: float,
+            method: str,
+            url: str,
+            status: int | None,
+            size: int,
+            infos: dict,
+            proxy_database_id: int | None,
+            account_database_id: int | None,
+            error: str = None,
+    ):
+        """
+        Ставит span в очередь записи. Вызывается только при enabled.
+
+        :param started_at: time.time() перед запросом
+        :param infos: Response.infos (CURL_INFOS)
+        """
+        self._queue.put((
+            started_at, method, url, status, size, infos,
+            proxy_database_id, account_database_id, current_attempt.get(), error,
+        ))
+        if self._writer is None:
+            self._start()
+
+    def _start(self):
+        with self._lock:
+            if self._writer is not None:
+                return
+
+            self.filepath = trace_filepath()
+            self._writer = threading.Thread(target=self._write_loop, name="request-tracer", daemon=True)
+            self._writer.start()
+
+    def _rotate(self):
+        for number in range(self.backups - 1, 0, -1):
+            source = self.filepath.with_name(f"{self.filepath.name}.{number}")
+            if source.exists():
+                source.replace(self.filepath.with_name(f"{self.filepath.name}.{number + 1}"))
+        if self.backups > 0:
+            self.filepath.replace(self.filepath.with_name(f"{self.filepath.name}.1"))
+        else:
+            self.filepath.unlink()
+
+    def _write_loop(self):
+        file = open(self.filepath, "a", encoding="utf-8")
+        written = file.tell()
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+
+                try:
+                    line = json.dumps(_span(record), separators=(",", ":")) + "\n"
+                    file.write(line)
+                    written += len(line)
+                    if self.max_bytes and written >= self.max_bytes:
+                        file.close()
+                        self._rotate()
+                        file = open(self.filepath, "a", encoding="utf-8")
+                        written = 0
+                    # Пока очередь не пуста, запись идет в буфер
+                    elif self._queue.empty():
+                        file.flush()
+                except Exception as exc:
+                    logger.error(f"Request tracing: {exc}")
+        finally:
+            file.close()
+
+    def close(self):
+        """
+        Дописывает очередь и останавливает поток записи.
+        """
+        with self._lock:
+            writer, self._writer = self._writer, None
+            if writer is None:
+                return
+
+            self._queue.put(None)
+        writer.join()
+
+
+request_tracer = RequestTracer(CONFIG.TRACING.ENABLED, CONFIG.TRACING.MAX_BYTES, CONFIG.TRACING.BACKUPS)
@@ -1,7 +1,13 @@
+import asyncio
+
 from better_proxy import Proxy as BetterProxy
 import twitter
+from twitter.base import BaseHTTPClient
+from twitter.base.session import BaseAsyncSession
 
 from .config import CONFIG
+from .governor import proxy_governor
+from .limits import service_limits
 
 from .database import (
     AsyncSessionmaker,
@@ -11,14 +17,57 @@ from .database import (
 )
 
 
-class TwitterClient(twitter.Client):
+class TwitterSession(BaseAsyncSession):
+    """
+    Соблюдает ограничение запросов на прокси и на Twitter (см. mint.limits) на время самого HTTP запроса.
+    Пауза twitter.Client после 429 (wait_on_rate_limit) и повтор запроса слот не держат.
+    """
+
+    def __init__(self, proxy_database_id: int = None, **session_kwargs):
+        super().__init__(**session_kwargs)
+        self.proxy_database_id = proxy_database_id
+
+    async def request(self, method, url, **kwargs):
+        await proxy_governor.throttle(self.proxy_database_id)
+        async with service_limits.slot("twitter"):
+            return await super().request(method, url, **kwargs)
+
+
+class LimitedHTTPClient(BaseHTTPClient):
+    """
+    Создает сессию twitter.Client сразу с ограничениями (TwitterSession), а не заменяет готовую:
+    в порядке наследования TwitterClient стоит между twitter.Client и BaseHTTPClient.
+    """
+    proxy_database_id: int | None
+
+    def __init__(self, **session_kwargs):
+        self._session = TwitterSession(
+            self.proxy_database_id,
+            headers=session_kwargs.pop("headers", None) or self._DEFAULT_HEADERS,
+            **session_kwargs,
+        )
+
+
+class TwitterClient(twitter.Client, LimitedHTTPClient):
     """
     - Принимает модель TwitterAccount
     - Сохраняет данные о TwitterAccount и TwitterAccount.user в бд по завершении работы
+    - Соблюдает ограничение запросов на прокси (proxy_database_id) и на Twitter (см. mint.limits)
     """
 
-    def __init__(self, twitter_account: TwitterAccount, proxy: str | BetterProxy):
+    def __init__(
+            self,
+            twitter_account: TwitterAccount,
+            proxy: str | BetterProxy,
+            proxy_database_id: int = None,
+            db_lock: asyncio.Lock = None,
+    ):
+        """
+        :param db_lock: Блокировка сессий БД для объектов аккаунта (см. mint.client.Client.db_lock).
+        """
         self.db_account = twitter_account
+        self.proxy_database_id = proxy_database_id  # До super().__init__: нужен сессии (см. LimitedHTTPClient)
+        self.db_lock = db_lock or asyncio.Lock()
 
         # Сюда можно передавать данные о пользователе (TwitterAccount.user),
         # но это необязательно, поэтому не будем запариваться
@@ -37,13 +86,21 @@ class TwitterClient(twitter.Client):
             proxy=proxy,
             max_unlock_attempts=CONFIG.TWITTER.MAX_UNLOCK_ATTEMPTS,
             capsolver_api_key=CONFIG.CAPTCHA.CAPSOLVER_API_KEY,
+            timeout=CONFIG.REQUESTS.TIMEOUT,
         )
 
     async def __aexit__(self, *args):
         await self.close()
 
     async def close(self):
-        async with AsyncSessionmaker() as session:
+        await self.save()
+        await super().close()
+
+    async def save(self):
+        """
+        Сохраняет данные о TwitterAccount и TwitterAccount.user в бд
+        """
+        async with self.db_lock, AsyncSessionmaker() as session:
             twitter_account_data = self.account.model_dump(
                 include={"id", "auth_token", "ct0", "username", "password", "email", "totp_secret", "backup_code", "status"}
             )
@@ -59,5 +116,3 @@ class TwitterClient(twitter.Client):
             self.db_account.user, _ = await update_or_create(
                 session, TwitterUser, twitter_user_data, id=twitter_user_data["id"])
             await session.commit()
-
-        await super().close()
@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from mint.api.errors import HTTPException
+from mint.breaker import BreakerState, MaintenanceBreaker
+
+
+def http_error(message: str) -> HTTPException:
+    return HTTPException(SimpleNamespace(status_code=200), {"code": 10000, "msg": message})
+
+
+class MaintenanceBreakerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.breaker = MaintenanceBreaker(probe=True, probe_delay=0.01, max_probe_delay=0.05)
+
+    async def request(self, exc: Exception | None = None):
+        async with self.breaker.guard():
+            if exc is not None:
+                raise exc
+
+    async def trip(self):
+        with self.assertRaises(HTTPException):
+            await self.request(http_error("System Maintenance"))
+        self.assertIs(self.breaker.state, BreakerState.OPEN)
+
+    async def wait_probe(self):
+        await asyncio.wait_for(self.breaker.wait_dispatch(), 1)
+        self.assertIs(self.breaker.state, BreakerState.HALF_OPEN)
+
+    async def test_trip_holds_requests(self):
+        await self.trip()
+
+        waiting = asyncio.create_task(self.request())
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+
+        # Ожидающий запрос становится пробным и замыкает предохранитель
+        await asyncio.wait_for(waiting, 1)
+        self.assertIs(self.breaker.state, BreakerState.CLOSED)
+
+    async def test_failed_probe_doubles_delay(self):
+        await self.trip()
+        await self.wait_probe()
+
+        with self.assertRaises(HTTPException):
+            await self.request(http_error("System Maintenance"))
+
+        self.assertIs(self.breaker.state, BreakerState.OPEN)
+        self.assertEqual(self.breaker._delay, 0.02)
+
+    async def test_successful_probe_closes(self):
+        await self.trip()
+        await self.wait_probe()
+
+        await self.request()
+
+        self.assertIs(self.breaker.state, BreakerState.CLOSED)
+        self.assertEqual(self.breaker._delay, 0.01)
+
+    async def test_http_error_probe_closes(self):
+        await self.trip()
+        await self.wait_probe()
+
+        with self.assertRaises(HTTPException):
+            await self.request(http_error("Invalid params"))
+
+        self.assertIs(self.breaker.state, BreakerState.CLOSED)
+
+    async def test_transport_error_probe_keeps_breaker_open(self):
+        await self.trip()
+        await self.wait_probe()
+
+        with self.assertRaises(ConnectionError):
+            await self.request(ConnectionError("proxy refused connection"))
+
+        # Сайт не ответил: предохранитель не замкнут, пробу делает следующий запрос
+        self.assertIs(self.breaker.state, BreakerState.HALF_OPEN)
+        self.assertIsNone(self.breaker._probe_task)
+
+        await asyncio.wait_for(self.request(), 1)
+        self.assertIs(self.breaker.state, BreakerState.CLOSED)
+
+
+if __name__ == "__main__":
+    unittest.main()
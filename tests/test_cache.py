@@ -0,0 +1,57 @@
+import unittest
+from unittest.mock import patch
+
+from mint.api.cache import ENERGY_LIST, GREEN_ID, MISSING, USER_INFO, ResponseCache
+from mint.config import CONFIG
+
+
+class ResponseCacheTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cache = ResponseCache()
+        patcher = patch.dict(CONFIG.CACHE.TTL, {USER_INFO: 30, ENERGY_LIST: 60})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_put_and_get(self):
+        self.cache.put(1, USER_INFO, "user", self.cache.generation(1))
+
+        self.assertEqual(self.cache.get(1, USER_INFO), "user")
+        self.assertIs(self.cache.get(2, USER_INFO), MISSING)
+
+    async def test_put_rejects_stale_generation(self):
+        generation = self.cache.generation(1)
+        # Пока шел запрос, claim сбросил данные пользователя
+        self.cache.invalidate(1, "claim")
+
+        self.cache.put(1, USER_INFO, "stale user", generation)
+
+        self.assertIs(self.cache.get(1, USER_INFO), MISSING)
+
+    async def test_invalidation_of_other_scope_keeps_response(self):
+        generation = self.cache.generation(1)
+        self.cache.invalidate(2, "claim")
+
+        self.cache.put(1, USER_INFO, "user", generation)
+
+        self.assertEqual(self.cache.get(1, USER_INFO), "user")
+
+    async def test_invalidate_drops_dependent_entries(self):
+        self.cache.put(1, USER_INFO, "user")
+        self.cache.put(1, ENERGY_LIST, "energy")
+
+        self.cache.invalidate(1, "inject")
+
+        self.assertIs(self.cache.get(1, USER_INFO), MISSING)
+        self.assertEqual(self.cache.get(1, ENERGY_LIST), "energy")
+
+    async def test_uncached_endpoint_is_not_counted(self):
+        CONFIG.CACHE.TTL[GREEN_ID] = 0
+        self.assertIs(self.cache.get(1, GREEN_ID), MISSING)
+        self.assertIs(self.cache.get(1, USER_INFO), MISSING)
+
+        self.assertNotIn(GREEN_ID, self.cache.misses)
+        self.assertEqual(self.cache.misses[USER_INFO], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from mint.client import Client
+
+
+def fake_account() -> SimpleNamespace:
+    return SimpleNamespace(
+        database_id=1,
+        auth_token="token",
+        proxy_database_id=None,
+        proxy=None,
+        invite_code="CODE",
+        user=SimpleNamespace(me=0, inviter_user_id=None, twitter_id=None),
+    )
+
+
+class ParallelStepsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.client = Client(fake_account())
+        self.user_info_sent = asyncio.Event()
+        self.user_info_released = asyncio.Event()
+        http = self.client.http
+
+        async def request_energy_list():
+            return []
+
+        async def request_assets():
+            return []
+
+        async def request_self():
+            # Ответ собран сервером до инвайта, а приходит после
+            self.user_info_sent.set()
+            await self.user_info_released.wait()
+            return SimpleNamespace(model_dump=lambda: {"me": 10, "inviter_user_id": None, "twitter_id": None})
+
+        async def accept_invite(invite_code):
+            return 42
+
+        http.request_energy_list = request_energy_list
+        http.request_assets = request_assets
+        http.request_self = request_self
+        http.accept_invite = accept_invite
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def test_user_info_does_not_overwrite_invite(self):
+        claim = asyncio.create_task(self.client.claim_energy())
+        await self.user_info_sent.wait()
+
+        await self.client.try_to_accept_invite()
+        self.user_info_released.set()
+        await claim
+
+        self.assertEqual(self.client.account.user.inviter_user_id, 42)
+        self.assertEqual(self.client.account.user.me, 10)
+        self.assertEqual(self.client._user_changes["inviter_user_id"], 42)
+
+    async def test_user_info_is_stale_after_parallel_change(self):
+        request = asyncio.create_task(self.client.request_self())
+        await self.user_info_sent.wait()
+
+        # Например, привязка Discord: ответ на запрос данных мог ее не застать
+        self.client._invalidate_user()
+        self.user_info_released.set()
+        await request
+
+        self.assertFalse(self.client._user_fresh)
+
+    async def test_inject_refreshes_stale_balance(self):
+        self.client.account.wallet = SimpleNamespace(address="0xwallet")
+        self.client.account.user.injected_me = 0
+        self.user_info_released.set()
+        injected = []
+
+        async def inject(amount, address):
+            injected.append(amount)
+
+        self.client.http.inject = inject
+
+        # В бд сохранен баланс 0, а на сайте уже 10 ME
+        self.assertTrue(await self.client.inject_all())
+
+        self.assertEqual(injected, [10])
+        self.assertEqual(self.client.account.user.injected_me, 10)
+
+    async def test_verified_status_is_applied(self):
+        self.client.account.wallet = SimpleNamespace(address="0xwallet")
+        self.client.account.user.status = "unverified"
+
+        async def verify_wallet():
+            pass
+
+        self.client.http.verify_wallet = verify_wallet
+
+        self.assertTrue(await self.client.try_to_verify_wallet())
+        self.assertEqual(self.client.account.user.status, "verified")
+        self.assertEqual(self.client._user_changes["status"], "verified")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import asyncio
+import unittest
+
+from common.delay_queue import DelayQueue
+
+
+class DelayQueueTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.queue: DelayQueue[str] = DelayQueue()
+
+    async def get_all(self, count: int) -> list[str]:
+        return [await asyncio.wait_for(self.queue.get(), 1) for _ in range(count)]
+
+    async def test_items_are_returned_by_ready_time(self):
+        self.queue.put("late", 0.03)
+        self.queue.put("now", 0)
+        self.queue.put("soon", 0.01)
+
+        self.assertEqual(await self.get_all(3), ["now", "soon", "late"])
+
+    async def test_same_ready_time_keeps_insertion_order(self):
+        for item in ("first", "second", "third"):
+            self.queue.put(item, -1)
+
+        self.assertEqual(await self.get_all(3), ["first", "second", "third"])
+
+    async def test_item_is_not_returned_early(self):
+        self.queue.put("item", 0.05)
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+
+        await self.queue.get()
+
+        self.assertGreaterEqual(loop.time() - started_at, 0.04)
+
+    async def test_earlier_item_wakes_waiting_get(self):
+        self.queue.put("late", 10)
+        getter = asyncio.create_task(self.queue.get())
+        await asyncio.sleep(0.01)
+
+        self.queue.put("early", 0)
+
+        self.assertEqual(await asyncio.wait_for(getter, 1), "early")
+        self.assertEqual(len(self.queue), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
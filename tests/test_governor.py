@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+from mint.governor import ProxyGovernor, account_key
+
+
+class ProxyGovernorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.governor = ProxyGovernor(max_accounts=2)
+
+    async def test_cap_per_proxy(self):
+        self.assertTrue(self.governor.try_acquire_account(1))
+        self.assertTrue(self.governor.try_acquire_account(1))
+        self.assertFalse(self.governor.try_acquire_account(1))
+        # Ограничение у каждого прокси свое
+        self.assertTrue(self.governor.try_acquire_account(2))
+        self.assertEqual(self.governor.in_flight(1), 2)
+
+    async def test_parked_account_resumes_on_release(self):
+        resumed = []
+        self.governor.try_acquire_account(1)
+        self.governor.try_acquire_account(1)
+        self.governor.park(1, lambda: resumed.append("first"))
+        self.governor.park(1, lambda: resumed.append("second"))
+
+        self.governor.release_account(1)
+
+        # Освободилось одно место — возвращается один аккаунт, в порядке парковки
+        self.assertEqual(resumed, ["first"])
+        self.assertEqual(self.governor.in_flight(1), 1)
+
+    async def test_accounts_without_proxy_are_not_limited(self):
+        keys = [account_key(None, database_id) for database_id in range(1, 4)]
+        self.assertEqual(len(set(keys)), 3)
+        for key in keys:
+            self.assertTrue(self.governor.try_acquire_account(key))
+            self.assertTrue(self.governor.try_acquire_account(key))
+
+    async def test_acquire_waits_for_slot(self):
+        await self.governor.acquire_account(1)
+        await self.governor.acquire_account(1)
+        waiting = asyncio.create_task(self.governor.acquire_account(1))
+        await asyncio.sleep(0)
+        self.assertFalse(waiting.done())
+
+        self.governor.release_account(1)
+        await asyncio.wait_for(waiting, 1)
+        self.assertEqual(self.governor.in_flight(1), 2)
+
+    async def test_cancelled_waiter_passes_slot_on(self):
+        await self.governor.acquire_account(1)
+        await self.governor.acquire_account(1)
+        cancelled = asyncio.create_task(self.governor.acquire_account(1))
+        waiting = asyncio.create_task(self.governor.acquire_account(1))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+
+        self.governor.release_account(1)
+        await asyncio.wait_for(waiting, 1)
+        self.assertEqual(self.governor.in_flight(1), 2)
+
+    async def test_reconfigure_resumes_parked(self):
+        resumed = []
+        self.governor.try_acquire_account(1)
+        self.governor.try_acquire_account(1)
+        self.governor.park(1, lambda: resumed.append(self.governor.try_acquire_account(1)))
+
+        self.governor.reconfigure(3, 0, 1)
+
+        self.assertEqual(resumed, [True])
+        self.assertEqual(self.governor.in_flight(1), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
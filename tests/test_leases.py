@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import patch
+
+from mint import leases as leases_module
+from mint.leases import AccountLeases
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def commit(self):
+        pass
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class LeaseExpiryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.clock = Clock()
+        patches = [
+            patch.object(leases_module.time, "monotonic", self.clock),
+            patch.object(leases_module, "AsyncSessionmaker", FakeSession),
+            patch.object(leases_module, "claim_account_leases", self.claim),
+            patch.object(leases_module, "release_account_leases", self.release),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.leases = AccountLeases(30, owner="host")
+        await self.leases.claim(FakeSession(), [1])
+
+    async def claim(self, session, database_ids, owner, now, expires_at, **kwargs):
+        return set(database_ids)
+
+    async def release(self, *args, **kwargs):
+        pass
+
+    async def test_lease_expires_without_renewal(self):
+        self.assertTrue(self.leases.holds(1))
+
+        self.clock.now += 30
+        self.assertFalse(self.leases.holds(1))
+
+    async def test_failed_renewal_keeps_previous_expiry(self):
+        async def fail(*args, **kwargs):
+            raise ConnectionError("database is unavailable")
+
+        self.clock.now += 10
+        with patch.object(leases_module, "renew_account_leases", fail):
+            with self.assertRaises(ConnectionError):
+                await self.leases.flush()
+
+        self.assertTrue(self.leases.holds(1))
+        # Запас до срока: аккаунт отпускается раньше, чем его сможет захватить другой хост
+        self.clock.now += 15
+        self.assertFalse(self.leases.holds(1))
+
+    async def test_renewal_extends_lease(self):
+        async def renew(session, database_ids, owner, expires_at):
+            return set(database_ids)
+
+        self.clock.now += 20
+        with patch.object(leases_module, "renew_account_leases", renew):
+            await self.leases.flush()
+
+        self.clock.now += 20
+        self.assertTrue(self.leases.holds(1))
+
+    async def test_lease_taken_by_another_host(self):
+        async def renew(session, database_ids, owner, expires_at):
+            return set()
+
+        with patch.object(leases_module, "renew_account_leases", renew):
+            await self.leases.flush()
+
+        self.assertFalse(self.leases.holds(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from mint.governor import ProxyGovernor
+from mint.pipeline import run_stage
+from mint.pool import Deferred
+
+
+class RunStageTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.governor = ProxyGovernor(max_accounts=1)
+
+    async def test_deferred_step_releases_slot_and_proxy(self):
+        calls = []
+
+        async def run(item):
+            calls.append(item)
+            if item == "retried" and calls.count(item) == 1:
+                return Deferred(0.05)
+            return True
+
+        # Один слот стадии и общий прокси: пока первый аккаунт ждет повтора, работает второй
+        stats = await run_stage(
+            "login", ["retried", "other"], run, proxy_key=lambda item: 1, max_tasks=1, governor=self.governor)
+
+        self.assertEqual(calls, ["retried", "other", "retried"])
+        self.assertEqual((stats.processed, stats.failed), (2, 0))
+        self.assertEqual(self.governor.in_flight(1), 0)
+
+    async def test_failed_step(self):
+        async def run(item):
+            return item != "bad"
+
+        stats = await run_stage(
+            "login", ["good", "bad"], run, proxy_key=lambda item: item, max_tasks=2, governor=self.governor)
+
+        self.assertEqual((stats.processed, stats.failed), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+
+from mint.governor import ProxyGovernor
+from mint.pool import Cooldown, Deferred, WorkerPool
+
+
+def account(database_id: int, proxy_database_id: int | None = None) -> SimpleNamespace:
+    return SimpleNamespace(database_id=database_id, proxy_database_id=proxy_database_id)
+
+
+async def aiter(items):
+    for item in items:
+        yield item
+
+
+def ignore_progress(count):
+    pass
+
+
+class WorkerPoolTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.governor = ProxyGovernor(max_accounts=1)
+        self.calls: list[tuple[int, object]] = []
+
+    def pool(self, process, workers: int = 1) -> WorkerPool:
+        return WorkerPool(process, workers, governor=self.governor, on_progress=ignore_progress)
+
+    async def test_deferred_frees_worker_and_proxy(self):
+        async def process(snapshot, state):
+            self.calls.append((snapshot.database_id, state))
+            if snapshot.database_id == 1 and state is None:
+                return Deferred(0.05, state="retry")
+
+        # Оба аккаунта на одном прокси: пока первый ждет повтора, прокси и воркер свободны для второго
+        await self.pool(process).run(aiter([account(1, proxy_database_id=7), account(2, proxy_database_id=7)]))
+
+        self.assertEqual(self.calls, [(1, None), (2, None), (1, "retry")])
+        self.assertEqual(self.governor.in_flight(7), 0)
+
+    async def test_cooldown_holds_proxy_but_not_worker(self):
+        async def process(snapshot, state):
+            self.calls.append((snapshot.database_id, state))
+            if snapshot.database_id == 1:
+                return Cooldown(0.05)
+
+        accounts = [account(1, proxy_database_id=7), account(2, proxy_database_id=7), account(3, proxy_database_id=8)]
+        await self.pool(process).run(aiter(accounts))
+
+        # Аккаунт 2 ждет конца паузы прокси, воркер тем временем обрабатывает аккаунт 3
+        self.assertEqual([database_id for database_id, state in self.calls], [1, 3, 2])
+        self.assertEqual(self.governor.in_flight(7), 0)
+
+    async def test_resize(self):
+        running = 0
+        max_running = 0
+        release = asyncio.Event()
+
+        async def process(snapshot, state):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await release.wait()
+            running -= 1
+
+        pool = self.pool(process)
+        run = asyncio.create_task(pool.run(aiter([account(database_id) for database_id in range(1, 7)])))
+        await asyncio.sleep(0.01)
+        self.assertEqual(running, 1)
+
+        pool.resize(3)
+        await asyncio.sleep(0.01)
+        self.assertEqual(running, 3)
+
+        # Занятые воркеры остановятся после текущего аккаунта
+        pool.resize(1)
+        self.assertEqual(pool._retiring, 2)
+        release.set()
+        await asyncio.wait_for(run, 1)
+
+        self.assertEqual(max_running, 3)
+        self.assertEqual(sum(stats.processed for stats in pool.stats), 6)
+        self.assertEqual(len(pool._workers), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from mint import process
+from mint.config import CONFIG
+from mint.errors import RetryLaterError
+from mint.pool import Deferred
+from mint.process import StagedAccount, _run_staged_step
+from mint.steps import Step
+
+
+async def save():
+    pass
+
+
+def staged_account(time_left: float | None) -> StagedAccount:
+    account = SimpleNamespace(database_id=1)
+    return StagedAccount(account, SimpleNamespace(save=save), {}, set(), time_left=time_left)
+
+
+STEP = Step("login", None)
+
+
+class StagedStepTest(unittest.IsolatedAsyncioTestCase):
+    def patch_step(self, run_account_step):
+        patcher = patch.object(process, "run_account_step", run_account_step)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_retry_is_deferred(self):
+        async def run_account_step(account, step, journal, *, attempt, defer, persist):
+            self.assertTrue(defer)
+            raise RetryLaterError(ConnectionError(), 5, attempt + 1)
+
+        self.patch_step(run_account_step)
+        staged = staged_account(None)
+
+        result = await _run_staged_step(staged, STEP)
+
+        self.assertEqual(result, Deferred(5))
+        self.assertEqual(staged.attempts, {"login": 2})
+        self.assertNotIn("login", staged.completed_steps)
+
+    async def test_step_time_counts_against_account_deadline(self):
+        async def run_account_step(account, step, journal, **kwargs):
+            await asyncio.sleep(0.05)
+            return True
+
+        self.patch_step(run_account_step)
+        staged = staged_account(1)
+
+        self.assertTrue(await _run_staged_step(staged, STEP))
+
+        self.assertLess(staged.time_left, 0.96)
+        self.assertEqual(staged.completed_steps, {"login"})
+
+    async def test_account_deadline_defers_then_stops_account(self):
+        async def run_account_step(account, step, journal, **kwargs):
+            await asyncio.sleep(1)
+
+        self.patch_step(run_account_step)
+        staged = staged_account(0.01)
+
+        with (patch.object(CONFIG.CONCURRENCY, "MAX_RETRIES", 2),
+              patch.object(CONFIG.CONCURRENCY, "DELAY_BETWEEN_RETRIES", 3),
+              patch.object(process, "account_timeout", lambda: 0.01)):
+            self.assertEqual(await _run_staged_step(staged, STEP), Deferred(3))
+            self.assertEqual(staged.time_left, 0.01)
+
+            self.assertFalse(await _run_staged_step(staged, STEP))
+
+        self.assertTrue(staged.failed)
+        self.assertEqual(staged.timeouts, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from types import SimpleNamespace
+
+from curl_cffi import requests
+from twitter.errors import HTTPException as TwitterHTTPException, BadAccount as TwitterBadAccountError
+
+from mint.api.errors import HTTPException as MintHTTPException, MaintenanceError
+from mint.errors import DeadlineExceededError, RetryLaterError, StepFailedError, TwitterScriptError
+from mint.retry import ErrorKind, RetryPolicy, call_with_retries, error_kind
+
+
+def response(status_code: int) -> SimpleNamespace:
+    return SimpleNamespace(status_code=status_code)
+
+
+def mint_error(status_code: int = 200, message: str = "Something went wrong") -> MintHTTPException:
+    return MintHTTPException(response(status_code), {"code": 10000, "msg": message})
+
+
+def twitter_error(status_code: int) -> TwitterHTTPException:
+    return TwitterHTTPException(response(status_code), {"errors": [{"code": 0, "message": "Error"}]})
+
+
+class ErrorKindTest(unittest.TestCase):
+    def test_error_rules(self):
+        cases = [
+            (MaintenanceError(), ErrorKind.GLOBAL_FATAL),
+            (mint_error(message="System Maintenance"), ErrorKind.GLOBAL_FATAL),
+            (mint_error(message="Unfortunately, you did not pass our verification process."),
+             ErrorKind.ACCOUNT_FATAL),
+            (mint_error(502), ErrorKind.RETRYABLE),
+            (mint_error(429), ErrorKind.RETRYABLE),
+            (mint_error(400), ErrorKind.FATAL),
+            (mint_error(200), ErrorKind.FATAL),
+            (TwitterBadAccountError(twitter_error(401), None), ErrorKind.ACCOUNT_FATAL),
+            (twitter_error(503), ErrorKind.RETRYABLE),
+            (twitter_error(429), ErrorKind.RETRYABLE),
+            (twitter_error(403), ErrorKind.FATAL),
+            (DeadlineExceededError(60), ErrorKind.RETRYABLE),
+            (TwitterScriptError(None, "No Twitter account"), ErrorKind.FATAL),
+            (requests.errors.RequestsError("Timeout", code=28), ErrorKind.RETRYABLE),
+            (requests.errors.RequestsError("Connection refused", code=7), ErrorKind.RETRYABLE),
+            (requests.errors.RequestsError("Unsupported protocol", code=1), ErrorKind.FATAL),
+            (ValueError("Unexpected"), None),
+        ]
+        for exc, kind in cases:
+            with self.subTest(exc=repr(exc)):
+                self.assertIs(error_kind(exc), kind)
+
+
+class CallWithRetriesTest(unittest.IsolatedAsyncioTestCase):
+    policy = RetryPolicy(max_attempts=3, base_delay=0, max_delay=0)
+
+    async def test_retryable_error_is_retried(self):
+        attempts = []
+
+        async def action():
+            attempts.append(len(attempts) + 1)
+            if len(attempts) < 3:
+                raise mint_error(502)
+            return "done"
+
+        self.assertEqual(await call_with_retries(action, self.policy, "test"), "done")
+        self.assertEqual(attempts, [1, 2, 3])
+
+    async def test_attempts_exhausted(self):
+        async def action():
+            raise mint_error(502)
+
+        with self.assertRaises(StepFailedError):
+            await call_with_retries(action, self.policy, "test")
+
+    async def test_fatal_error_is_not_retried(self):
+        attempts = []
+
+        async def action():
+            attempts.append(1)
+            raise mint_error(400)
+
+        with self.assertRaises(StepFailedError):
+            await call_with_retries(action, self.policy, "test")
+        self.assertEqual(len(attempts), 1)
+
+    async def test_account_fatal_error_is_raised_as_is(self):
+        async def action():
+            raise mint_error(message="Unfortunately, you did not pass our verification process.")
+
+        with self.assertRaises(MintHTTPException):
+            await call_with_retries(action, self.policy, "test")
+
+    async def test_deferred_retry(self):
+        async def action():
+            raise mint_error(502)
+
+        with self.assertRaises(RetryLaterError) as context:
+            await call_with_retries(action, self.policy, "test", attempt=2, defer=True)
+        self.assertEqual(context.exception.attempt, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
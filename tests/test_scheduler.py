@@ -0,0 +1,121 @@
+import unittest
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from mint import scheduler
+from mint.config import CONFIG
+from mint.scheduler import StartedAccounts, iter_due_accounts, next_run_after, retry_run_at
+
+
+NOW = datetime(2026, 10, 18, 12, 0)
+PERIOD = timedelta(hours=24)
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def commit(self):
+        pass
+
+
+class NextRunTest(unittest.TestCase):
+    def test_next_run_keeps_time_of_day(self):
+        due = datetime(2026, 10, 18, 9, 30)
+        self.assertEqual(next_run_after(due, NOW, PERIOD), datetime(2026, 10, 19, 9, 30))
+
+    def test_overdue_account_skips_missed_periods(self):
+        due = datetime(2026, 10, 15, 9, 30)
+        self.assertEqual(next_run_after(due, NOW, PERIOD), datetime(2026, 10, 19, 9, 30))
+
+    def test_retry_is_not_later_than_next_run(self):
+        with patch.object(CONFIG.SCHEDULER, "RETRY_MINUTES", 30):
+            self.assertEqual(retry_run_at(NOW + PERIOD, NOW), NOW + timedelta(minutes=30))
+            self.assertEqual(retry_run_at(NOW + timedelta(minutes=10), NOW), NOW + timedelta(minutes=10))
+
+        with patch.object(CONFIG.SCHEDULER, "RETRY_MINUTES", 0):
+            self.assertEqual(retry_run_at(NOW + PERIOD, NOW), NOW + PERIOD)
+
+
+class DueAccountsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # database_id -> next_run_at
+        self.next_run_at = {
+            1: NOW - timedelta(hours=1),
+            2: NOW - timedelta(hours=3),
+            3: NOW + timedelta(hours=1),
+            4: NOW,
+        }
+        patches = [
+            patch.object(scheduler, "utcnow", lambda: NOW),
+            patch.object(scheduler, "AsyncSessionmaker", FakeSession),
+            patch.object(scheduler, "get_unscheduled_account_ids", self.get_unscheduled_account_ids),
+            patch.object(scheduler, "get_due_account_ids", self.get_due_account_ids),
+            patch.object(scheduler, "get_account_snapshots_by_ids", self.get_account_snapshots_by_ids),
+            patch.object(scheduler, "get_nearest_run_at", self.get_nearest_run_at),
+            patch.object(scheduler, "set_next_run_at", self.set_next_run_at),
+            patch.object(CONFIG.SCHEDULER, "PERIOD_HOURS", 24),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def get_unscheduled_account_ids(self, session, groups):
+        return [(database_id, None) for database_id, run_at in self.next_run_at.items() if run_at is None]
+
+    async def get_due_account_ids(self, session, groups, now):
+        due = sorted((run_at, database_id) for database_id, run_at in self.next_run_at.items() if run_at <= now)
+        return [(database_id, None) for run_at, database_id in due]
+
+    async def get_account_snapshots_by_ids(self, session, database_ids):
+        return [SimpleNamespace(database_id=database_id, next_run_at=self.next_run_at[database_id])
+                for database_id in database_ids]
+
+    async def get_nearest_run_at(self, session, groups, after):
+        return min(run_at for run_at in self.next_run_at.values() if run_at > after)
+
+    async def set_next_run_at(self, session, next_run_at_by_id):
+        self.next_run_at.update(next_run_at_by_id)
+
+    async def test_due_accounts_are_selected_most_overdue_first(self):
+        started = StartedAccounts()
+        accounts = iter_due_accounts(["test"], batch_size=10, started=started)
+        self.addAsyncCleanup(accounts.aclose)
+
+        selected = [(await anext(accounts)).database_id for _ in range(3)]
+
+        self.assertEqual(selected, [2, 1, 4])
+        # Выбранные аккаунты перенесены на период вперед с сохранением времени суток, остальные не тронуты
+        self.assertEqual(self.next_run_at[2], NOW - timedelta(hours=3) + PERIOD)
+        self.assertEqual(self.next_run_at[4], NOW + PERIOD)
+        self.assertEqual(self.next_run_at[3], NOW + timedelta(hours=1))
+        self.assertEqual(started._due_at[2], NOW - timedelta(hours=3))
+
+    async def test_only_claimed_accounts_are_rescheduled(self):
+        class Leases:
+            async def claim(self, session, database_ids):
+                return {1}
+
+        accounts = iter_due_accounts(["test"], batch_size=10, leases=Leases())
+        self.addAsyncCleanup(accounts.aclose)
+
+        self.assertEqual((await anext(accounts)).database_id, 1)
+        self.assertEqual(self.next_run_at[1], NOW - timedelta(hours=1) + PERIOD)
+        self.assertEqual(self.next_run_at[2], NOW - timedelta(hours=3))
+
+    async def test_new_accounts_are_spread_over_period(self):
+        self.next_run_at = {database_id: None for database_id in range(1, 5)}
+
+        await scheduler.schedule_new_accounts(["test"], PERIOD)
+
+        self.assertEqual(self.next_run_at, {
+            database_id: NOW + PERIOD / 4 * index for index, database_id in enumerate(range(1, 5))
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import unittest
+from collections import Counter
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from mint import pool
+from mint.pool import _iter_account_pages
+from mint.sharding import Shard, in_parts, stable_hash
+
+
+# database_id -> proxy_database_id
+ACCOUNTS = {database_id: (database_id % 7 or None) for database_id in range(1, 101)}
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+
+class ShardTest(unittest.TestCase):
+    def test_hash_is_stable_across_processes(self):
+        keys = [1, 42, "proxy:7"]
+        script = f"from mint.sharding import stable_hash; print([stable_hash(key) for key in {keys!r}])"
+        # Встроенный hash() строк в других процессах был бы другим
+        env = {**os.environ, "PYTHONHASHSEED": "12345"}
+        output = subprocess.run(
+            [sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True).stdout
+
+        self.assertEqual(output.strip(), str([stable_hash(key) for key in keys]))
+
+    def test_every_account_is_in_exactly_one_shard(self):
+        shards = [Shard(index, 4) for index in range(1, 5)]
+        for database_id in ACCOUNTS:
+            self.assertEqual(sum(shard.contains(database_id) for shard in shards), 1)
+
+    def test_accounts_with_common_proxy_share_partition(self):
+        partitions = [Shard(index, 3) for index in range(1, 4)]
+        for proxy_database_id in range(1, 7):
+            database_ids = [database_id for database_id, proxy in ACCOUNTS.items() if proxy == proxy_database_id]
+            owners = {
+                partition for partition in partitions for database_id in database_ids
+                if in_parts(database_id, proxy_database_id, partition=partition)
+            }
+            self.assertEqual(len(owners), 1)
+
+    def test_invalid_shard(self):
+        for value in ("0/4", "5/4", "1/0", "1", "a/b"):
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                Shard.from_str(value)
+
+
+class AccountPagesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        patches = [
+            patch.object(pool, "AsyncSessionmaker", FakeSession),
+            patch.object(pool, "get_account_snapshots_by_groups", self.get_account_snapshots_by_groups),
+            patch.object(pool, "get_account_keys_by_groups", self.get_account_keys_by_groups),
+            patch.object(pool, "get_account_snapshots_by_ids", self.get_account_snapshots_by_ids),
+        ]
+        for patcher in patches:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _page(after_database_id, limit) -> list[int]:
+        return [database_id for database_id in sorted(ACCOUNTS)
+                if after_database_id is None or database_id > after_database_id][:limit]
+
+    async def get_account_snapshots_by_groups(self, session, groups, after_database_id=None, limit=None):
+        return await self.get_account_snapshots_by_ids(session, self._page(after_database_id, limit))
+
+    async def get_account_keys_by_groups(self, session, groups, after_database_id=None, limit=None):
+        return [(database_id, ACCOUNTS[database_id]) for database_id in self._page(after_database_id, limit)]
+
+    async def get_account_snapshots_by_ids(self, session, database_ids):
+        return [SimpleNamespace(database_id=database_id, proxy_database_id=ACCOUNTS[database_id])
+                for database_id in database_ids]
+
+    async def load(self, shard: Shard = None, partition: Shard = None) -> list[int]:
+        return [account.database_id
+                async for page in _iter_account_pages(["test"], 16, shard, partition) for account in page]
+
+    async def test_all_accounts_without_parts(self):
+        self.assertEqual(await self.load(), sorted(ACCOUNTS))
+
+    async def test_parts_cover_every_account_once(self):
+        loaded = Counter()
+        for shard_index in range(1, 3):
+            for partition_index in range(1, 4):
+                loaded.update(await self.load(Shard(shard_index, 2), Shard(partition_index, 3)))
+
+        self.assertEqual(set(loaded), set(ACCOUNTS))
+        self.assertEqual(set(loaded.values()), {1})
+
+
+if __name__ == "__main__":
+    unittest.main()